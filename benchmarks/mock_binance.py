@@ -0,0 +1,163 @@
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+
+from aiohttp import web
+
+MINUTE = 60000
+
+INTERVAL_MS = {'1m': MINUTE, '3m': 3 * MINUTE, '5m': 5 * MINUTE, '15m': 15 * MINUTE, '30m': 30 * MINUTE,
+               '1h': 60 * MINUTE, '4h': 240 * MINUTE, '1d': 1440 * MINUTE}
+
+
+class MockBinance:
+    """
+    Local Binance REST server for benchmarks.
+
+    Serves exchange info, time, klines, depth, ticker prices, accounts and order placement for
+    `symbols` synthetic USDT pairs. Every request waits `latency` +- `jitter` seconds and fails with a
+    429 or 503 with the given probabilities, so retry and rate limiting paths are exercised too.
+    """
+    def __init__(self, symbols=1000, latency=0.0, jitter=0.0, rate_429=0.0, rate_503=0.0, depth_levels=100,
+                 weight_limit=1000000, seed=0):
+        self.bases = [f'S{i:04d}' for i in range(symbols)]
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rate_503 = rate_503
+        self.depth_levels = depth_levels
+        self.weight_limit = weight_limit
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.paths = Counter()
+        self.injected = {429: 0, 503: 0}
+        self.order_id = 0
+        self.loop = None
+        self.port = None
+        self.ready = threading.Event()
+        self._stop = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    @property
+    def rate_limits(self):
+        return [{'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1, 'limit': self.weight_limit},
+                {'rateLimitType': 'ORDERS', 'interval': 'SECOND', 'intervalNum': 10, 'limit': self.weight_limit},
+                {'rateLimitType': 'ORDERS', 'interval': 'DAY', 'intervalNum': 1, 'limit': self.weight_limit}]
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        self.requests += 1
+        self.paths[request.path] += 1
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        draw = self.random.random()
+        if draw < self.rate_429:
+            self.injected[429] += 1
+            return web.json_response({'code': -1003, 'msg': 'Too many requests; current request has limited.'},
+                                     status=429, headers={'Retry-After': '0'})
+        if draw < self.rate_429 + self.rate_503:
+            self.injected[503] += 1
+            return web.Response(status=503, text='Service Unavailable')
+        return await handler(request)
+
+    def price(self, symbol):
+        return 1 + (sum(symbol.encode()) % 1000) / 10
+
+    async def exchange_info(self, request):
+        symbols = [{
+            'symbol': base + 'USDT', 'status': 'TRADING', 'baseAsset': base, 'quoteAsset': 'USDT',
+            'quotePrecision': 8,
+            'filters': [{'filterType': 'PRICE_FILTER', 'minPrice': '0.01', 'maxPrice': '100000', 'tickSize': '0.01'},
+                        {'filterType': 'LOT_SIZE', 'minQty': '0.001', 'maxQty': '100000', 'stepSize': '0.001'},
+                        {'filterType': 'NOTIONAL', 'minNotional': '5'}],
+        } for base in self.bases]
+        return web.json_response({'serverTime': int(time.time() * 1000), 'rateLimits': self.rate_limits,
+                                  'symbols': symbols})
+
+    async def server_time(self, request):
+        return web.json_response({'serverTime': int(time.time() * 1000)})
+
+    async def klines(self, request):
+        symbol = request.query['symbol']
+        step = INTERVAL_MS.get(request.query['interval'], MINUTE)
+        limit = int(request.query.get('limit', 500))
+        end = (int(time.time() * 1000) // step) * step
+        start = end - (limit - 1) * step
+        if 'startTime' in request.query:
+            start = max(start, -(-int(request.query['startTime']) // step) * step)
+        price = self.price(symbol)
+        rows = []
+        for open_time in range(start, end + 1, step):
+            close = price * (1 + ((open_time // step) % 17 - 8) / 1000)
+            rows.append([open_time, f'{price:.4f}', f'{max(price, close) * 1.001:.4f}',
+                         f'{min(price, close) * 0.999:.4f}', f'{close:.4f}', '1000.0', open_time + step - 1,
+                         '100000.0', 100, '500.0', '50000.0', '0'])
+        return web.json_response(rows)
+
+    async def depth(self, request):
+        price = self.price(request.query['symbol'])
+        limit = min(int(request.query.get('limit', 100)), self.depth_levels)
+        return web.json_response({
+            'lastUpdateId': self.requests,
+            'bids': [[f'{price - 0.01 * (i + 1):.2f}', '1.000'] for i in range(limit)],
+            'asks': [[f'{price + 0.01 * (i + 1):.2f}', '1.000'] for i in range(limit)],
+        })
+
+    async def ticker_price(self, request):
+        if 'symbol' in request.query:
+            symbol = request.query['symbol']
+            return web.json_response({'symbol': symbol, 'price': f'{self.price(symbol):.4f}'})
+        return web.json_response([{'symbol': base + 'USDT', 'price': f'{self.price(base + "USDT"):.4f}'}
+                                  for base in self.bases])
+
+    async def account(self, request):
+        balances = [{'asset': 'USDT', 'free': '10000', 'locked': '0'}, {'asset': 'BNB', 'free': '1', 'locked': '0'}]
+        if request.path.startswith('/sapi'):
+            return web.json_response({'userAssets': [dict(row, borrowed='0', interest='0', netAsset=row['free'])
+                                                     for row in balances]})
+        return web.json_response({'updateTime': int(time.time() * 1000), 'balances': balances})
+
+    async def order(self, request):
+        self.order_id += 1
+        query = request.query
+        return web.json_response({'symbol': query.get('symbol'), 'orderId': self.order_id, 'status': 'NEW',
+                                  'side': query.get('side'), 'type': query.get('type'),
+                                  'transactTime': int(time.time() * 1000)})
+
+    def serve(self):
+        async def main():
+            self.loop = asyncio.get_running_loop()
+            self._stop = asyncio.Event()
+            app = web.Application(middlewares=[self.middleware])
+            app.router.add_get('/api/v3/exchangeInfo', self.exchange_info)
+            app.router.add_get('/api/v3/time', self.server_time)
+            app.router.add_get('/api/v3/klines', self.klines)
+            app.router.add_get('/api/v3/depth', self.depth)
+            app.router.add_get('/api/v3/ticker/price', self.ticker_price)
+            app.router.add_get('/api/v3/account', self.account)
+            app.router.add_get('/sapi/v1/margin/account', self.account)
+            app.router.add_post('/api/v3/order', self.order)
+            app.router.add_post('/sapi/v1/margin/order', self.order)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0, backlog=4096)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            self.ready.set()
+            await self._stop.wait()
+            await runner.cleanup()
+
+        threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+        if not self.ready.wait(10):
+            raise RuntimeError('mock Binance server did not start')
+        return self
+
+    def stop(self):
+        if self.loop is not None and self._stop is not None:
+            self.loop.call_soon_threadsafe(self._stop.set)
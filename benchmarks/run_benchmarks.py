@@ -0,0 +1,238 @@
+"""
+Benchmarks against a local mock Binance server, results are written as JSON.
+
+    python -m benchmarks.run_benchmarks --symbols 100,400,1000 --latency 0.005 --jitter 0.002 --output bench.json
+
+Runs in a temporary workspace with its own config, .env values, exchange rate file and log directory,
+so it never reads the real configuration or reaches api.binance.com.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_binance import MockBinance  # noqa: E402
+
+
+def prepare_workspace(directory):
+    """
+    Lays out the directories the package expects relative to its working directory and enters it.
+    """
+    for name in ('config', 'data', 'log', 'work'):
+        os.makedirs(os.path.join(directory, name), exist_ok=True)
+    with open(os.path.join(directory, 'config', 'config.json'), 'w') as file_object:
+        json.dump({'environment': 'development', 'quote_asset': 'USDT', 'assets1': []}, file_object)
+    with open(os.path.join(directory, 'data', 'q_last_exchange_rate.csv'), 'w') as file_object:
+        file_object.write('exchange rate\nsymbol,close\nBNBUSDT,600\n')
+    os.environ.setdefault('api_key', 'benchmark')
+    os.environ.setdefault('api_secret', 'benchmark')
+    os.chdir(os.path.join(directory, 'work'))
+
+
+def summarize(seconds, elapsed=None):
+    seconds = np.asarray(seconds, dtype=np.float64)
+    summary = {
+        'count': int(seconds.size),
+        'mean': float(seconds.mean()),
+        'p50': float(np.percentile(seconds, 50)),
+        'p95': float(np.percentile(seconds, 95)),
+        'p99': float(np.percentile(seconds, 99)),
+        'max': float(seconds.max()),
+    }
+    if elapsed is not None:
+        summary['throughput'] = seconds.size / elapsed
+    return summary
+
+
+def bench_sweeps(mock, symbol_counts, repeat, limit, persistent, parse_executor=None):
+    from trade_binance.kline_binance_dao import KlineBinanceDAO
+
+    results = []
+    for count in symbol_counts:
+        margin_asset_list = {base: i for i, base in enumerate(mock.bases[:count])}
+        dao = KlineBinanceDAO(base_url=mock.base_url, persistent=persistent, parse_executor=parse_executor)
+        sweeps = []
+        rows = 0
+        try:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                if parse_executor is None:
+                    klines = dao.get_binance_margin_klines_data('1m', limit, None, 'USDT', margin_asset_list)
+                    rows = len(klines)
+                else:
+                    rows = dao.get_binance_margin_klines_columns('1m', limit, None, 'USDT', margin_asset_list).size
+                sweeps.append(time.perf_counter() - started)
+        finally:
+            dao.close()
+        results.append({'symbols': count, 'limit': limit, 'persistent': persistent,
+                        'parse_executor': parse_executor, 'rows': rows,
+                        'seconds': sweeps, **summarize(sweeps)})
+    return results
+
+
+def bench_parse(rows_counts=(100, 300, 1000), repeat=200):
+    """
+    parse_klines against decoding the payload and converting a list per candle, as KlineColumns.append does.
+    """
+    from trade_binance.kline_parser import loads, parse_klines
+
+    def row_by_row(body):
+        parsed = np.array([row[:6] for row in loads(body)], dtype=np.float64)
+        return parsed[:, 0].astype(np.int64), parsed[:, 1:6].T
+
+    results = []
+    for count in rows_counts:
+        body = json.dumps([[1700000000000 + i * 60000, f'{100 + i / 3:.8f}', f'{101 + i / 3:.8f}',
+                            f'{99 + i / 3:.8f}', f'{100 + i / 3:.8f}', f'{1000 + i:.8f}', 1700000059999 + i * 60000,
+                            f'{100000 + i:.8f}', 321, '12.50000000', '1250.00000000', '0'] for i in range(count)],
+                          separators=(',', ':')).encode()
+        result = {'rows': count, 'bytes': len(body)}
+        for name, parse in (('row_by_row', row_by_row), ('parse_klines', parse_klines)):
+            latencies = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                parse(body)
+                latencies.append(time.perf_counter() - started)
+            result[name] = summarize(latencies)
+        results.append(result)
+    return results
+
+
+def bench_store(directory, candles=525600, queries=1000):
+    """
+    Month range queries over a year of 1m candles in a KlineDiskStore.
+    """
+    from trade_binance.kline_disk_store import KLINE_RECORD, KlineDiskStore
+
+    store = KlineDiskStore(directory)
+    records = np.zeros(candles, dtype=KLINE_RECORD)
+    records['open_time'] = np.arange(candles, dtype=np.int64) * 60000
+    started = time.perf_counter()
+    store.append('S0000USDT', '1m', records)
+    append_seconds = time.perf_counter() - started
+    month = 30 * 1440 * 60000
+    starts = np.random.default_rng(0).integers(0, candles * 60000 - month, queries)
+    latencies = []
+    for start in starts:
+        query_started = time.perf_counter()
+        store.read('S0000USDT', '1m', int(start), int(start) + month)
+        latencies.append(time.perf_counter() - query_started)
+    return {'candles': candles, 'append_seconds': append_seconds, 'month_query': summarize(latencies)}
+
+
+def bench_calls(api, calls, threads):
+    orders = [{'symbol': f'S{i % 10:04d}USDT', 'side': 'BUY', 'order_type': 'LIMIT', 'quantity': 1,
+               'price': 10, 'timeInForce': 'GTC'} for i in range(20)]
+    methods = {
+        'my_time': lambda: api.my_time(),
+        'my_klines': lambda: api.my_klines('S0000USDT', '1m', limit=100),
+        'my_depth': lambda: api.my_depth('S0000USDT', limit=100),
+        'my_ticker_price': lambda: api.my_ticker_price('S0000USDT'),
+        'my_new_margin_order': lambda: api.my_new_margin_order('S0000USDT', 'BUY', 'LIMIT', quantity='1.000',
+                                                               price='10.00', timeInForce='GTC'),
+        'my_new_margin_orders_20': lambda: api.my_new_margin_orders(orders),
+    }
+    results = {}
+    for name, method in methods.items():
+        method()
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(calls):
+            call_started = time.perf_counter()
+            method()
+            latencies.append(time.perf_counter() - call_started)
+        sequential = summarize(latencies, time.perf_counter() - started)
+
+        def worker(count):
+            for _ in range(count):
+                method()
+
+        workers = [threading.Thread(target=worker, args=(calls // threads,)) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        parallel_throughput = (calls // threads) * threads / (time.perf_counter() - started)
+        results[name] = {'sequential': sequential, 'threads': threads, 'parallel_throughput': parallel_throughput}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', default='100,400,1000', help='comma separated symbol counts per sweep')
+    parser.add_argument('--repeat', type=int, default=3, help='sweeps per symbol count')
+    parser.add_argument('--limit', type=int, default=100, help='klines per symbol')
+    parser.add_argument('--calls', type=int, default=200, help='calls per wrapper method')
+    parser.add_argument('--threads', type=int, default=8, help='threads for the parallel throughput run')
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+- latency jitter in seconds')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='probability of a 429 response')
+    parser.add_argument('--rate-503', type=float, default=0.0, help='probability of a 503 response')
+    parser.add_argument('--parse-executor', choices=('inline', 'process'),
+                        help='also run columnar sweeps parsing kline payloads this way')
+    parser.add_argument('--skip-calls', action='store_true', help='only run the kline sweeps')
+    parser.add_argument('--output', help='JSON file, stdout if not given')
+    args = parser.parse_args(argv)
+
+    symbol_counts = [int(count) for count in args.symbols.split(',')]
+    mock = MockBinance(max(symbol_counts), args.latency, args.jitter, args.rate_429, args.rate_503).serve()
+    workspace = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    prepare_workspace(workspace.name)
+    # the package prints progress and errors, stdout only carries the report
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            from trade_binance.metrics import Metrics
+            from trade_binance.rate_limiter import RateLimiter
+
+            RateLimiter().configure(mock.rate_limits)
+            Metrics().reset()
+            report = {
+                'meta': {'time': datetime.now().isoformat(), 'python': platform.python_version(),
+                         'platform': platform.platform(), 'args': vars(args)},
+                'sweeps': bench_sweeps(mock, symbol_counts, args.repeat, args.limit, False)
+                + bench_sweeps(mock, symbol_counts, args.repeat, args.limit, True),
+            }
+            if args.parse_executor:
+                executor = None if args.parse_executor == 'inline' else args.parse_executor
+                report['sweeps'] += bench_sweeps(mock, symbol_counts, args.repeat, args.limit, True, executor)
+            report['parse'] = bench_parse()
+            report['store'] = bench_store(os.path.join(workspace.name, 'data', 'klines'))
+            if not args.skip_calls:
+                from trade_binance.binance_api_wrapper import BinanceAPIWrapper
+
+                api = BinanceAPIWrapper(base_url=mock.base_url)
+                try:
+                    report['calls'] = bench_calls(api, args.calls, args.threads)
+                finally:
+                    api.close()
+            report['metrics'] = Metrics().snapshot()
+            report['server'] = {'requests': mock.requests, 'injected': mock.injected}
+        finally:
+            os.chdir(cwd)
+            mock.stop()
+            workspace.cleanup()
+
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as file_object:
+            file_object.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+from aiohttp import web
+
+MINUTE = 60000
+
+
+class LocalBinance:
+    """
+    Local stand-in for the klines REST endpoint and the combined websocket stream.
+    """
+    def __init__(self):
+        self.candles = {'BTCUSDT': [[i * MINUTE, str(i), '0', '0', str(i + 1), '10']
+                                    for i in range(5)],
+                        'ETHUSDT': [[i * MINUTE, str(i), '0', '0', str(i + 2), '20']
+                                    for i in range(5)]}
+        self.rest_calls = []
+        self.fail_after = None
+        self.sockets = []
+        self.subscriptions = []
+        self.loop = None
+        self.port = None
+        self.ready = threading.Event()
+
+    async def klines(self, request):
+        symbol = request.query['symbol']
+        limit = int(request.query['limit'])
+        start_time = int(request.query.get('startTime', 0))
+        end_time = int(request.query.get('endTime', 2 ** 62))
+        self.rest_calls.append(dict(request.query))
+        if self.fail_after is not None and len(self.rest_calls) > self.fail_after:
+            return web.Response(status=503)
+        rows = [row for row in self.candles[symbol] if start_time <= row[0] <= end_time]
+        return web.json_response(rows[-limit:] if 'startTime' not in request.query else rows[:limit])
+
+    async def stream(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        async for msg in ws:
+            self.subscriptions.append(msg.json())
+            await ws.send_json({'result': None, 'id': msg.json()['id']})
+        return ws
+
+    def push(self, symbol, open_time, close, closed=False):
+        data = {'e': 'kline', 's': symbol,
+                'k': {'t': open_time, 'o': '1', 'h': '9', 'l': '0', 'c': close, 'v': '5', 'x': closed}}
+        message = {'stream': symbol.lower() + '@kline_1m', 'data': data}
+        asyncio.run_coroutine_threadsafe(self.sockets[-1].send_json(message), self.loop).result()
+
+    def drop(self):
+        asyncio.run_coroutine_threadsafe(self.sockets[-1].close(), self.loop).result()
+
+    def serve(self):
+        async def main():
+            self.loop = asyncio.get_running_loop()
+            app = web.Application()
+            app.router.add_get('/api/v3/klines', self.klines)
+            app.router.add_get('/stream', self.stream)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            self.ready.set()
+            await asyncio.Event().wait()
+
+        threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+        self.ready.wait(5)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+from unittest.mock import patch
+
+from tests.local_binance import wait_for
+from trade_binance.account_cache import AccountCache
+
+
+class LocalUserData:
+    """
+    Local stand-in for the listenKey endpoints, the account snapshot and the user data stream.
+    """
+    def __init__(self):
+        self.keys = 0
+        self.requests = []
+        self.sockets = {}
+        self.loop = None
+        self.port = None
+        self.ready = threading.Event()
+
+    async def listen_key(self, request):
+        self.requests.append((request.method, request.path, request.query.get('listenKey')))
+        if request.method == 'POST':
+            self.keys += 1
+            return web.json_response({'listenKey': f'key{self.keys}'})
+        return web.json_response({})
+
+    async def account(self, request):
+        return web.json_response({'updateTime': 1000, 'balances': [
+            {'asset': 'BNB', 'free': '0.5', 'locked': '0'},
+            {'asset': 'USDT', 'free': '100', 'locked': '20'}]})
+
+    async def margin_account(self, request):
+        return web.json_response({'tradeEnabled': True, 'userAssets': [
+            {'asset': 'BNB', 'free': '0.5', 'locked': '0', 'borrowed': '0', 'interest': '0', 'netAsset': '0.5'}]})
+
+    async def stream(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets[request.match_info['key']] = ws
+        async for _ in ws:
+            pass
+        return ws
+
+    def push(self, key, message):
+        asyncio.run_coroutine_threadsafe(self.sockets[key].send_json(message), self.loop).result()
+
+    def serve(self):
+        async def main():
+            self.loop = asyncio.get_running_loop()
+            app = web.Application()
+            app.router.add_route('*', '/api/v3/userDataStream', self.listen_key)
+            app.router.add_route('*', '/sapi/v1/userDataStream', self.listen_key)
+            app.router.add_get('/api/v3/account', self.account)
+            app.router.add_get('/sapi/v1/margin/account', self.margin_account)
+            app.router.add_get('/ws/{key}', self.stream)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            self.ready.set()
+            await asyncio.Event().wait()
+
+        threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+        self.ready.wait(5)
+
+
+@pytest.fixture(autouse=True)
+def no_log():
+    with patch('trade_binance.account_cache.write_log'), patch('trade_binance.binance_stream.write_log'), \
+            patch('trade_binance.async_binance_api_wrapper.write_log'), patch('trade_binance.retry.write_log'):
+        yield
+
+
+def position(update_time, asset, free, locked='0'):
+    return {'e': 'outboundAccountPosition', 'E': update_time, 'u': update_time,
+            'B': [{'a': asset, 'f': free, 'l': locked}]}
+
+
+def test_snapshot_then_stream_updates_and_key_rotation():
+    server = LocalUserData()
+    server.serve()
+    url = f'http://127.0.0.1:{server.port}'
+    cache = AccountCache('spot', rest_url=url, api_key='key', api_secret='secret',
+                         ws_url=f'ws://127.0.0.1:{server.port}/ws',
+                         keepalive_interval=0.1, reconnect_delay=0.05)
+    cache.start()
+    try:
+        assert cache.wait_connected(5)
+        assert cache.balance('USDT') == (100.0, 20.0)
+        assert cache.free('ETH') == 0.0
+
+        server.push('key1', position(900, 'BNB', '9'))
+        server.push('key1', position(2000, 'BNB', '0.25', '0.1'))
+        assert wait_for(lambda: cache.balance('BNB') == (0.25, 0.1))
+        assert wait_for(lambda: ('PUT', '/api/v3/userDataStream', 'key1') in server.requests)
+
+        server.push('key1', {'e': 'listenKeyExpired', 'E': 3000})
+        assert wait_for(lambda: cache.listen_key == 'key2' and cache.connected.is_set())
+        assert cache.reconnects == 1
+    finally:
+        cache.stop()
+    assert ('DELETE', '/api/v3/userDataStream', 'key2') in server.requests
+    assert cache.free('BNB') is None
+
+
+def test_events_older_than_a_margin_snapshot_are_ignored():
+    server = LocalUserData()
+    server.serve()
+    url = f'http://127.0.0.1:{server.port}'
+    cache = AccountCache('margin', rest_url=url, api_key='key', api_secret='secret',
+                         ws_url=f'ws://127.0.0.1:{server.port}/ws')
+    cache.start()
+    try:
+        assert cache.wait_connected(5)
+        assert cache.balance('BNB') == (0.5, 0.0)
+        now = cache.api.timestamp()
+
+        # queued before the snapshot was requested, the snapshot already holds what followed it
+        server.push('key1', position(now - 60000, 'BNB', '9'))
+        server.push('key1', position(now - 60000, 'ETH', '3'))
+        server.push('key1', position(now + 1000, 'USDT', '50'))
+        assert wait_for(lambda: cache.balance('USDT') == (50.0, 0.0))
+        assert cache.balance('BNB') == (0.5, 0.0)
+        assert cache.balance('ETH') == (0.0, 0.0)
+    finally:
+        cache.stop()
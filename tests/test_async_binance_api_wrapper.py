@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import hmac
+from urllib.parse import urlencode
+
+import pytest
+from aiohttp import web
+from unittest.mock import patch
+
+from trade_binance.async_binance_api_wrapper import AsyncBinanceAPIWrapper
+from trade_binance.symbol_filter import SymbolFilterIndex
+
+API_SECRET = 'secret'
+received = []
+
+
+def signature_valid(request):
+    query = dict(request.query)
+    signature = query.pop('signature')
+    expected = hmac.new(API_SECRET.encode(), urlencode(query).encode(), hashlib.sha256).hexdigest()
+    return signature == expected and request.headers['X-MBX-APIKEY'] == 'key'
+
+
+async def new_margin_order(request):
+    if not signature_valid(request):
+        return web.json_response({'code': -1022, 'msg': 'Signature for this request is not valid.'}, status=400)
+    if request.query['symbol'] == 'DOGEUSDT':
+        return web.json_response({'code': -2010, 'msg': 'Balance is not enough'}, status=400)
+    received.append((request.query['symbol'], request.query.get('quantity'), request.query.get('price')))
+    await asyncio.sleep(0.2)
+    return web.json_response({'symbol': request.query['symbol'], 'orderId': 1, 'type': request.query['type']})
+
+
+def run_with_server(test):
+    async def main():
+        app = web.Application()
+        app.router.add_post('/sapi/v1/margin/order', new_margin_order)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with AsyncBinanceAPIWrapper(f'http://127.0.0.1:{port}', 'key', API_SECRET) as api:
+                return await test(api)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def no_log():
+    with patch('trade_binance.async_binance_api_wrapper.write_log'), \
+            patch('trade_binance.binance_api_wrapper.write_log'):
+        yield
+
+
+def test_signed_orders_run_concurrently():
+    async def test(api):
+        started = asyncio.get_running_loop().time()
+        responses = await asyncio.gather(*(
+            api.my_new_margin_order(symbol, 'BUY', 'LIMIT', quantity=1, price='0.1', timeInForce='GTC')
+            for symbol in ('BTCUSDT', 'ETHUSDT', 'BNBUSDT')))
+        return responses, asyncio.get_running_loop().time() - started
+
+    responses, elapsed = run_with_server(test)
+
+    assert [response['symbol'] for response in responses] == ['BTCUSDT', 'ETHUSDT', 'BNBUSDT']
+    assert responses[0]['type'] == 'LIMIT'
+    assert elapsed < 0.5
+
+
+def test_client_errors_are_classified_like_the_sync_wrapper():
+    async def test(api):
+        with patch.object(api.gmailAPIWrapper, 'send_email') as send_email:
+            response = await api.my_new_margin_order('DOGEUSDT', 'BUY', 'MARKET', quantity=1)
+        return response, send_email
+
+    response, send_email = run_with_server(test)
+
+    # a known rejection stops retrying without an alert
+    assert response is None
+    send_email.assert_not_called()
+
+
+def test_batch_orders_are_validated_and_sequenced_per_symbol():
+    symbol_filters = SymbolFilterIndex()
+    symbol_filters.add('BTC', 'BTCUSDT', '0.01', '0.00001', '0.00001', '5')
+    symbol_filters.add('ETH', 'ETHUSDT', '0.01', '0.0001', '0.0001', '5')
+    symbol_filters.add('DOGE', 'DOGEUSDT', '0.00001', '1', '1', '1')
+    orders = [
+        {'symbol': 'BTCUSDT', 'side': 'BUY', 'order_type': 'LIMIT', 'quantity': 0.0012345, 'price': 60000.129,
+         'timeInForce': 'GTC'},
+        {'symbol': 'ETHUSDT', 'side': 'SELL', 'order_type': 'LIMIT', 'quantity': 0.5, 'price': 3000.001,
+         'timeInForce': 'GTC'},
+        {'symbol': 'BTCUSDT', 'side': 'SELL', 'order_type': 'MARKET', 'quantity': 0.002},
+        {'symbol': 'ETHUSDT', 'side': 'BUY', 'order_type': 'LIMIT', 'quantity': 0.001, 'price': 3000,
+         'timeInForce': 'GTC'},
+        {'symbol': 'DOGEUSDT', 'side': 'BUY', 'order_type': 'MARKET', 'quantity': 100},
+        {'symbol': 'DOGEUSDT', 'side': 'SELL', 'order_type': 'MARKET', 'quantity': 100},
+        {'symbol': 'XYZUSDT', 'side': 'BUY', 'order_type': 'MARKET', 'quantity': 1},
+    ]
+    received.clear()
+
+    async def test(api):
+        started = asyncio.get_running_loop().time()
+        with patch.object(api.gmailAPIWrapper, 'send_email'):
+            results = await api.my_new_margin_orders(orders, symbol_filters)
+        return results, asyncio.get_running_loop().time() - started
+
+    results, elapsed = run_with_server(test)
+
+    assert [result['ok'] for result in results] == [True, True, True, False, False, False, False]
+    assert [result['index'] for result in results] == list(range(len(orders)))
+    assert results[3]['error'] == 'Filter failure: LOT_SIZE or NOTIONAL'
+    assert results[4]['error'] == 'Balance is not enough'
+    assert results[5]['error'].startswith('Skipped')
+    assert results[6]['error'] == 'Invalid symbol.'
+    assert [row for row in received if row[0] == 'BTCUSDT'] == [('BTCUSDT', '0.00123', '60000.12'),
+                                                               ('BTCUSDT', '0.00200', None)]
+    assert ('ETHUSDT', '0.5000', '3000.01') in received
+    assert orders[0]['quantity'] == 0.0012345
+    # the two BTC orders run one after the other, the other symbols alongside them
+    assert 0.4 <= elapsed < 0.6
@@ -0,0 +1,111 @@
+import random
+
+import pytest
+from unittest.mock import patch
+
+from trade_binance.clock_sync import ClockSync, ClockSyncedSpot
+
+
+class FakeClock:
+    """
+    Local clock in seconds and a server running `offset` ms ahead, drifting `drift` ms per second.
+    """
+    def __init__(self, offset, drift=0.0):
+        self.local = 1_700_000_000.0
+        self.offset = offset
+        self.drift = drift
+        self.started = self.local
+        self.delays = []
+
+    def now(self):
+        return self.local
+
+    def server_time(self):
+        # slow samples spend most of their round trip on the way back, which biases the midpoint
+        outbound, inbound = self.delays.pop(0)
+        self.local += outbound
+        server = self.local * 1000 + self.offset + self.drift * (self.local - self.started)
+        self.local += inbound
+        return server
+
+
+@pytest.fixture(autouse=True)
+def no_log():
+    with patch('trade_binance.clock_sync.write_log'):
+        yield
+
+
+def test_lowest_rtt_samples_give_the_offset():
+    clock = FakeClock(offset=1500)
+    clock.delays = [(0.005, 0.005)] * 4 + [(0.01, 0.4)] * 12
+    clock_sync = ClockSync(clock.server_time, smoothing=1.0, now=clock.now)
+    clock_sync.resync(16)
+
+    # the naive midpoint of a slow sample is off by 195ms, the fast samples are exact
+    assert abs(clock_sync.offset - 1500) < 1
+    assert abs(clock_sync.timestamp() - (clock.local * 1000 + 1500)) < 1
+
+
+def test_drift_is_extrapolated_between_samples():
+    clock = FakeClock(offset=200, drift=0.2)
+    clock.delays = [(0.005, 0.005)] * 20
+    clock_sync = ClockSync(clock.server_time, smoothing=1.0, now=clock.now)
+    for _ in range(20):
+        clock_sync.resync(1)
+        clock.local += 30
+
+    assert clock_sync.drift == pytest.approx(0.2, abs=0.01)
+    expected = clock.local * 1000 + 200 + 0.2 * (clock.local - clock.started)
+    assert abs(clock_sync.timestamp() - expected) < 5
+
+
+def test_jittered_burst_does_not_fit_a_drift():
+    rng = random.Random(0)
+    errors = []
+    for _ in range(200):
+        clock = FakeClock(offset=700)
+        clock.delays = [(rng.uniform(0.02, 0.04), rng.uniform(0.02, 0.04)) for _ in range(5)]
+        clock_sync = ClockSync(clock.server_time, now=clock.now)
+        clock_sync.resync()
+        clock.local += 30
+        errors.append(clock_sync.timestamp() - (clock.local * 1000 + 700))
+
+    assert clock_sync.drift == 0.0
+    # a midpoint is off by at most half the round-trip asymmetry
+    assert max(abs(error) for error in errors) < 15
+
+
+def test_drift_is_clamped_to_a_plausible_rate():
+    clock = FakeClock(offset=0, drift=5.0)
+    clock.delays = [(0.005, 0.005)] * 20
+    clock_sync = ClockSync(clock.server_time, smoothing=1.0, now=clock.now)
+    for _ in range(20):
+        clock_sync.resync(1)
+        clock.local += 30
+
+    assert clock_sync.drift == 0.5
+
+
+def test_failed_samples_keep_the_local_clock():
+    def fail():
+        raise ConnectionError('reset')
+
+    clock_sync = ClockSync(fail, now=lambda: 100.0)
+    clock_sync.resync()
+    assert clock_sync.offset is None
+    assert clock_sync.timestamp() == 100000
+
+
+def test_spot_client_signs_with_corrected_time():
+    clock = FakeClock(offset=-3000)
+    clock.delays = [(0.005, 0.005)]
+    clock_sync = ClockSync(clock.server_time, now=clock.now)
+    clock_sync.resync(1)
+    client = ClockSyncedSpot(api_key='key', api_secret='secret', clock_sync=clock_sync)
+
+    with patch.object(client, 'send_request') as send_request:
+        client.account()
+
+    payload = send_request.call_args[0][2]
+    assert payload['timestamp'] == int(clock.local * 1000 - 3000)
+    assert 'signature' in payload
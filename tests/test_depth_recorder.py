@@ -0,0 +1,34 @@
+import numpy as np
+
+from trade_binance.depth_recorder import DepthRecorder, depth_file_path, read_depth_snapshots
+
+DEPTH = {'lastUpdateId': 7, 'bids': [['10.00', '1.5'], ['9.99', '2']], 'asks': [['10.01', '3']]}
+
+
+def test_recorded_snapshots_are_read_back_as_records(tmp_path):
+    depth_recorder = DepthRecorder(str(tmp_path), levels=3, flush_interval=60)
+    timestamp = 1700000000000
+    depth_recorder.record('BTCUSDT', DEPTH, timestamp)
+    depth_recorder.record('ETHUSDT', dict(DEPTH, lastUpdateId=8), timestamp + 1)
+    depth_recorder.close()
+
+    records = read_depth_snapshots(depth_file_path(str(tmp_path), timestamp))
+
+    assert records['time'].tolist() == [timestamp, timestamp + 1]
+    assert records['symbol'].tolist() == [b'BTCUSDT', b'ETHUSDT']
+    assert records['last_update_id'].tolist() == [7, 8]
+    assert records['bids'][0, :2].tolist() == [[10.0, 1.5], [9.99, 2.0]]
+    assert np.isnan(records['bids'][0, 2]).all()
+    assert records['asks'][1, 0].tolist() == [10.01, 3.0]
+
+
+def test_appends_to_an_existing_day_file(tmp_path):
+    timestamp = 1700000000000
+    for i in range(2):
+        depth_recorder = DepthRecorder(str(tmp_path), levels=2, flush_interval=0)
+        depth_recorder.record('BTCUSDT', DEPTH, timestamp + i)
+        depth_recorder.close()
+
+    records = read_depth_snapshots(depth_file_path(str(tmp_path), timestamp))
+
+    assert records['time'].tolist() == [timestamp, timestamp + 1]
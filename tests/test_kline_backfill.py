@@ -0,0 +1,95 @@
+import json
+
+import pytest
+from unittest.mock import patch
+
+from tests.local_binance import MINUTE, LocalBinance
+from trade_binance.kline_backfill import page_ranges
+from trade_binance.kline_binance_dao import KlineBinanceDAO
+from trade_binance.kline_disk_store import KlineDiskStore, kline_records, read_kline_records
+
+
+@pytest.fixture
+def local_binance():
+    server = LocalBinance()
+    for symbol in ('BTCUSDT', 'ETHUSDT'):
+        server.candles[symbol] = [[i * MINUTE, str(i), str(i + 1), '0', str(i + 0.5), '10'] for i in range(10)]
+    server.serve()
+    with patch('trade_binance.kline_backfill.write_log'), \
+            patch('trade_binance.kline_backfill.backoff_delay', return_value=0):
+        yield server
+
+
+def test_page_ranges_cover_the_range_with_aligned_pages():
+    assert page_ranges(30000, 5 * MINUTE, '1m', 2) == [
+        (MINUTE, 3 * MINUTE - 1), (3 * MINUTE, 5 * MINUTE - 1), (5 * MINUTE, 5 * MINUTE)]
+
+
+def test_backfill_writes_every_page_in_order(local_binance, tmp_path):
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}',
+                          kline_store=KlineDiskStore(str(tmp_path)))
+
+    written = dao.backfill_klines('1m', 0, 9 * MINUTE, 'USDT', {'BTC': 0, 'ETH': 1}, page_limit=3,
+                                  pages_in_flight=2)
+
+    assert written == {'BTCUSDT': 10, 'ETHUSDT': 10}
+    assert len(local_binance.rest_calls) == 8
+    records = read_kline_records(str(tmp_path / 'BTCUSDT_1m.bin'))
+    assert records['open_time'].tolist() == [i * MINUTE for i in range(10)]
+    assert records['close'].tolist() == [i + 0.5 for i in range(10)]
+    assert json.loads((tmp_path / 'backfill_1m.json').read_text()) == {
+        'BTCUSDT': {'start_time': 0, 'next_time': 9 * MINUTE + 1},
+        'ETHUSDT': {'start_time': 0, 'next_time': 9 * MINUTE + 1}}
+    assert dao.metrics.snapshot()['backfill_klines']['weight'] >= 8
+
+
+def test_interrupted_backfill_resumes_from_the_checkpoint(local_binance, tmp_path):
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}',
+                          kline_store=KlineDiskStore(str(tmp_path)))
+    local_binance.fail_after = 2
+
+    with patch.object(dao.gmailAPIWrapper, 'send_email') as send_email:
+        dao.backfill_klines('1m', 0, 9 * MINUTE, 'USDT', {'BTC': 0}, page_limit=3, pages_in_flight=1,
+                            retries=2)
+    send_email.assert_called_once()
+    assert not (tmp_path / 'BTCUSDT_1m.bin').exists()
+    assert read_kline_records(str(tmp_path / 'backfill' / 'BTCUSDT_1m.bin'))['open_time'].tolist() == [
+        i * MINUTE for i in range(6)]
+
+    local_binance.fail_after = None
+    local_binance.rest_calls.clear()
+    written = dao.backfill_klines('1m', 0, 9 * MINUTE, 'USDT', {'BTC': 0}, page_limit=3,
+                                  pages_in_flight=1)
+
+    assert written == {'BTCUSDT': 10}
+    assert [int(call['startTime']) for call in local_binance.rest_calls] == [6 * MINUTE, 9 * MINUTE]
+    records = read_kline_records(str(tmp_path / 'BTCUSDT_1m.bin'))
+    assert records['open_time'].tolist() == [i * MINUTE for i in range(10)]
+    assert not (tmp_path / 'backfill' / 'BTCUSDT_1m.bin').exists()
+
+
+def test_backfill_from_an_earlier_start_ignores_the_checkpoint(local_binance, tmp_path):
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}',
+                          kline_store=KlineDiskStore(str(tmp_path)))
+    dao.backfill_klines('1m', 6 * MINUTE, 9 * MINUTE, 'USDT', {'BTC': 0}, page_limit=3)
+    local_binance.rest_calls.clear()
+
+    written = dao.backfill_klines('1m', 0, 9 * MINUTE, 'USDT', {'BTC': 0}, page_limit=3)
+
+    assert written == {'BTCUSDT': 6}
+    assert int(local_binance.rest_calls[0]['startTime']) == 0
+    records = read_kline_records(str(tmp_path / 'BTCUSDT_1m.bin'))
+    assert records['open_time'].tolist() == [i * MINUTE for i in range(10)]
+
+
+def test_backfill_fills_history_before_candles_stored_by_sweeps(local_binance, tmp_path):
+    store = KlineDiskStore(str(tmp_path))
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}', kline_store=store)
+    store.append('BTCUSDT', '1m', kline_records(local_binance.candles['BTCUSDT'][7:]))
+    reader = store.read('BTCUSDT', '1m')
+
+    written = dao.backfill_klines('1m', 0, 9 * MINUTE, 'USDT', {'BTC': 0}, page_limit=3)
+
+    assert written == {'BTCUSDT': 7}
+    assert store.read('BTCUSDT', '1m')['open_time'].tolist() == [i * MINUTE for i in range(10)]
+    assert reader['open_time'].tolist() == [7 * MINUTE, 8 * MINUTE, 9 * MINUTE]
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from tests.local_binance import MINUTE, LocalBinance
+from trade_binance.kline_binance_dao import KlineBinanceDAO
+from trade_binance.kline_disk_store import KlineDiskStore
+
+
+@pytest.fixture
+def local_binance():
+    server = LocalBinance()
+    server.serve()
+    return server
+
+
+def test_cold_sweep(local_binance):
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}')
+    dao.metrics.reset()
+
+    results = dao.get_binance_margin_klines_data('1m', 2, None, 'USDT', {'BTC': 0, 'ETH': 1})
+
+    assert sorted(results, key=lambda row: (row[4], row[0])) == [
+        [3 * MINUTE, '3', '4', '10', 'BTCUSDT'], [4 * MINUTE, '4', '5', '10', 'BTCUSDT'],
+        [3 * MINUTE, '3', '5', '20', 'ETHUSDT'], [4 * MINUTE, '4', '6', '20', 'ETHUSDT']]
+    assert dao.sweep_stats['new_connections'] == 2
+    snapshot = dao.metrics.snapshot()
+    assert snapshot['gather_with_concurrency']['count'] == 2
+    assert snapshot['gather_with_concurrency']['bytes'] > 0
+    assert snapshot['get_binance_margin_klines_data']['count'] == 1
+
+
+def test_persistent_sweeps_reuse_connections(local_binance):
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}', persistent=True)
+    try:
+        dao.get_binance_margin_klines_data('1m', 2, None, 'USDT', {'BTC': 0, 'ETH': 1})
+        assert dao.sweep_stats['new_connections'] == 2
+
+        results = dao.get_binance_margin_klines_data('1m', 2, None, 'USDT', {'BTC': 0, 'ETH': 1})
+
+        assert len(results) == 4
+        assert dao.sweep_stats['new_connections'] == 0
+        assert dao.sweep_stats['reused_connections'] == 2
+    finally:
+        dao.close()
+
+
+def test_one_sweep_serves_several_intervals(local_binance):
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}')
+
+    resampled = dao.get_binance_margin_klines_resampled(['1m', '3m'], 2, 'USDT', {'BTC': 0, 'ETH': 1})
+
+    assert len(local_binance.rest_calls) == 2
+    assert local_binance.rest_calls[0]['interval'] == '1m'
+    three = resampled['3m']
+    assert three.open_time[three.symbol_slice('BTC')].tolist() == [0, 3 * MINUTE]
+    assert three.close[three.symbol_slice('BTC')].tolist() == [3.0, 5.0]
+    assert three.volume[three.symbol_slice('ETH')].tolist() == [60.0, 40.0]
+    assert resampled['1m'].open_time[resampled['1m'].symbol_slice('ETH')].tolist() == [3 * MINUTE, 4 * MINUTE]
+
+
+def test_columnar_sweeps_are_appended_to_the_store(local_binance, tmp_path):
+    store = KlineDiskStore(str(tmp_path))
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}', kline_store=store)
+
+    dao.get_binance_margin_klines_columns('1m', 3, None, 'USDT', {'BTC': 0, 'ETH': 1})
+
+    assert store.read('BTCUSDT', '1m')['open_time'].tolist() == [2 * MINUTE, 3 * MINUTE, 4 * MINUTE]
+    assert store.read('ETHUSDT', '1m')['close'].tolist() == [4.0, 5.0, 6.0]
+
+
+def test_classic_sweeps_are_appended_to_the_store(local_binance, tmp_path):
+    store = KlineDiskStore(str(tmp_path))
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}', kline_store=store)
+
+    dao.get_binance_margin_klines_data('1m', 3, None, 'USDT', {'BTC': 0, 'ETH': 1})
+    dao.get_binance_margin_klines_data('1m', 3, 4 * MINUTE, 'USDT', {'BTC': 0, 'ETH': 1})
+
+    assert store.read('BTCUSDT', '1m')['open_time'].tolist() == [2 * MINUTE, 3 * MINUTE, 4 * MINUTE]
+    assert store.read('ETHUSDT', '1m')['close'].tolist() == [4.0, 5.0, 6.0]
+
+
+def test_columnar_sweeps_parse_in_a_process_pool(local_binance):
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}', parse_executor='process')
+    dao.kline_parser.min_offload_size = 0
+    try:
+        kline_columns = dao.get_binance_margin_klines_columns('1m', 2, None, 'USDT', {'BTC': 0, 'ETH': 1})
+        latest = dao.get_binance_margin_klines_columns('1m', 2, 4 * MINUTE, 'USDT', {'BTC': 0, 'ETH': 1})
+    finally:
+        dao.close()
+
+    assert kline_columns.close[kline_columns.symbol_slice('ETH')].tolist() == [5.0, 6.0]
+    assert kline_columns.open_time.dtype == np.int64
+    assert latest.open_time.tolist() == [4 * MINUTE, 4 * MINUTE]
+
+
+def test_resampling_pages_history_one_request_cannot_hold(local_binance):
+    local_binance.candles['BTCUSDT'] = [[i * MINUTE, str(i), str(i + 1), '0', str(i), '1'] for i in range(1500)]
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}')
+
+    paged = dao.get_binance_margin_klines_paged
+    with patch.object(dao, 'get_binance_margin_klines_paged',
+                      lambda *args: paged(*args, now_ms=1499 * MINUTE + 30000)):
+        hourly = dao.get_binance_margin_klines_resampled(['1h'], 20, 'USDT', {'BTC': 0})['1h']
+
+    assert [(int(call['startTime']), call.get('endTime')) for call in local_binance.rest_calls] == [
+        (240 * MINUTE, str(1240 * MINUTE - 1)), (1240 * MINUTE, None)]
+    assert hourly.open_time.tolist() == [hour * 60 * MINUTE for hour in range(5, 25)]
+    assert hourly.close[-2:].tolist() == [1439.0, 1499.0]
+    assert hourly.high[0] == 360.0
+    assert hourly.volume.tolist() == [60.0] * 20
@@ -0,0 +1,36 @@
+from trade_binance.kline_cache import KlineWindowCache, merge_klines
+
+MINUTE = 60000
+
+
+def candle(open_time, close):
+    return [open_time, '1', '2', '0.5', close, '10', open_time + MINUTE - 1]
+
+
+def test_first_request_is_a_full_load():
+    kline_cache = KlineWindowCache('1m', 3)
+    assert kline_cache.start_time('BTC') is None
+
+
+def test_incremental_update_refreshes_in_progress_candle_and_evicts_oldest():
+    kline_cache = KlineWindowCache('1m', 3)
+    kline_cache.update('BTC', [candle(0, '1'), candle(MINUTE, '2'), candle(2 * MINUTE, '3')], True)
+
+    assert kline_cache.start_time('BTC', now_ms=3 * MINUTE) == 2 * MINUTE
+
+    rows = kline_cache.update('BTC', [candle(2 * MINUTE, '3.5'), candle(3 * MINUTE, '4')], False)
+
+    assert rows == [candle(MINUTE, '2'), candle(2 * MINUTE, '3.5'), candle(3 * MINUTE, '4')]
+
+
+def test_gap_longer_than_window_needs_full_load():
+    kline_cache = KlineWindowCache('1m', 3)
+    kline_cache.update('BTC', [candle(0, '1'), candle(MINUTE, '2'), candle(2 * MINUTE, '3')], True)
+
+    assert kline_cache.start_time('BTC', now_ms=4 * MINUTE) is None
+
+
+def test_merge_skips_stale_candles():
+    window = [candle(MINUTE, '2')]
+    merge_klines(window, [candle(0, '1'), candle(MINUTE, '2.5')])
+    assert window == [candle(MINUTE, '2.5')]
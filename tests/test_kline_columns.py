@@ -0,0 +1,50 @@
+import numpy as np
+
+from trade_binance.kline_columns import KlineColumns
+
+
+def candle(open_time, close):
+    return [open_time, '1.5', '2', '0.5', close, '10', open_time + 59999, '0', 3, '0', '0', '0']
+
+
+def test_append_parses_rows_into_columns():
+    kline_columns = KlineColumns({'BTC': 0, 'ETH': 1}, 2)
+    kline_columns.append('ETH', [candle(0, '1.25'), candle(60000, '1.75')])
+    kline_columns.append('BTC', [candle(60000, '3')])
+
+    assert kline_columns.size == 3
+    assert kline_columns.open_time.dtype == np.int64
+    assert kline_columns.open_time.tolist() == [0, 60000, 60000]
+    assert kline_columns.close.tolist() == [1.25, 1.75, 3.0]
+    assert kline_columns.symbol_id.tolist() == [1, 1, 0]
+    assert kline_columns.close[kline_columns.symbol_slice('ETH')].tolist() == [1.25, 1.75]
+
+
+def test_dataframe_shares_memory_with_columns():
+    kline_columns = KlineColumns(['BTC'], 2)
+    kline_columns.append('BTC', [candle(0, '1'), candle(60000, '2')])
+
+    df = kline_columns.to_dataframe()
+
+    assert np.shares_memory(df['close'].to_numpy(), kline_columns.close)
+    assert df['symbol'].tolist() == ['BTC', 'BTC']
+
+
+def test_store_grows_past_preallocated_capacity():
+    kline_columns = KlineColumns(['BTC', 'ETH'], 1)
+    kline_columns.append('BTC', [candle(0, '1'), candle(60000, '2')])
+    kline_columns.append('ETH', [candle(0, '3'), candle(60000, '4')])
+
+    assert kline_columns.close.tolist() == [1, 2, 3, 4]
+
+
+def test_last_closes_takes_the_latest_candle_of_each_symbol():
+    kline_columns = KlineColumns(['BTC', 'ETH', 'BNB'], 2)
+    kline_columns.append('ETH', [candle(60000, '1.75'), candle(0, '1.25')])
+    kline_columns.append('BTC', [candle(0, '2'), candle(60000, '3')])
+
+    symbols, closes = kline_columns.last_closes()
+
+    assert symbols == ['BTC', 'ETH']
+    assert closes.tolist() == [3.0, 1.75]
+    assert KlineColumns(['BTC'], 1).last_closes()[0] == []
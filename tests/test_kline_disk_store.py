@@ -0,0 +1,65 @@
+import numpy as np
+
+from trade_binance.kline_columns import KlineColumns
+from trade_binance.kline_disk_store import KLINE_RECORD, KlineDiskStore
+
+MINUTE = 60000
+
+
+def records(open_times):
+    result = np.zeros(len(open_times), dtype=KLINE_RECORD)
+    result['open_time'] = open_times
+    result['close'] = np.asarray(open_times) / MINUTE
+    return result
+
+
+def test_range_reads_are_views_of_the_memory_map(tmp_path):
+    store = KlineDiskStore(str(tmp_path))
+    assert store.append('BTCUSDT', '1m', records([i * MINUTE for i in range(100)])) == 100
+
+    window = store.read('BTCUSDT', '1m', 10 * MINUTE, 19 * MINUTE)
+
+    assert window['open_time'].tolist() == [i * MINUTE for i in range(10, 20)]
+    assert np.shares_memory(window, store.records('BTCUSDT', '1m'))
+    assert len(store.read('BTCUSDT', '1m', 200 * MINUTE)) == 0
+    assert len(store.read('ETHUSDT', '1m')) == 0
+
+
+def test_appends_skip_stored_candles_and_other_readers_see_them(tmp_path):
+    writer = KlineDiskStore(str(tmp_path))
+    reader = KlineDiskStore(str(tmp_path))
+    writer.append('BTCUSDT', '1m', records([0, MINUTE]))
+    assert len(reader.read('BTCUSDT', '1m')) == 2
+
+    assert writer.append('BTCUSDT', '1m', records([MINUTE, 2 * MINUTE, 3 * MINUTE])) == 2
+
+    assert reader.read('BTCUSDT', '1m')['open_time'].tolist() == [0, MINUTE, 2 * MINUTE, 3 * MINUTE]
+    assert KlineDiskStore(str(tmp_path)).append('BTCUSDT', '1m', records([3 * MINUTE])) == 0
+
+
+def test_older_candles_are_merged_into_the_file(tmp_path):
+    store = KlineDiskStore(str(tmp_path))
+    store.append('BTCUSDT', '1m', records([2 * MINUTE, 5 * MINUTE]))
+    reader = store.read('BTCUSDT', '1m')
+
+    assert store.append('BTCUSDT', '1m', records([0, MINUTE, 2 * MINUTE, 3 * MINUTE, 6 * MINUTE])) == 4
+
+    assert store.read('BTCUSDT', '1m')['open_time'].tolist() == [0, MINUTE, 2 * MINUTE, 3 * MINUTE,
+                                                                 5 * MINUTE, 6 * MINUTE]
+    assert KlineDiskStore(str(tmp_path)).read('BTCUSDT', '1m')['close'].tolist() == [0, 1, 2, 3, 5, 6]
+    assert reader['open_time'].tolist() == [2 * MINUTE, 5 * MINUTE]
+    assert store.append('BTCUSDT', '1m', records([7 * MINUTE])) == 1
+
+
+def test_sweeps_store_closed_candles_only(tmp_path):
+    store = KlineDiskStore(str(tmp_path))
+    kline_columns = KlineColumns(['BTC', 'ETH'], 3)
+    kline_columns.append('BTC', [[i * MINUTE, '1', '2', '0.5', str(i), '10'] for i in range(3)])
+    kline_columns.append('ETH', [[i * MINUTE, '1', '2', '0.5', str(i), '20'] for i in range(3)])
+
+    assert store.append_columns(kline_columns, '1m', 'USDT', now_ms=2 * MINUTE + 30000) == 4
+
+    stored = store.to_kline_columns(['BTC', 'ETH'], '1m', quote_asset='USDT')
+    assert stored.open_time.tolist() == [0, MINUTE, 0, MINUTE]
+    assert stored.volume[stored.symbol_slice('ETH')].tolist() == [20.0, 20.0]
+    assert store.to_kline_columns(['BTC'], '1m', 5 * MINUTE, quote_asset='USDT').size == 0
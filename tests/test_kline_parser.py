@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from trade_binance.kline_columns import KlineColumns
+from trade_binance.kline_parser import KlineParser, parse_klines
+
+
+def candle(open_time, close):
+    return [open_time, '1.5', '2.25', '0.5', close, '10.125', open_time + 59999, '0', 3, '0', '0', '0']
+
+
+@pytest.mark.parametrize('separators', [(',', ':'), (', ', ': ')])
+def test_parse_matches_the_row_by_row_conversion(separators):
+    rows = [candle(1700000000000 + i * 60000, f'{100 + i / 3:.8f}') for i in range(50)]
+    body = json.dumps(rows, separators=separators).encode()
+
+    open_time, values = parse_klines(body)
+
+    kline_columns = KlineColumns(['BTC'], 50)
+    kline_columns.append('BTC', rows)
+    assert open_time.dtype == np.int64
+    assert open_time.tolist() == kline_columns.open_time.tolist()
+    np.testing.assert_array_equal(values, kline_columns.values)
+
+
+def test_parse_handles_empty_and_irregular_payloads():
+    open_time, values = parse_klines(b'[]')
+    assert open_time.size == 0 and values.shape == (5, 0)
+
+    # rows of another width are read up to the columns every row has
+    body = json.dumps([candle(0, '1'), candle(60000, '2')[:6]]).encode()
+    open_time, values = parse_klines(body)
+    assert open_time.tolist() == [0, 60000]
+    assert values[3].tolist() == [1.0, 2.0]
+
+
+def test_only_the_kline_columns_are_converted():
+    rows = [candle(0, '1'), candle(60000, '2')]
+    rows[1][7] = 'not a number'
+
+    open_time, values = parse_klines(json.dumps(rows).encode())
+
+    assert values[3].tolist() == [1.0, 2.0]
+
+
+def test_large_payloads_are_parsed_in_the_executor():
+    body = json.dumps([candle(i * 60000, '1') for i in range(200)]).encode()
+    parser = KlineParser(ThreadPoolExecutor(1), min_offload_size=1000)
+    calls = []
+    submit = parser.executor.submit
+    parser.executor.submit = lambda *args: calls.append(args) or submit(*args)
+    try:
+        open_time, values = asyncio.run(parser.parse(body))
+        asyncio.run(parser.parse(b'[]'))
+    finally:
+        parser.close()
+
+    assert len(calls) == 1
+    assert open_time.size == 200
+
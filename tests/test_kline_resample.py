@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trade_binance.kline_columns import KlineColumns
+from trade_binance.kline_resample import bar_open_time, resample
+
+MINUTE = 60000
+
+
+def random_columns(symbols, start, count, seed=0):
+    rng = np.random.default_rng(seed)
+    kline_columns = KlineColumns(symbols, count)
+    for symbol in symbols:
+        close = 100 + rng.standard_normal(count).cumsum()
+        open_ = np.append(100, close[:-1])
+        values = np.stack((open_, np.maximum(open_, close) + rng.random(count),
+                           np.minimum(open_, close) - rng.random(count), close, rng.random(count) * 10))
+        kline_columns.append_arrays(symbol, start + np.arange(count, dtype=np.int64) * MINUTE, values)
+    return kline_columns
+
+
+def test_resample_matches_pandas():
+    # starts at 00:07 so the first 15m candle is incomplete and the last one in progress
+    kline_columns = random_columns(['BTC', 'ETH'], 7 * MINUTE, 100)
+
+    resampled = resample(kline_columns, '15m')
+
+    df = kline_columns.to_dataframe()
+    for symbol in ('BTC', 'ETH'):
+        rows = df[df['symbol'] == symbol]
+        rows = rows.set_index(pd.to_datetime(rows['open_time'], unit='ms'))
+        expected = rows.resample('15min').agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last',
+                                               'volume': 'sum'}).iloc[1:]
+        part = resampled.symbol_slice(symbol)
+        assert resampled.open_time[part].tolist() == expected.index.as_unit('ms').asi8.tolist()
+        for field in ('open', 'high', 'low', 'close', 'volume'):
+            np.testing.assert_allclose(getattr(resampled, field)[part], expected[field].to_numpy())
+    # 00:15 to 01:46, the 01:45 candle holds two minutes so far
+    assert resampled.open_time[resampled.symbol_slice('BTC')][[0, -1]].tolist() == [15 * MINUTE, 105 * MINUTE]
+    assert resampled.close[resampled.symbol_slice('BTC')][-1] == kline_columns.close[99]
+
+
+def test_resample_keeps_the_latest_candles_per_symbol():
+    kline_columns = random_columns(['BTC', 'ETH', 'BNB'], 0, 60)
+
+    resampled = resample(kline_columns, '5m', limit=3)
+
+    assert resampled.symbols == ['BTC', 'ETH', 'BNB']
+    assert resampled.open_time.tolist() == [45 * MINUTE, 50 * MINUTE, 55 * MINUTE] * 3
+    assert resampled.symbol_id.tolist() == [0, 0, 0, 1, 1, 1, 2, 2, 2]
+    assert resampled.close[resampled.symbol_slice('ETH')][-1] == kline_columns.close[119]
+
+
+def test_weekly_candles_open_on_monday():
+    # 2024-01-03 is a Wednesday, its week opened on Monday 2024-01-01
+    wednesday = 1704240000000
+    assert bar_open_time(np.array([wednesday]), '1w').tolist() == [1704067200000]
+    assert bar_open_time(np.array([wednesday + 5 * MINUTE]), '1h').tolist() == [wednesday]
+
+
+def test_resample_rejects_unaligned_intervals():
+    with pytest.raises(ValueError):
+        resample(KlineColumns(['BTC'], 1), '1M')
+    with pytest.raises(ValueError):
+        resample(KlineColumns(['BTC'], 1), '1m', base_interval='3m')
+
+
+def test_resample_sorts_unordered_candles():
+    kline_columns = random_columns(['BTC', 'ETH'], 0, 10)
+    shuffled = np.random.default_rng(1).permutation(20)
+    unordered = KlineColumns(['BTC', 'ETH'], 20)
+    for i in shuffled:
+        unordered.append_arrays(unordered.symbols[kline_columns.symbol_id[i]], kline_columns.open_time[i:i + 1],
+                                kline_columns.values[:, i:i + 1])
+
+    expected = resample(kline_columns, '5m')
+    resampled = resample(unordered, '5m')
+
+    assert resampled.open_time.tolist() == expected.open_time.tolist()
+    np.testing.assert_array_equal(resampled.values, expected.values)
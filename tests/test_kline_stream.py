@@ -0,0 +1,80 @@
+import pytest
+from unittest.mock import patch
+
+from tests.local_binance import MINUTE, LocalBinance, wait_for
+from trade_binance.kline_binance_dao import KlineBinanceDAO
+
+
+@pytest.fixture
+def local_binance():
+    server = LocalBinance()
+    server.serve()
+    with patch('trade_binance.binance_stream.write_log'), patch('trade_binance.kline_stream.write_log'):
+        yield server
+
+
+@pytest.fixture
+def dao(local_binance):
+    dao = KlineBinanceDAO(base_url=f'http://127.0.0.1:{local_binance.port}')
+    assert dao.start_kline_stream('1m', 3, 'USDT', {'BTC': 0, 'ETH': 1},
+                                  ws_url=f'http://127.0.0.1:{local_binance.port}/stream',
+                                  reconnect_delay=0.05, timeout=5)
+    yield dao
+    dao.stop_kline_stream()
+
+
+def test_stream_bootstraps_and_serves_rows(dao, local_binance):
+    assert local_binance.subscriptions[0]['params'] == ['btcusdt@kline_1m', 'ethusdt@kline_1m']
+
+    results = dao.get_binance_margin_klines_data('1m', 3, None, 'USDT', {'BTC': 0, 'ETH': 1})
+
+    assert results[:3] == [[2 * MINUTE, '2', '3', '10', 'BTCUSDT'],
+                           [3 * MINUTE, '3', '4', '10', 'BTCUSDT'],
+                           [4 * MINUTE, '4', '5', '10', 'BTCUSDT']]
+    assert len(results) == 6
+    assert dao.kline_results_symbols == ['BTC', 'ETH']
+
+
+def test_stream_updates_in_progress_and_new_candles(dao, local_binance):
+    local_binance.push('BTCUSDT', 4 * MINUTE, '4.5')
+    local_binance.push('BTCUSDT', 5 * MINUTE, '6')
+
+    assert wait_for(lambda: dao.kline_stream.klines['BTCUSDT'][-1][0] == 5 * MINUTE)
+    results = dao.get_binance_margin_klines_data('1m', 2, None, 'USDT', {'BTC': 0, 'ETH': 1})
+    assert results[:2] == [[4 * MINUTE, '1', '4.5', '5', 'BTCUSDT'],
+                           [5 * MINUTE, '1', '6', '5', 'BTCUSDT']]
+
+    results = dao.get_binance_margin_klines_data('1m', 3, 5 * MINUTE, 'USDT', {'BTC': 0, 'ETH': 1})
+    assert dao.kline_results_2 == [[5 * MINUTE, '1', '6', '5', 'BTCUSDT']]
+
+
+def test_stream_gap_fills_after_reconnect(dao, local_binance):
+    local_binance.candles['ETHUSDT'][-1][4] = '6.5'
+    local_binance.candles['ETHUSDT'].append([5 * MINUTE, '5', '0', '0', '7', '20'])
+    calls = len(local_binance.rest_calls)
+
+    local_binance.drop()
+
+    assert wait_for(lambda: dao.kline_stream.reconnects == 1 and dao.kline_stream.connected.is_set())
+    gap_fill_calls = local_binance.rest_calls[calls:]
+    assert {call['startTime'] for call in gap_fill_calls} == {str(4 * MINUTE)}
+    assert list(dao.kline_stream.klines['ETHUSDT']) == [[3 * MINUTE, '3', '0', '0', '5', '20'],
+                                                        [4 * MINUTE, '4', '0', '0', '6.5', '20'],
+                                                        [5 * MINUTE, '5', '0', '0', '7', '20']]
+
+
+def test_sweep_falls_back_to_rest_for_other_intervals(dao, local_binance):
+    calls = len(local_binance.rest_calls)
+
+    results = dao.get_binance_margin_klines_data('5m', 3, None, 'USDT', {'BTC': 0, 'ETH': 1})
+
+    assert len(results) == 6
+    assert [call['interval'] for call in local_binance.rest_calls[calls:]] == ['5m', '5m']
+
+
+def test_stream_fills_kline_columns(dao):
+    kline_columns = dao.get_binance_margin_klines_columns('1m', 2, None, 'USDT', {'BTC': 0, 'ETH': 1})
+
+    assert kline_columns.open_time.tolist() == [3 * MINUTE, 4 * MINUTE, 3 * MINUTE, 4 * MINUTE]
+    assert kline_columns.close.tolist() == [4.0, 5.0, 5.0, 6.0]
+    assert kline_columns.symbol_id.tolist() == [0, 0, 1, 1]
@@ -0,0 +1,71 @@
+import pytest
+from binance.error import ClientError
+from unittest.mock import MagicMock, patch
+
+from trade_binance import retry
+from trade_binance.metrics import LatencyHistogram, Metrics
+from trade_binance.retry import retry_on_exceptions
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    Metrics().reset()
+    retry.circuit_breakers.clear()
+    with patch('trade_binance.retry.write_log'):
+        yield
+    Metrics().reset()
+    retry.circuit_breakers.clear()
+
+
+def test_histogram_quantiles_are_within_a_bucket():
+    histogram = LatencyHistogram()
+    for i in range(1, 1001):
+        histogram.observe(i / 1000)
+
+    assert histogram.count == 1000
+    assert histogram.quantile(0.5) == pytest.approx(0.5, rel=0.2)
+    assert histogram.quantile(0.99) == pytest.approx(0.99, rel=0.2)
+    assert histogram.quantile(1.0) == 1.0
+    assert LatencyHistogram().quantile(0.5) is None
+
+
+def test_prometheus_dump_is_cumulative():
+    metrics = Metrics()
+    metrics.observe('my_depth', 0.002)
+    metrics.observe('my_depth', 0.2)
+    metrics.add_error('my_depth', -1003)
+    metrics.add_weight('my_depth', 5)
+
+    text = metrics.prometheus()
+
+    assert 'trade_binance_request_seconds_bucket{endpoint="my_depth",le="+Inf"} 2' in text
+    assert 'trade_binance_request_seconds_bucket{endpoint="my_depth",le="0.001"} 0' in text
+    assert 'trade_binance_request_seconds_count{endpoint="my_depth"} 2' in text
+    assert 'trade_binance_errors_total{endpoint="my_depth",code="-1003"} 1' in text
+    assert 'trade_binance_request_weight_total{endpoint="my_depth"} 5' in text
+
+
+def test_retried_calls_record_latency_retries_errors_and_weight():
+    class Api:
+        rate_limiter = MagicMock()
+        gmailAPIWrapper = MagicMock()
+        results = [ClientError(400, -1021, 'Timestamp', {}), ConnectionError('reset'), {'ok': True}]
+
+        def handle(self, e):
+            return False
+
+        @retry_on_exceptions(3, 0.001, exception_handlers={ClientError: handle}, weight=lambda limit: limit // 10)
+        def my_depth(self, limit):
+            result = self.results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+    assert Api().my_depth(50) == {'ok': True}
+
+    snapshot = Metrics().snapshot()['my_depth']
+    assert snapshot['count'] == 1
+    assert snapshot['retries'] == 2
+    assert snapshot['errors'] == {-1021: 1, 'ConnectionError': 1}
+    assert snapshot['weight'] == 15
+    assert snapshot['p99'] < 0.1
@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.mock_binance import MockBinance
+from trade_binance.kline_binance_dao import KlineBinanceDAO
+
+
+@pytest.fixture
+def mock_binance():
+    mock = MockBinance(symbols=20, rate_503=0.1, seed=1).serve()
+    yield mock
+    mock.stop()
+
+
+def test_sweep_recovers_from_injected_errors(mock_binance):
+    dao = KlineBinanceDAO(base_url=mock_binance.base_url)
+    margin_asset_list = {base: i for i, base in enumerate(mock_binance.bases)}
+
+    results = dao.get_binance_margin_klines_data('1m', 5, None, 'USDT', margin_asset_list)
+
+    assert mock_binance.injected[503] > 0
+    assert len(results) == 20 * 5
+    assert {row[4] for row in results} == {base + 'USDT' for base in mock_binance.bases}
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from unittest.mock import patch
+
+from trade_binance.order_book import OrderBook, OrderBookManager
+
+SNAPSHOT = {
+    'lastUpdateId': 100,
+    'bids': [['10.00', '1'], ['9.99', '2'], ['9.98', '3']],
+    'asks': [['10.01', '1'], ['10.02', '2']],
+}
+
+
+def depth_update(first_id, last_id, bids=(), asks=(), symbol='BTCUSDT'):
+    return {'stream': symbol.lower() + '@depth@100ms',
+            'data': {'e': 'depthUpdate', 's': symbol, 'U': first_id, 'u': last_id,
+                     'b': [list(row) for row in bids], 'a': [list(row) for row in asks]}}
+
+
+@pytest.fixture(autouse=True)
+def no_log():
+    with patch('trade_binance.order_book.write_log'):
+        yield
+
+
+def test_buffered_events_are_applied_on_top_of_snapshot():
+    order_books = OrderBookManager(['BTCUSDT'])
+    order_books.replay([
+        depth_update(95, 100, bids=[('9.50', '1')]),
+        depth_update(99, 102, bids=[('10.00', '0')], asks=[('10.005', '4')]),
+    ])
+    assert order_books.depth('BTCUSDT', 5) is None
+
+    assert order_books.load_snapshot('BTCUSDT', SNAPSHOT)
+
+    assert order_books.depth('BTCUSDT', 1) == {'lastUpdateId': 102, 'bids': [['9.99', '2']],
+                                               'asks': [['10.005', '4']]}
+    assert order_books.depth('BTCUSDT', 2)['bids'] == [['9.99', '2'], ['9.98', '3']]
+
+
+def test_gap_in_update_ids_triggers_resync():
+    order_books = OrderBookManager(['BTCUSDT', 'ETHUSDT'])
+    order_books.load_snapshot('BTCUSDT', SNAPSHOT)
+    order_books.replay([depth_update(101, 101, asks=[('10.01', '0')]),
+                        depth_update(105, 106, asks=[('10.03', '1')])])
+
+    assert order_books.pending_resync == {'BTCUSDT'}
+    assert order_books.depth('BTCUSDT', 1) is None
+
+    assert order_books.load_snapshot('BTCUSDT', dict(SNAPSHOT, lastUpdateId=104))
+    assert order_books.depth('BTCUSDT', 5)['asks'] == [['10.01', '1'], ['10.02', '2'], ['10.03', '1']]
+    assert order_books.pending_resync == set()
+
+
+def test_stale_snapshot_is_rejected():
+    book = OrderBook('BTCUSDT')
+    book.apply({'U': 110, 'u': 111, 'b': [], 'a': []})
+
+    assert not book.load_snapshot(SNAPSHOT)
+    assert not book.synced
+
+
+def test_buffer_keeps_the_newest_events():
+    book = OrderBook('BTCUSDT', max_buffer=3)
+    for update_id in range(101, 106):
+        book.apply({'U': update_id, 'u': update_id, 'b': [], 'a': []})
+
+    assert [event['u'] for event in book.buffer] == [103, 104, 105]
+
+
+def test_failed_resync_is_retried_after_a_backoff():
+    order_books = OrderBookManager(['BTCUSDT'], resync_delay=0)
+    order_books.pending_resync.add('BTCUSDT')
+    responses = [OSError('snapshot failed')] * 4 + [SNAPSHOT]
+
+    async def fetch_snapshot(session, symbol):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def run():
+        await order_books._resync(None, ['BTCUSDT'])
+        assert order_books.pending_resync == {'BTCUSDT'}
+        for _ in range(100):
+            if not order_books.pending_resync:
+                break
+            await asyncio.sleep(0.01)
+
+    with patch.object(order_books, '_fetch_snapshot', fetch_snapshot):
+        asyncio.run(run())
+
+    assert order_books.pending_resync == set()
+    assert order_books.depth('BTCUSDT', 1)['bids'] == [['10.00', '1']]
@@ -0,0 +1,48 @@
+import pytest
+
+from trade_binance.rate_limiter import RateLimiter, TokenBucket
+
+RATE_LIMITS = [
+    {'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1, 'limit': 100},
+    {'rateLimitType': 'ORDERS', 'interval': 'SECOND', 'intervalNum': 10, 'limit': 10},
+]
+
+
+@pytest.fixture
+def rate_limiter():
+    rate_limiter = RateLimiter()
+    saved = rate_limiter.buckets, rate_limiter.blocked_until
+    rate_limiter.configure(RATE_LIMITS, safety=1, now=0)
+    yield rate_limiter
+    # the limiter is process-wide, later tests must not inherit the small test limits
+    rate_limiter.buckets, rate_limiter.blocked_until = saved
+
+
+def test_rate_limiter_is_shared():
+    assert RateLimiter() is RateLimiter()
+
+
+def test_bucket_paces_requests_over_the_interval():
+    bucket = TokenBucket(60, 60, safety=1, now=0)
+
+    assert bucket.reserve(60, now=0) == 0
+    assert bucket.reserve(1, now=0) == pytest.approx(1)
+    assert bucket.reserve(1, now=1) == pytest.approx(1)
+
+
+def test_orders_count_against_order_limits(rate_limiter):
+    assert rate_limiter.reserve(weight=1, orders=10, now=0) == 0
+    assert rate_limiter.reserve(weight=1, orders=1, now=0) == pytest.approx(1)
+    assert rate_limiter.reserve(weight=1, orders=0, now=0) == 0
+
+
+def test_used_weight_header_drains_bucket(rate_limiter):
+    rate_limiter.update_from_headers({'X-MBX-USED-WEIGHT-1M': '100'}, now=0)
+
+    assert rate_limiter.reserve(weight=5, now=0) == pytest.approx(3)
+
+
+def test_retry_after_blocks_all_requests(rate_limiter):
+    rate_limiter.back_off(30, now=0)
+
+    assert rate_limiter.reserve(weight=1, now=10) == pytest.approx(20)
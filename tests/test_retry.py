@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from binance.error import ClientError
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from trade_binance import retry
+from trade_binance.retry import (ALERT, FAIL, RETRY, CircuitBreaker, async_retry_on_exceptions, backoff_delay,
+                                 classify_client_error, retry_on_exceptions)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    retry.circuit_breakers.clear()
+    with patch('trade_binance.retry.write_log'):
+        yield
+    retry.circuit_breakers.clear()
+
+
+class Api:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+        self.rate_limiter = MagicMock(acquire_async=AsyncMock())
+        self.gmailAPIWrapper = MagicMock()
+
+    def stop_on_client_error(self, e):
+        return classify_client_error(e) != RETRY
+
+    def next_result(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    @retry_on_exceptions(4, 0.01, exception_handlers={ClientError: stop_on_client_error})
+    def my_call(self):
+        return self.next_result()
+
+    @retry_on_exceptions(10, 0.2, deadline=0.3)
+    def my_slow_call(self):
+        return self.next_result()
+
+    @async_retry_on_exceptions(4, 0.01, exception_handlers={ClientError: stop_on_client_error})
+    async def my_async_call(self):
+        return self.next_result()
+
+
+def client_error(code, message):
+    return ClientError(400, code, message, {})
+
+
+def test_errors_are_classified_by_code_then_message():
+    assert classify_client_error(client_error(-1021, 'Timestamp for this request was 1000ms ahead')) == RETRY
+    assert classify_client_error(client_error(-2010, 'Account has insufficient balance')) == FAIL
+    assert classify_client_error(client_error(-3041, 'Balance is not enough')) == FAIL
+    assert classify_client_error(client_error(-3044, 'Borrow is banned for this asset.')) == ALERT
+    assert classify_client_error(client_error(-9999, 'Something new')) is None
+    # the message is more specific than the broad code it shares
+    assert classify_client_error(client_error(-1003, 'Order does not exist.')) == FAIL
+
+
+def test_backoff_grows_with_jitter_and_is_capped():
+    assert backoff_delay(0, 1, 30, random=lambda: 0) == 0.5
+    assert backoff_delay(3, 1, 30, random=lambda: 1) == 8
+    assert backoff_delay(10, 1, 30, random=lambda: 0) == 15
+
+
+def test_breaker_opens_half_opens_and_closes():
+    now = [0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, now=lambda: now[0])
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.record_failure()
+    now[0] = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+
+def test_transient_errors_are_retried_and_rejections_are_not():
+    api = Api([ConnectionError('reset'), client_error(-1021, 'Timestamp'), {'orderId': 1}])
+    assert api.my_call() == {'orderId': 1}
+    assert api.calls == 3
+
+    api = Api([client_error(-2010, 'Order would immediately match and take.')])
+    assert api.my_call() is None
+    assert api.calls == 1
+    api.gmailAPIWrapper.send_email.assert_not_called()
+
+
+def test_deadline_stops_retrying():
+    api = Api([ConnectionError('reset')] * 10)
+    assert api.my_slow_call() is None
+    # the first wait is 0.1 to 0.2 seconds, the second of 0.2 to 0.4 would pass the deadline
+    assert api.calls == 2
+
+
+def test_breaker_stops_calls_to_a_failing_endpoint():
+    api = Api([ConnectionError('reset')] * 20 + [{'ok': True}])
+    assert api.my_call() is None
+    assert api.my_call() is None
+    assert api.my_call() is None
+    assert api.calls == 10
+    api.gmailAPIWrapper.send_email.assert_called_once()
+    assert retry.circuit_breakers['my_call'].state == 'open'
+
+
+def test_async_retry_does_not_block_the_loop():
+    api = Api([TimeoutError(), {'orderId': 2}])
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        task = asyncio.create_task(ticker())
+        response = await api.my_async_call()
+        task.cancel()
+        return response, ticks
+
+    response, ticks = asyncio.run(main())
+    assert response == {'orderId': 2}
+    assert ticks > 1
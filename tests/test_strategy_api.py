@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+from unittest.mock import patch
+
+from benchmarks.mock_binance import MockBinance
+from tests.local_binance import wait_for
+from trade_binance import utils
+from trade_binance.binance_api_wrapper import BinanceAPIWrapper
+from trade_binance.kline_columns import KlineColumns
+from trade_binance.strategy_api import StrategyAPI
+from trade_binance.ticker_cache import TickerPriceCache
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    for name in ('config', 'data', 'work'):
+        (tmp_path / name).mkdir()
+    config = {'environment': 'development', 'quote_asset': 'USDT', 'assets1': []}
+    (tmp_path / 'config' / 'config.json').write_text(json.dumps(config))
+    (tmp_path / 'data' / 'q_last_exchange_rate.csv').write_text('exchange rate\nsymbol,close\nBNBUSDT,600\n')
+    monkeypatch.setenv('api_key', 'key')
+    monkeypatch.setenv('api_secret', 'secret')
+    monkeypatch.chdir(tmp_path / 'work')
+    utils.reload_config()
+    mock = MockBinance(symbols=50).serve()
+    with patch('trade_binance.binance_api_wrapper.write_log'), patch('trade_binance.retry.write_log'):
+        yield tmp_path, mock
+    mock.stop()
+    monkeypatch.undo()
+    utils.reload_config()
+
+
+def test_startup_updates_once_then_uses_the_snapshot(workspace):
+    tmp_path, mock = workspace
+
+    api = StrategyAPI(base_url=mock.base_url)
+    api.close()
+    assert mock.paths['/api/v3/exchangeInfo'] == 1
+    assert (tmp_path / 'data' / 'q_exchange_info.json').exists()
+    assert api.exchange_rate == {'BNB': 600.0, 'USDT': 1}
+
+    fetch_threads = []
+    my_exchange_info = BinanceAPIWrapper.my_exchange_info
+
+    def record_thread(self):
+        fetch_threads.append(threading.current_thread())
+        return my_exchange_info(self)
+
+    with patch.object(BinanceAPIWrapper, 'my_exchange_info', record_thread):
+        api = StrategyAPI(base_url=mock.base_url)
+        try:
+            assert api.symbol_filters.round_quantity('S0001', 1.23456) == 1.234
+            assert wait_for(lambda: mock.paths['/api/v3/exchangeInfo'] == 2)
+        finally:
+            api.close()
+    # the constructor loaded the snapshot, the refresh ran in the background
+    assert fetch_threads and threading.main_thread() not in fetch_threads
+
+
+def test_stale_snapshot_is_refetched(workspace):
+    tmp_path, mock = workspace
+    StrategyAPI(base_url=mock.base_url).close()
+    snapshot = tmp_path / 'data' / 'q_exchange_info.json'
+    os.utime(snapshot, (time.time() - 7200, time.time() - 7200))
+
+    api = StrategyAPI(base_url=mock.base_url)
+    api.close()
+
+    assert mock.paths['/api/v3/exchangeInfo'] == 2
+    assert time.time() - snapshot.stat().st_mtime < 60
+
+
+def test_exchange_rates_refresh_from_klines_and_ticker(workspace):
+    tmp_path, mock = workspace
+    api = StrategyAPI(base_url=mock.base_url)
+    api.close()
+    kline_columns = KlineColumns(['BNB', 'ETH'], 1)
+    kline_columns.append('BNB', [[0, '1', '1', '1', '610.5', '1']])
+    kline_columns.append('ETH', [[0, '1', '1', '1', '3000', '1']])
+
+    assert api.update_exchange_rate_from_klines(kline_columns) == 2
+    assert api.exchange_rate == {'BNB': 610.5, 'ETH': 3000.0, 'USDT': 1}
+
+    api.ticker_cache = TickerPriceCache()
+    api.ticker_cache.update_from_rest([{'symbol': 'BNBUSDT', 'price': '620'}, {'symbol': 'ETHBTC', 'price': '0.05'}])
+    api.ticker_cache.update_from_rest([{'symbol': 'ETHUSDT', 'price': '2900'}], now=time.time() - 60)
+
+    assert api.update_exchange_rate_from_ticker(max_age=10) == 1
+    assert api.exchange_rate == {'BNB': 620.0, 'ETH': 3000.0, 'USDT': 1}
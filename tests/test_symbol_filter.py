@@ -0,0 +1,71 @@
+import numpy as np
+
+from trade_binance.symbol_filter import SymbolFilterIndex, decimal_ticks
+
+
+def symbol_row(base_asset, tick_size, step_size, min_qty='0', min_notional='5'):
+    return {'symbol': base_asset + 'USDT', 'baseAsset': base_asset, 'quoteAsset': 'USDT',
+            'filters': [{'filterType': 'PRICE_FILTER', 'minPrice': tick_size, 'tickSize': tick_size},
+                        {'filterType': 'LOT_SIZE', 'minQty': min_qty, 'stepSize': step_size},
+                        {'filterType': 'NOTIONAL', 'minNotional': min_notional}]}
+
+
+def symbol_filters():
+    symbol_filters = SymbolFilterIndex()
+    symbol_filters.add_symbol(symbol_row('BTC', '0.01000000', '0.00001000', '0.00001000'))
+    symbol_filters.add_symbol(symbol_row('DOGE', '0.00001000', '1.00000000', '1.00000000'))
+    symbol_filters.add_symbol(symbol_row('XYZ', '0.05000000', '10.00000000'))
+    symbol_filters.add_precision('USDT', 8)
+    return symbol_filters
+
+
+def test_decimal_ticks():
+    assert decimal_ticks('0.00100000') == (1, 3)
+    assert decimal_ticks('0.05') == (5, 2)
+    assert decimal_ticks('10.00000000') == (10, 0)
+
+
+def test_scalar_rounding_is_exact():
+    index = symbol_filters()
+
+    assert index.round_price('BTC', 0.29) == 0.29
+    assert index.round_price('BTC', 67012.345, 'ceil') == 67012.35
+    assert index.round_price('XYZ', '1.27') == 1.25
+    assert index.round_quantity('BTC', 0.123456789) == 0.12345
+    assert index.round_quantity('XYZ', 129) == 120
+    assert index.format_price('DOGE', 0.1234567) == '0.12345'
+    assert index.round_quantity('USDT', 1.123456789) == 1.12345678
+
+
+def test_batch_rounding_matches_scalar_rounding():
+    index = symbol_filters()
+    assets = ['BTC', 'DOGE', 'XYZ', 'BTC']
+    prices = [0.29, 0.1234567, 1.27, 67012.345]
+
+    rounded = index.round_prices(assets, prices, 'ceil')
+
+    assert rounded.tolist() == [index.round_price(a, p, 'ceil') for a, p in zip(assets, prices)]
+    assert rounded.tolist() == [0.29, 0.12346, 1.3, 67012.35]
+    assert index.round_quantities(['DOGE', 'XYZ'], [12.9, 129]).tolist() == [12.0, 120.0]
+
+
+def test_check_orders_against_min_qty_and_notional():
+    index = symbol_filters()
+
+    passed = index.check_orders(['BTC', 'DOGE', 'DOGE'], [60000, 0.1, 0.1], [0.001, 100, 0.5])
+
+    assert passed.tolist() == [True, True, False]
+    assert isinstance(passed, np.ndarray)
+
+
+def test_float_order_params_are_written_with_the_filter_decimals():
+    index = symbol_filters()
+    quantity = index.round_quantity('BTC', 0.0000123)
+    assert str(quantity) == '1e-05'
+
+    params = index.format_params('BTCUSDT', 'SELL', {'quantity': quantity, 'price': 67012.35,
+                                                     'timeInForce': 'GTC'})
+
+    assert params == {'quantity': '0.00001', 'price': '67012.35', 'timeInForce': 'GTC'}
+    assert index.format_params('DOGEUSDT', 'BUY', {'price': 0.00002})['price'] == '0.00002'
+    assert index.format_params('BTCUSDT', 'BUY', {'quantity': '0.00001000'}) == {'quantity': '0.00001000'}
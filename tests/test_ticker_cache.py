@@ -0,0 +1,31 @@
+from trade_binance.ticker_cache import TickerPriceCache
+
+
+def test_prices_from_rest_and_stream_report_their_age():
+    ticker_cache = TickerPriceCache(max_age=5)
+    ticker_cache.update_from_rest([{'symbol': 'BTCUSDT', 'price': '60000.00'},
+                                   {'symbol': 'ETHUSDT', 'price': '3000.00'}], now=100)
+    ticker_cache.on_message('!miniTicker@arr', [{'e': '24hrMiniTicker', 's': 'ETHUSDT', 'c': '3001.00'}])
+
+    assert ticker_cache.get_price('BTCUSDT', now=102) == ('60000.00', 2)
+    assert ticker_cache.get_price('ETHUSDT')[0] == '3001.00'
+    assert ticker_cache.get_price('XRPUSDT') is None
+
+
+def test_stale_prices_are_not_served():
+    ticker_cache = TickerPriceCache(max_age=5)
+    ticker_cache.update_from_rest([{'symbol': 'BTCUSDT', 'price': '60000.00'}], now=100)
+
+    assert ticker_cache.get_price('BTCUSDT', now=106) is None
+    assert ticker_cache.get_price('BTCUSDT', max_age=10, now=106) == ('60000.00', 6)
+    assert ticker_cache.rest_age(now=106) == 6
+
+
+def test_book_ticker_stream():
+    ticker_cache = TickerPriceCache(book_ticker_symbols=['BTCUSDT'])
+    assert ticker_cache.streams() == ['!miniTicker@arr', 'btcusdt@bookTicker']
+
+    ticker_cache.on_message('btcusdt@bookTicker', {'u': 1, 's': 'BTCUSDT', 'b': '59999.99', 'B': '1',
+                                                   'a': '60000.01', 'A': '2'})
+
+    assert ticker_cache.get_book_ticker('BTCUSDT')[:2] == ('59999.99', '60000.01')
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+
+import pytest
+
+from trade_binance import utils
+from trade_binance.utils import AlertDispatcher, GmailAPIWrapper, LogWriter
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_log_writer_batches_and_drains_on_close(tmp_path):
+    path = tmp_path / 'q_binance_api.log'
+    log_writer = LogWriter(str(path), flush_interval=60)
+    for i in range(3):
+        log_writer.write(f'line {i}\n')
+
+    log_writer.close()
+
+    assert path.read_text() == 'line 0\nline 1\nline 2\n'
+
+
+def test_log_writer_drops_lines_instead_of_blocking(tmp_path, monkeypatch):
+    release = threading.Event()
+    flushed = []
+    monkeypatch.setattr(LogWriter, '_flush', lambda self, lines: release.wait(2) and flushed.extend(lines))
+    log_writer = LogWriter(str(tmp_path / 'q_binance_api.log'), flush_interval=0, max_queue=1)
+    log_writer.write('line 0\n')
+    wait_until(lambda: log_writer.queue.empty())
+
+    log_writer.write('line 1\n')
+    log_writer.write('line 2\n')
+
+    assert log_writer.dropped == 1
+    release.set()
+    log_writer.close()
+    assert flushed == ['line 0\n', 'line 1\n']
+
+
+def test_write_log_uses_background_writer(tmp_path, monkeypatch):
+    path = tmp_path / 'q_binance_api.log'
+    monkeypatch.setattr(utils, 'log_path', str(path))
+    utils.enable_background_log(flush_interval=60)
+    try:
+        utils.write_log('my_new_order', {'orderId': 1})
+        assert not path.exists()
+    finally:
+        utils.disable_background_log()
+
+    assert path.read_text().endswith(" my_new_order {'orderId': 1}\n")
+
+
+def test_config_cache_reparses_only_when_file_changes(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text('{"quote_asset": "USDT", "assets1": ["BTC", "ETH"]}')
+    config_cache = utils.ConfigCache(str(path), check_interval=0)
+
+    assert config_cache.get('quote_asset') == 'USDT'
+    assert config_cache.get_set('assets1') == frozenset({'BTC', 'ETH'})
+    assert config_cache.get_set('assets1') is config_cache.get_set('assets1')
+
+    path.write_text('{"quote_asset": "FDUSD", "assets1": []}')
+    os.utime(path, ns=(config_cache.mtime + 10 ** 9, config_cache.mtime + 10 ** 9))
+
+    assert config_cache.get('quote_asset') == 'FDUSD'
+    assert config_cache.get_set('assets1') == frozenset()
+
+
+def test_config_cache_missing_file_and_key(tmp_path):
+    config_cache = utils.ConfigCache(str(tmp_path / 'config.json'))
+    assert config_cache.get('quote_asset') is None
+
+    (tmp_path / 'config.json').write_text('{}')
+    config_cache.reload()
+    with pytest.raises(EnvironmentError):
+        config_cache.get('quote_asset')
+
+
+def test_changed_env_file_is_applied(tmp_path, monkeypatch):
+    path = tmp_path / '.env'
+    path.write_text('q_test_key=old\n')
+    monkeypatch.setattr(utils, 'dotenv_path', str(path))
+    monkeypatch.setattr(utils, '_dotenv_checked', None)
+    monkeypatch.delenv('q_test_key', raising=False)
+    assert utils.get_env_variable('q_test_key') == 'old'
+
+    path.write_text('q_test_key=new\n')
+    os.utime(path, ns=(time.time_ns() + 10 ** 9, time.time_ns() + 10 ** 9))
+    utils.load_env(check_interval=0)
+
+    assert utils.get_env_variable('q_test_key') == 'new'
+    monkeypatch.delenv('q_test_key')
+
+
+def test_alert_dispatcher_sends_first_alert_and_coalesces_repeats():
+    sent = []
+    dispatcher = AlertDispatcher(lambda subject, content: sent.append((subject, content)), window=0.3)
+    started = time.monotonic()
+    dispatcher.enqueue('new error', 'a')
+    assert time.monotonic() - started < 0.01
+    wait_until(lambda: len(sent) == 1)
+    for content in ('b', 'c', 'd'):
+        dispatcher.enqueue('new error', content)
+    dispatcher.enqueue('ban', 'BTC')
+    wait_until(lambda: len(sent) == 3)
+    dispatcher.close()
+
+    assert sent[0][0] == 'new error'
+    assert sent[1][0] == 'ban'
+    assert sent[2][0] == 'new error (x3)'
+    assert [line.split()[-1] for line in sent[2][1].splitlines()] == ['b', 'c', 'd']
+
+
+def test_alert_dispatcher_limits_bursts_and_flushes_on_close():
+    sent = []
+    dispatcher = AlertDispatcher(lambda subject, content: sent.append(subject), max_per_minute=2)
+    for i in range(5):
+        dispatcher.enqueue(f'error {i}', '')
+    wait_until(lambda: len(sent) == 2)
+    time.sleep(0.1)
+    assert len(sent) == 2
+    dispatcher.close()
+    assert sorted(sent) == [f'error {i}' for i in range(5)]
+
+
+def test_send_email_only_enqueues(monkeypatch):
+    gmail = GmailAPIWrapper()
+    monkeypatch.setattr(gmail, 'dispatcher', None)
+    monkeypatch.setattr('trade_binance.utils.get_config', lambda key: 'production')
+    delivered = threading.Event()
+
+    def slow_deliver(subject, content):
+        time.sleep(0.2)
+        delivered.set()
+
+    monkeypatch.setattr(gmail, 'deliver', slow_deliver)
+    started = time.monotonic()
+    gmail.send_email('subject', 'content')
+    assert time.monotonic() - started < 0.05
+    assert delivered.wait(2)
+    gmail.dispatcher.close()
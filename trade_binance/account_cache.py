@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+from trade_binance.async_binance_api_wrapper import AsyncBinanceAPIWrapper
+from trade_binance.binance_stream import BinanceStream
+from trade_binance.utils import write_log
+
+
+class AccountCache(BinanceStream):
+    """
+    Balances of the spot or the cross margin account, kept current by its user data stream.
+
+    Every connect takes a new listenKey, loads the account once from REST and then applies the
+    `outboundAccountPosition` events, which carry the absolute free and locked amounts of every
+    changed asset. The listenKey is renewed every `keepalive_interval` seconds and an expired key
+    forces a reconnect. Balances are read from a dict keyed by asset.
+    """
+    def __init__(self, account='spot', rest_url='https://api.binance.com', api_key=None, api_secret=None,
+                 clock_sync=None, keepalive_interval=1800, ws_url='wss://stream.binance.com:9443/ws', **kwargs):
+        super().__init__(ws_url=ws_url, **kwargs)
+        self.margin = account == 'margin'
+        self.keepalive_interval = keepalive_interval
+        self.api = AsyncBinanceAPIWrapper(rest_url, api_key, api_secret, clock_sync=clock_sync)
+        self.balances = {}
+        self.updated = {}
+        self.snapshot_time = 0
+        self.listen_key = None
+        self.synced = False
+        self.lock = threading.Lock()
+        self._keepalive_task = None
+
+    async def url(self, session):
+        self.synced = False
+        response = await self.api.my_new_listen_key(self.margin)
+        if response is None:
+            raise ConnectionError('no listenKey')
+        self.listen_key = response['listenKey']
+        return self.ws_url + '/' + self.listen_key
+
+    def load_account(self, response, request_time=0):
+        """
+        :param response: /api/v3/account or /sapi/v1/margin/account
+        :param request_time: server time in ms the snapshot was requested at, the margin account has
+            no updateTime so events older than this count as already contained in it
+        """
+        rows = response['userAssets'] if self.margin else response['balances']
+        update_time = response.get('updateTime', request_time)
+        with self.lock:
+            self.balances = {row['asset']: (float(row['free']), float(row['locked'])) for row in rows}
+            self.updated = dict.fromkeys(self.balances, update_time)
+            self.snapshot_time = update_time
+            self.synced = True
+
+    async def on_connect(self, session, reconnect):
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+        self._keepalive_task = asyncio.get_running_loop().create_task(self._keepalive(self.listen_key))
+        request_time = self.api.timestamp()
+        response = await (self.api.my_margin_account() if self.margin else self.api.my_account())
+        if response is None:
+            raise ConnectionError('account snapshot failed')
+        self.load_account(response, request_time)
+
+    async def _keepalive(self, listen_key):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            await self.api.my_renew_listen_key(listen_key, self.margin)
+
+    def on_message(self, stream, data):
+        if not isinstance(data, dict):
+            return
+        event = data.get('e')
+        if event == 'outboundAccountPosition':
+            with self.lock:
+                for row in data['B']:
+                    # events queued while the snapshot loaded may be older than it
+                    if data['u'] >= self.updated.get(row['a'], self.snapshot_time):
+                        self.balances[row['a']] = (float(row['f']), float(row['l']))
+                        self.updated[row['a']] = data['u']
+        elif event == 'listenKeyExpired':
+            write_log('AccountCache listenKeyExpired', 'margin' if self.margin else 'spot')
+            self.synced = False
+            if self._ws is not None:
+                asyncio.get_running_loop().create_task(self._ws.close())
+
+    async def _run(self):
+        try:
+            await super()._run()
+        finally:
+            if self.listen_key is not None:
+                await self.api.my_close_listen_key(self.listen_key, self.margin)
+            await self.api.close()
+
+    def balance(self, asset):
+        """
+        :return: (free, locked), (0.0, 0.0) for an asset the account does not hold, None if not synced
+        """
+        if not self.synced or (self._thread is not None and not self.connected.is_set()):
+            return None
+        return self.balances.get(asset, (0.0, 0.0))
+
+    def free(self, asset):
+        balance = self.balance(asset)
+        return None if balance is None else balance[0]
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+from binance.error import ClientError, ServerError
+from binance.lib.utils import encoded_string, hmac_hashing
+import numpy as np
+
+from trade_binance.binance_api_wrapper import BinanceAPIWrapper
+from trade_binance.rate_limiter import RateLimiter, depth_weight, klines_weight
+from trade_binance.metrics import Metrics
+from trade_binance.retry import async_retry_on_exceptions, current_endpoint, last_exception
+from trade_binance.utils import write_log, get_env_variable, GmailAPIWrapper
+
+
+class AsyncBinanceAPIWrapper:
+    """
+    Coroutine versions of the BinanceAPIWrapper `my_*` calls on one pooled aiohttp session.
+
+    Requests are HMAC signed like binance.spot.Spot, paced by the shared RateLimiter, and errors are
+    raised as the connector's ClientError/ServerError so BinanceAPIWrapper's handlers classify them.
+    Use it as `async with AsyncBinanceAPIWrapper() as api:` or call close() when done.
+    """
+    handle_client_error = BinanceAPIWrapper.handle_client_error
+
+    def __init__(self, base_url='https://api.binance.com', api_key=None, api_secret=None, timeout=10,
+                 pool_size=100, clock_sync=None):
+        self.api_key = api_key or get_env_variable('api_key')
+        self.api_secret = api_secret or get_env_variable('api_secret')
+        if not self.api_key or not self.api_secret:
+            raise EnvironmentError("Config variable 'api_key' or 'api_secret' is missing")
+        self.base_url = base_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.clock_sync = clock_sync
+
+        self.asset = None
+        self.session = None
+        self.rate_limiter = RateLimiter()
+        self.metrics = Metrics()
+        self.gmailAPIWrapper = GmailAPIWrapper()
+
+    async def __aenter__(self):
+        await self.get_session()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def get_session(self):
+        if self.session is None or self.session.closed:
+            conn = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=400)
+            self.session = aiohttp.ClientSession(connector=conn, headers={'X-MBX-APIKEY': self.api_key},
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def timestamp(self):
+        if self.clock_sync is not None:
+            return self.clock_sync.timestamp()
+        return int(time.time() * 1000)
+
+    async def send_request(self, http_method, url_path, payload=None, signed=False):
+        payload = {key: value for key, value in (payload or {}).items() if value is not None}
+        if signed:
+            payload['timestamp'] = self.timestamp()
+        query_string = encoded_string(payload)
+        if signed:
+            query_string += ('&' if query_string else '') + 'signature=' + hmac_hashing(self.api_secret, query_string)
+        url = self.base_url + url_path + ('?' + query_string if query_string else '')
+
+        session = await self.get_session()
+        async with session.request(http_method, url) as response:
+            self.rate_limiter.on_response(response.status, response.headers)
+            body = await response.read()
+            endpoint = current_endpoint.get()
+            if endpoint is not None:
+                self.metrics.add_bytes(endpoint, len(body))
+            text = body.decode('utf-8', errors='replace')
+            if 400 <= response.status < 500:
+                try:
+                    err = json.loads(text)
+                except ValueError:
+                    raise ClientError(response.status, None, text, response.headers)
+                raise ClientError(response.status, err.get('code'), err.get('msg'), response.headers, err.get('data'))
+            if response.status >= 500:
+                raise ServerError(response.status, text)
+            return json.loads(text)
+
+    @async_retry_on_exceptions(5, 1, weight=20)
+    async def my_exchange_info(self):
+        write_log('Calling async my_exchange_info API')
+        response = await self.send_request('GET', '/api/v3/exchangeInfo')
+        if response.get('rateLimits'):
+            self.rate_limiter.configure(response['rateLimits'])
+        return response
+
+    @async_retry_on_exceptions(5, 1)
+    async def my_time(self):
+        return await self.send_request('GET', '/api/v3/time')
+
+    @async_retry_on_exceptions(5, 1)
+    async def my_margin_all_pairs(self):
+        return await self.send_request('GET', '/sapi/v1/margin/allPairs')
+
+    @async_retry_on_exceptions(5, 1, weight=10)
+    async def my_isolated_margin_all_pairs(self):
+        return await self.send_request('GET', '/sapi/v1/margin/isolated/allPairs', signed=True)
+
+    @async_retry_on_exceptions(5, 1, weight=20)
+    async def my_account(self):
+        write_log('calling async my_account api')
+        return await self.send_request('GET', '/api/v3/account', signed=True)
+
+    @async_retry_on_exceptions(5, 1)
+    async def my_funding_wallet(self):
+        return await self.send_request('POST', '/sapi/v1/asset/get-funding-asset', signed=True)
+
+    @async_retry_on_exceptions(5, 1, weight=10)
+    async def my_margin_account(self):
+        write_log('calling async my_margin_account api')
+        return await self.send_request('GET', '/sapi/v1/margin/account', signed=True)
+
+    @async_retry_on_exceptions(10, 1, exception_handlers={ClientError: handle_client_error}, weight=300)
+    async def my_cancel_isolated_margin_account(self, symbol):
+        write_log('async my_cancel_isolated_margin_account', symbol)
+        return await self.send_request('DELETE', '/sapi/v1/margin/isolated/account', {'symbol': symbol}, True)
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error},
+                               weight=lambda symbol, interval, **kwargs: klines_weight(kwargs.get('limit', 500)))
+    async def my_klines(self, symbol, interval, **kwargs):
+        return await self.send_request('GET', '/api/v3/klines', {'symbol': symbol, 'interval': interval, **kwargs})
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error},
+                               weight=lambda asset, **params: depth_weight(params.get('limit', 100)))
+    async def my_depth(self, asset, **params):
+        return await self.send_request('GET', '/api/v3/depth', {'symbol': asset, **params})
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=2)
+    async def my_new_listen_key(self, margin=False):
+        """
+        :return: {'listenKey': ...} for the spot or the cross margin user data stream
+        """
+        return await self.send_request('POST', '/sapi/v1/userDataStream' if margin else '/api/v3/userDataStream')
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=2)
+    async def my_renew_listen_key(self, listen_key, margin=False):
+        return await self.send_request('PUT', '/sapi/v1/userDataStream' if margin else '/api/v3/userDataStream',
+                                       {'listenKey': listen_key})
+
+    @async_retry_on_exceptions(1, 1, exception_handlers={ClientError: handle_client_error}, weight=2)
+    async def my_close_listen_key(self, listen_key, margin=False):
+        return await self.send_request('DELETE', '/sapi/v1/userDataStream' if margin else '/api/v3/userDataStream',
+                                       {'listenKey': listen_key})
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=2)
+    async def my_ticker_price(self, symbol):
+        return await self.send_request('GET', '/api/v3/ticker/price', {'symbol': symbol})
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, orders=1)
+    async def my_new_order(self, symbol, side, order_type, **params):
+        write_log('  api async my_new_order', [symbol, side, order_type, str(params)])
+        response = await self.send_request(
+            'POST', '/api/v3/order', {'symbol': symbol, 'side': side, 'type': order_type, **params}, True)
+        write_log('async my_new_order', str(response))
+        return response
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error})
+    async def my_cancel_order(self, symbol, **params):
+        write_log('  api async my_cancel_order', [symbol, str(params)])
+        return await self.send_request('DELETE', '/api/v3/order', {'symbol': symbol, **params}, True)
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=10)
+    async def my_margin_order(self, symbol, **params):
+        write_log('  api async my_margin_order', [symbol, str(params)])
+        response = await self.send_request('GET', '/sapi/v1/margin/order', {'symbol': symbol, **params}, True)
+        write_log('async my_margin_order', str(response))
+        return response
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=6, orders=1)
+    async def my_new_margin_order(self, symbol, side, order_type, **params):
+        write_log('  api async my_new_margin_order', [symbol, side, order_type, str(params)])
+        response = await self.send_request(
+            'POST', '/sapi/v1/margin/order', {'symbol': symbol, 'side': side, 'type': order_type, **params}, True)
+        write_log('async my_new_margin_order', str(response))
+        return response
+
+    @async_retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=10)
+    async def my_cancel_margin_order(self, symbol, **params):
+        write_log('  api async my_cancel_margin_order', [symbol, str(params)])
+        return await self.send_request('DELETE', '/sapi/v1/margin/order', {'symbol': symbol, **params}, True)
+
+    def prepare_orders(self, orders, symbol_filters):
+        """
+        Puts quantity and price of every order on the symbol's step and tick grid (prices are rounded
+        away from the market: down for BUY, up for SELL) and checks minQty and minNotional for all
+        orders at once.
+
+        :return: list of error messages aligned with orders, None where the order is valid
+        """
+        errors = [None] * len(orders)
+        checked = []
+        for i, order in enumerate(orders):
+            asset = symbol_filters.symbol_assets.get(order['symbol'])
+            if asset is None:
+                errors[i] = 'Invalid symbol.'
+                continue
+            if 'quantity' in order:
+                order['quantity'] = symbol_filters.format_quantity(asset, order['quantity'])
+            if 'price' in order:
+                rounding = 'floor' if order['side'] == 'BUY' else 'ceil'
+                order['price'] = symbol_filters.format_price(asset, order['price'], rounding)
+            if 'quantity' in order:
+                # market orders have no price, only their quantity is checked
+                checked.append((i, asset, float(order.get('price', 'inf')), float(order['quantity'])))
+        if checked:
+            rows, assets, prices, quantities = zip(*checked)
+            passed = symbol_filters.check_orders(list(assets), np.array(prices), np.array(quantities))
+            for i, ok in zip(rows, passed):
+                if not ok:
+                    errors[i] = 'Filter failure: LOT_SIZE or NOTIONAL'
+        return errors
+
+    async def my_new_margin_orders(self, orders, symbol_filters=None, max_concurrency=50, stop_symbol_on_error=True):
+        """
+        Submits margin orders for many symbols concurrently. Orders of the same symbol are sent one
+        after the other in list order, different symbols do not wait for each other.
+
+        :param orders: [{'symbol': 'BTCUSDT', 'side': 'BUY', 'order_type': 'LIMIT', 'quantity': 0.01,
+            'price': 60000, 'timeInForce': 'GTC'}, ...], extra keys are sent as order parameters
+        :param symbol_filters: SymbolFilterIndex used to validate and round the orders before sending
+        :param stop_symbol_on_error: skip the remaining orders of a symbol after one of them failed
+        :return: [{'index': 0, 'symbol': 'BTCUSDT', 'ok': True, 'response': {...}, 'error': None}, ...]
+            aligned with orders
+        """
+        orders = [dict(order) for order in orders]
+        results = [{'index': i, 'symbol': order['symbol'], 'ok': False, 'response': None, 'error': None}
+                   for i, order in enumerate(orders)]
+        if symbol_filters is not None:
+            for result, error in zip(results, self.prepare_orders(orders, symbol_filters)):
+                result['error'] = error
+
+        chains = {}
+        for i, order in enumerate(orders):
+            if results[i]['error'] is None:
+                chains.setdefault(order['symbol'], []).append(i)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def submit_chain(indexes):
+            failed = False
+            for i in indexes:
+                if failed and stop_symbol_on_error:
+                    results[i]['error'] = 'Skipped after a failed order of the same symbol.'
+                    continue
+                params = dict(orders[i])
+                symbol, side, order_type = params.pop('symbol'), params.pop('side'), params.pop('order_type')
+                async with semaphore:
+                    response = await self.my_new_margin_order(symbol, side, order_type, **params)
+                if response is None:
+                    failed = True
+                    error = last_exception.get()
+                    results[i]['error'] = getattr(error, 'error_message', None) or str(error)
+                else:
+                    results[i]['ok'] = True
+                    results[i]['response'] = response
+
+        await asyncio.gather(*(submit_chain(indexes) for indexes in chains.values()))
+        return results
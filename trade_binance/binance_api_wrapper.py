@@ -1,31 +1,51 @@
 
 import inspect
+import json
 import math
+import os
+import threading
 import time
 
+import numpy as np
 import pandas as pd
 
 from datetime import datetime, timedelta
 
 from binance.error import ClientError
-from binance.spot import Spot
 
+from trade_binance.clock_sync import ClockSync, ClockSyncedSpot
+from trade_binance.depth_recorder import DepthRecorder
+from trade_binance.loop_thread import LoopThread
+from trade_binance.order_book import OrderBookManager
+from trade_binance.rate_limiter import RateLimiter, depth_weight, klines_weight
+from trade_binance.metrics import Metrics
+from trade_binance.retry import ALERT, RETRY, classify_client_error, current_endpoint, retry_on_exceptions
+from trade_binance.symbol_filter import SymbolFilterIndex
+from trade_binance.ticker_cache import TickerPriceCache
 from trade_binance.utils import write_log, get_env_variable, \
-    GmailAPIWrapper, get_config
+    GmailAPIWrapper, get_config, get_config_set
 
 class BinanceAPIWrapper:
-    def __init__(self):
+    def __init__(self, base_url=None):
+        """
+        :param base_url: REST endpoint, https://api.binance.com if not given
+        """
 
         api_key = get_env_variable('api_key')
         api_secret = get_env_variable('api_secret')
         if not api_key or not api_secret:
             raise EnvironmentError("Config variable 'api_key' or 'api_secret' is missing")
 
+        self.clock_sync = ClockSync(self.server_time)
+        client_kwargs = {'base_url': base_url} if base_url else {}
+
         environment = get_config('environment')
         if environment == 'development':
-            self.client = Spot(api_key=api_key, api_secret=api_secret)
+            self.client = ClockSyncedSpot(api_key=api_key, api_secret=api_secret, clock_sync=self.clock_sync,
+                                          **client_kwargs)
         else:
-            self.client = Spot(api_key=api_key, api_secret=api_secret)  # Use real credentials in production
+            self.client = ClockSyncedSpot(api_key=api_key, api_secret=api_secret, clock_sync=self.clock_sync,
+                                          **client_kwargs)  # Use real credentials in production
 
         self.quote_asset = get_config('quote_asset')
         if not self.quote_asset:
@@ -36,14 +56,17 @@ class BinanceAPIWrapper:
 
         self.rate_limits = None
 
+        self.exchange_info_path = '../data/q_exchange_info.json'
+
         self.margin_asset_list = {}
 
         self.margin_isolate_asset_list = []
 
         self.spot_symbol_list = {}
-        
+
         self.price_filter = {}
         self.lot_size = {}
+        self.symbol_filters = SymbolFilterIndex()
 
         self.exchange_rate = {}
 
@@ -51,28 +74,143 @@ class BinanceAPIWrapper:
 
         self.isolated_margin_account=None
 
+        self.order_books = None
+
+        self.depth_recorder = DepthRecorder()
+
+        self.ticker_cache = None
+
+        self.async_api = None
+        self.loop_thread = None
+
         self.gmailAPIWrapper = GmailAPIWrapper()
 
+        self.rate_limiter = RateLimiter()
+        self.metrics = Metrics()
+        self.client.session.hooks['response'].append(self.on_response)
+
+        self.clock_sync.start()
+
         self.update()
 
+    def on_response(self, response, *args, **kwargs):
+        self.rate_limiter.on_response(response.status_code, response.headers)
+        endpoint = current_endpoint.get()
+        if endpoint is not None:
+            self.metrics.add_bytes(endpoint, len(response.content))
+
     def update(self):
-        self.set_filter()
+        response, from_snapshot = self.get_exchange_info()
+        self.set_filter(response)
 
         self.update_exchange_rate()
 
-    def update_exchange_rate(self):
-        exchange_rate_df = pd.read_csv('../data/q_last_exchange_rate.csv',index_col=0,skiprows=1)
+        if from_snapshot:
+            self.refresh_exchange_info_in_background()
 
-        exchange_rate_df.columns = ['close']
-        for index, row in exchange_rate_df.iterrows():
-            self.exchange_rate[index.replace(self.quote_asset, '')] = float(row['close'])
-        self.exchange_rate[self.quote_asset] = 1
+    def load_exchange_info_snapshot(self, max_age=math.inf):
+        """
+        :return: exchange info from exchange_info_path if it is younger than max_age seconds, else None
+        """
+        try:
+            if time.time() - os.path.getmtime(self.exchange_info_path) >= max_age:
+                return None
+            with open(self.exchange_info_path) as file_object:
+                response = json.load(file_object)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            write_log('load_exchange_info_snapshot', e)
+            return None
+        self.rate_limits = response.get('rateLimits')
+        if self.rate_limits:
+            self.rate_limiter.configure(self.rate_limits)
+        return response
 
+    def get_exchange_info(self, max_age=None):
+        """
+        :param max_age: seconds a snapshot stays valid, config `exchange_info_ttl` or one hour by default
+        :return: (exchange info, True if it was loaded from the snapshot)
+        """
+        if max_age is None:
+            try:
+                max_age = get_config('exchange_info_ttl')
+            except EnvironmentError:
+                max_age = 3600
+        response = self.load_exchange_info_snapshot(max_age)
+        if response is not None:
+            return response, True
+        response = self.save_exchange_info(self.my_exchange_info())
+        if response is None:
+            # a stale snapshot is better than no filters at all
+            response = self.load_exchange_info_snapshot()
+            return response, response is not None
+        return response, False
+
+    def save_exchange_info(self, response):
+        if response is not None:
+            path = self.exchange_info_path + '.tmp'
+            try:
+                with open(path, 'w') as file_object:
+                    json.dump(response, file_object)
+                os.replace(path, self.exchange_info_path)
+            except OSError as e:
+                write_log('save_exchange_info', e)
+        return response
 
+    def refresh_exchange_info(self):
+        response = self.save_exchange_info(self.my_exchange_info())
+        if response is not None:
+            self.set_filter(response)
+        return response
 
+    def refresh_exchange_info_in_background(self):
+        """
+        Replaces the filters loaded from the snapshot with a fresh exchange info without blocking startup.
+        """
+        thread = threading.Thread(target=self.refresh_exchange_info, daemon=True)
+        thread.start()
+        return thread
 
+    def update_exchange_rate(self):
+        exchange_rate_df = pd.read_csv('../data/q_last_exchange_rate.csv', index_col=0, skiprows=1)
+        self.set_exchange_rates(exchange_rate_df.index, exchange_rate_df.iloc[:, 0].to_numpy(dtype=float))
 
-    def set_filter(self):
+    def set_exchange_rates(self, symbols, closes):
+        """
+        :param symbols: symbols or base assets, the quote asset is stripped from them
+        :param closes: their prices in the quote asset
+        """
+        assets = pd.Index(symbols).astype(str).str.replace(self.quote_asset, '', regex=False)
+        self.exchange_rate.update(zip(assets, np.asarray(closes, dtype=float).tolist()))
+        self.exchange_rate[self.quote_asset] = 1
+
+    def update_exchange_rate_from_klines(self, kline_columns):
+        """
+        Sets the rates from the latest close of every symbol of a KlineBinanceDAO sweep.
+        """
+        symbols, closes = kline_columns.last_closes()
+        self.set_exchange_rates(symbols, closes)
+        return len(symbols)
+
+    def update_exchange_rate_from_ticker(self, max_age=None):
+        """
+        Sets the rates from the ticker cache quotes of the quote asset pairs younger than max_age.
+        :return: number of rates updated
+        """
+        if self.ticker_cache is None:
+            return 0
+        now = time.time()
+        max_age = self.ticker_cache.max_age if max_age is None else max_age
+        with self.ticker_cache.lock:
+            quotes = [(symbol, price) for symbol, (price, updated) in self.ticker_cache.prices.items()
+                      if symbol.endswith(self.quote_asset) and now - updated <= max_age]
+        if quotes:
+            symbols, prices = zip(*quotes)
+            self.set_exchange_rates(symbols, prices)
+        return len(quotes)
+
+    def set_filter(self, response=None):
         """
         Sets the filters for trading pairs based on the exchange information.
 
@@ -81,7 +219,7 @@ class BinanceAPIWrapper:
         `self.lot_size` and `self.price_fiter` dictionaries.
 
         The method performs the following steps:
-        1. Calls the `my_exchange_info` method to get the exchange information.
+        1. Calls the `my_exchange_info` method to get the exchange information, unless it is passed as `response`.
         2. Iterates over the symbols in the exchange information.
         3. For each symbol, checks if the quote asset matches `self.quote_asset` and if the symbol is trading.
         4. If the symbol matches, sets the lot size and price filters based on the symbol's filters.
@@ -92,7 +230,10 @@ class BinanceAPIWrapper:
         Example:
             self.set_filter()
         """
-        response = self.my_exchange_info()
+        if response is None:
+            response = self.my_exchange_info()
+        assets1 = get_config_set('assets1')
+        symbol_filters = SymbolFilterIndex()
         for row in response['symbols']:
             row_base_asset = row['baseAsset']
             row_quote_asset = row['quoteAsset']
@@ -102,10 +243,8 @@ class BinanceAPIWrapper:
                 continue
             if row_quote_asset != self.quote_asset:
                 continue
-            if get_config('assets1'):
-                if row_base_asset in [base_asset  for base_asset in
-                                          get_config('assets1')]:
-                    filter_out = True
+            if row_base_asset in assets1:
+                filter_out = True
             if not filter_out:
                 if row_quote_asset == self.quote_asset and row['status'] == 'TRADING':
                     quote_precision=row['quotePrecision']
@@ -113,6 +252,12 @@ class BinanceAPIWrapper:
                         self.price_filter[row_quote_asset]= round(0.1**int(quote_precision), quote_precision)
                     if not self.lot_size.get(row_quote_asset):
                         self.lot_size[row_quote_asset]= round(0.1**int(quote_precision), quote_precision)
+                    if row_quote_asset not in symbol_filters:
+                        symbol_filters.add_precision(row_quote_asset, quote_precision)
+                    try:
+                        symbol_filters.add_symbol(row)
+                    except Exception as e:
+                        write_log('set_filter symbol_filters', row_base_asset, e)
                     for row_filter in row['filters']:
                         if row_filter['filterType'] == 'LOT_SIZE':
                             try:
@@ -126,8 +271,19 @@ class BinanceAPIWrapper:
                             except Exception as e:
                                 self.price_filter[row_base_asset] = None
                                 write_log('set_filter', row_base_asset, row_filter['minPrice'], e)
+        self.symbol_filters = symbol_filters
+
+    def server_time(self):
+        self.rate_limiter.acquire(1)
+        return self.client.time()['serverTime']
 
     def get_time_difference(self):
+        """
+        :return: server time - local time, from the clock sync once it has samples
+        """
+        if self.clock_sync.offset is not None:
+            return pd.Timedelta(milliseconds=self.clock_sync.offset)
+
         t0 = datetime.now()
         time_server = self.my_time()['serverTime']
 
@@ -144,6 +300,8 @@ class BinanceAPIWrapper:
     def asset_lot_size_filter(self, asset, amount):
         amount_to_trade = None
         try:
+            if asset in self.symbol_filters:
+                return self.symbol_filters.round_quantity(asset, amount)
             amount = float(amount)
             lot_size = self.lot_size[asset]
             amount_to_trade=math.floor(amount/lot_size)*lot_size
@@ -155,6 +313,8 @@ class BinanceAPIWrapper:
     def asset_price_filter(self, asset, amount):
         amount_to_trade = None
         try:
+            if asset in self.symbol_filters:
+                return self.symbol_filters.round_price(asset, amount)
             amount = float(amount)
             lot_size = self.price_filter[asset]
             amount_to_trade=math.floor(amount/lot_size)*lot_size
@@ -165,18 +325,15 @@ class BinanceAPIWrapper:
 
     def handle_connection_error(self, e):
         write_log(f"ConnectionError: {e}")
-        time.sleep(1)  # Wait longer before retrying
         return False
 
     def handle_index_error(self, e):
         write_log(f"handle_index_error: {e}")
         self.gmailAPIWrapper.send_email('index error.', '413')
-        time.sleep(1)  # Wait longer before retrying
         return True
 
     def handle_timeout_error(self, e):
         write_log(f"TimeoutError: {e}")
-        time.sleep(1)  # Wait a bit before retrying
         return False
 
     def handle_value_error(self, e):
@@ -184,94 +341,27 @@ class BinanceAPIWrapper:
         return False
 
     def handle_client_error(self, error: ClientError):
+        """
+        :return: True to stop retrying, see retry.ERROR_CODES and retry.ERROR_MESSAGES
+        """
         write_log(f"ClientError: {error.error_message}")
-        if error.error_message == 'Exceeding the maximum transferable limit.':
-            return True
-        elif error.error_message == 'Balance is not enough':
-            return True
-        elif error.error_message == 'Margin account are not allowed to trade this trading pair.':
-            return True
-        elif error.error_message == 'This isolated margin pair is disabled. Please activate it.':
-            return True
-        elif error.error_message == 'Illegal characters found in a parameter.':
-            return True
-        elif error.error_message == 'Too many requests; current request has limited.':
-            self.gmailAPIWrapper.send_email('enable Too many requests; current request has limited.', '')
-            return True
-        elif error.error_message == 'You cannot disable this isolated margin pair, as there are still assets or debts of this pair.':
-            return True
-        elif error.error_message == 'Transfer out amount exceeds max amount.':
-            return True
-        elif error.error_message == 'Balance is not enough':
-            return True
-        elif error.error_message == 'Not a valid margin asset.':
-            return True
-        elif error.error_message == 'The system does not have enough asset now.':
-            return True
-        elif error.error_message == 'Borrow is banned for this asset.':
-            return True
-        elif error.error_message == 'Order does not exist.':
-            return True
-        elif error.error_message == 'Invalid symbol.':
-            return True
-        elif error.error_message == 'Order would immediately match and take.':
-            return True
-        elif error.error_message == 'Unknown order sent.':
-            return True
-        if error.error_message == 'Balance is not enough':
-            return True
-        elif error.error_message == 'The unpaid debt is too small after this repayment.':
-            self.gmailAPIWrapper.send_email('The unpaid debt is too small after this repayment.', '')
-            return True
-        if error.error_message == 'This isolated margin pair is disabled. Please activate it.':
-            return True
-        elif error.error_message == 'Balance is not enough':
-            return True
-        elif error.error_message == 'Not a valid margin asset.':
-            return True
-        elif error.error_message == 'The system does not have enough asset now.':
-
-            return True
-        elif error.error_message == 'Borrow is banned for this asset.':
-
-            self.gmailAPIWrapper.send_email('ban', self.asset)
-            return True
-        elif error.error_message == 'Asset is not in symbol.':
-            return True
-        elif error.error_message == 'Repay amount exceeds borrow amount.':
-            return True
-        elif error.error_message == 'Timestamp for this request is outside of the recvWindow.':
-            time.sleep(3)
-            return False
-        else:
+        action = classify_client_error(error)
+        if error.error_code == -1021 and self.clock_sync is not None:
+            # the retry is signed with the corrected clock instead of waiting for the drift to pass
+            self.clock_sync.request_resync()
+        if action == ALERT:
+            self.gmailAPIWrapper.send_email(error.error_message, self.asset or '')
+        elif action is None:
             self.gmailAPIWrapper.send_email('new error', error.error_message)
-            return True
+        return action != RETRY
 
-    def retry_on_exceptions(retries = 5, delays=1, exception_handlers=None):
-        def decorator(func):
-            def wrapper(self, *args, **kwargs):
-                for i in range(retries):
-                    try:
-                        return func(self, *args, **kwargs)
-                    except Exception as e:
-                        exception_type = type(e)
-                        if exception_handlers and exception_type in exception_handlers:
-                            should_break = exception_handlers[exception_type](self, e)
-                            if should_break:
-                                break
-                        write_log(f"Retrying {func.__name__} after exception: {e}")
-                    time.sleep(delays)
-                self.gmailAPIWrapper.send_email('my_isolated_margin_account', 'error')
-                return None
-            return wrapper
-
-        return decorator
-
-    @retry_on_exceptions(5, 1)
+    @retry_on_exceptions(5, 1, weight=20)
     def my_exchange_info(self):
         write_log('Calling my_exchange_info API')
         response = self.client.exchange_info()
         self.rate_limits=response['rateLimits']
+        if self.rate_limits:
+            self.rate_limiter.configure(self.rate_limits)
         return response
 
     @retry_on_exceptions(retries=5, delays=1, exception_handlers={
@@ -282,7 +372,7 @@ class BinanceAPIWrapper:
         return response
 
     @retry_on_exceptions(retries=5, delays=1, exception_handlers={
-    })
+    }, weight=10)
     def my_isolated_margin_all_pairs(self):
         write_log('Calling my_isolated_margin_all_pairs API')
         response = self.client.isolated_margin_all_pairs()
@@ -297,7 +387,7 @@ class BinanceAPIWrapper:
 
 
     @retry_on_exceptions(5, 1, exception_handlers={
-    })
+    }, weight=20)
     def my_account(self):
         write_log('calling my_account api')
         response = self.client.account()
@@ -311,14 +401,14 @@ class BinanceAPIWrapper:
         return response
 
     @retry_on_exceptions(5, 1, exception_handlers={
-    })
+    }, weight=10)
     def my_margin_account(self):
         write_log('calling my_margin_account api')
         response = self.client.margin_account()
         return response
 
 
-    @retry_on_exceptions(10, 1, exception_handlers={ClientError: handle_client_error})
+    @retry_on_exceptions(10, 1, exception_handlers={ClientError: handle_client_error}, weight=300)
     def my_cancel_isolated_margin_account(self, symbol):
         """
         response = {'success': False}
@@ -342,6 +432,8 @@ class BinanceAPIWrapper:
         write_log('my_margin_transfer', [asset, amount, p3])
         try:
             amount = self.asset_lot_size_filter(asset, amount)
+            if asset in self.symbol_filters:
+                amount = self.symbol_filters.format_quantity(asset, amount)
         except Exception as e:
             print('181', e)
 
@@ -357,7 +449,8 @@ class BinanceAPIWrapper:
 
         return response
 
-    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error})
+    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error},
+                         weight=lambda symbol, interval, **kwargs: klines_weight(kwargs.get('limit', 500)))
     def my_klines(self, symbol, interval, **kwargs):
         """
         response = ''
@@ -373,13 +466,14 @@ class BinanceAPIWrapper:
 
         return response
 
-    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error})
+    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error},
+                         weight=lambda asset, **params: depth_weight(params.get('limit', 100)))
     def my_depth(self, asset, **params):
         write_log('  api my_depth')
         response = self.client.depth(asset, **params)
         return response
 
-    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error})
+    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, orders=1)
     def my_new_order(self, symbol, side, order_type, **params):
         """
         response = {'orderId': ''}
@@ -387,13 +481,14 @@ class BinanceAPIWrapper:
         """
         write_log('  api my_new_order', str(params))
 
+        params = self.symbol_filters.format_params(symbol, side, params)
         response = self.client.new_order(symbol, side, order_type, **params)
 
         write_log('my_new_order', str(response))
 
         return response
 
-    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error})
+    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=10)
     def my_margin_order(self, symbol, **params):
         """
          Args:
@@ -415,7 +510,7 @@ class BinanceAPIWrapper:
 
         return response
 
-    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error})
+    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=6, orders=1)
     def my_new_margin_order(self, symbol, side, order_type, **params):
         """
         response = {'orderId': ''}
@@ -425,46 +520,132 @@ class BinanceAPIWrapper:
         """
         write_log('  api my_new_margin_order', [symbol, side, order_type, str(params)])
 
+        params = self.symbol_filters.format_params(symbol, side, params)
         response = self.client.new_margin_order(symbol, side, order_type, **params)
 
         write_log('my_new_margin_order', str(response))
 
         return response
 
+    def my_new_margin_orders(self, orders, validate=True, **kwargs):
+        """
+        Places many margin orders at once, see AsyncBinanceAPIWrapper.my_new_margin_orders. The
+        async wrapper and its loop are kept between calls so the connections stay warm.
+
+        :param validate: round and check the orders against self.symbol_filters before sending
+        :return: one {'index', 'symbol', 'ok', 'response', 'error'} dict per order
+        """
+        from trade_binance.async_binance_api_wrapper import AsyncBinanceAPIWrapper
 
+        if self.loop_thread is None:
+            self.loop_thread = LoopThread()
+            self.async_api = AsyncBinanceAPIWrapper(self.client.base_url, self.client.api_key,
+                                                    self.client.api_secret, clock_sync=self.clock_sync)
+        symbol_filters = self.symbol_filters if validate else None
+        return self.loop_thread.run(self.async_api.my_new_margin_orders(orders, symbol_filters, **kwargs))
 
-    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error})
+    def close(self):
+        """
+        Stops the background streams and threads and closes the async session.
+        """
+        self.stop_ticker_cache()
+        self.stop_order_books()
+        self.clock_sync.stop()
+        if self.loop_thread is not None:
+            self.loop_thread.run(self.async_api.close())
+            self.loop_thread.stop()
+            self.loop_thread = None
+            self.async_api = None
+
+    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=2)
     def my_ticker_price(self, symbol):
         write_log('  api my_ticker_price')
         response = self.client.ticker_price(symbol)
         write_log(str(response))
         return response
 
+    @retry_on_exceptions(5, 1, exception_handlers={ClientError: handle_client_error}, weight=4)
+    def my_ticker_prices(self):
+        write_log('  api my_ticker_prices')
+        response = self.client.ticker_price()
+        return response
 
+    def start_ticker_cache(self, max_age=5, stream=True, timeout=30, **kwargs):
+        """
+        Serves get_price_current from a TickerPriceCache.
 
+        :param max_age: seconds after which a cached price is stale
+        :param stream: keep the cache current from the all-market stream, otherwise it is refreshed
+            with one my_ticker_prices call whenever a price is stale
+        :param kwargs: passed to TickerPriceCache, e.g. book_ticker_symbols or ws_url
+        """
+        self.stop_ticker_cache()
+        self.ticker_cache = TickerPriceCache(max_age=max_age, rest_url=self.client.base_url, **kwargs)
+        if not stream:
+            return True
+        self.ticker_cache.start()
+        return self.ticker_cache.wait_connected(timeout)
+
+    def stop_ticker_cache(self):
+        if self.ticker_cache is not None:
+            self.ticker_cache.stop()
+            self.ticker_cache = None
+
+    def refresh_ticker_prices(self):
+        response = self.my_ticker_prices()
+        if response is not None:
+            self.ticker_cache.update_from_rest(response)
+        return response
 
+    def get_ticker_price(self, symbol, max_age=None):
+        """
+        :return: {'symbol': symbol, 'price': price, 'age': seconds} from the ticker cache, refreshed with
+            my_ticker_prices when stale; {'symbol': symbol, 'price': price} from my_ticker_price without a cache
+        """
+        if self.ticker_cache is None:
+            return self.my_ticker_price(symbol)
+        quote = self.ticker_cache.get_price(symbol, max_age)
+        if quote is None and self.ticker_cache.rest_age() > (max_age or self.ticker_cache.max_age):
+            # a refresh makes every listed symbol fresh, so refresh at most once per max_age
+            self.refresh_ticker_prices()
+            quote = self.ticker_cache.get_price(symbol, max_age)
+        if quote is None:
+            return None
+        return {'symbol': symbol, 'price': quote[0], 'age': quote[1]}
 
+    def start_order_books(self, symbols, timeout=30, **kwargs):
+        """
+        Maintains local order books for `symbols` from the diff-depth streams, get_price_deep and
+        get_price_deep_adjust then read them instead of calling my_depth.
 
+        :param kwargs: passed to OrderBookManager, e.g. ws_url
+        :return: True if the stream is connected and the snapshots are loaded
+        """
+        self.stop_order_books()
+        self.order_books = OrderBookManager(symbols, rest_url=self.client.base_url, **kwargs)
+        self.order_books.start()
+        return self.order_books.wait_connected(timeout)
 
+    def stop_order_books(self):
+        if self.order_books is not None:
+            self.order_books.stop()
+            self.order_books = None
 
-
-
+    def get_depth(self, symbol, limit):
+        """
+        :return: depth from the local order book when it is synced for the symbol, from my_depth otherwise
+        """
+        if self.order_books is not None:
+            response = self.order_books.depth(symbol, limit)
+            if response is not None:
+                return response
+        return self.my_depth(symbol, limit=limit)
 
     def get_price_deep_adjust(self, side, symbol):
-        params = {
-            'limit': 100
-        }
-        response = self.my_depth(symbol, **params)
+        response = self.get_depth(symbol, 100)
 
-        try:
-            results_depth_time = [[datetime.now(), {symbol: response}]]
-            df = pd.DataFrame(results_depth_time)
-            df.columns = ['time', 'data']
-            csv_filename = '../data/q_trade_depth' + str(datetime.now().year) + str(datetime.now().month) + str(
-                datetime.now().day) + '.csv'
-            df.to_csv(csv_filename, mode='a', header=False, compression='gzip')
-        except Exception as e:
-            write_log(e)
+        if response is not None:
+            self.depth_recorder.record(symbol, response)
 
         try:
             bids = response['bids']
@@ -498,21 +679,21 @@ class BinanceAPIWrapper:
         except Exception as e:
             write_log(e)
             return None
-        
+
     def get_price_current(self, side, symbol):
         """
         :param side: 'BUY' OR 'SELL'
         :param symbol:
         :return:
         """
-        response = self.my_ticker_price(symbol)
+        response = self.get_ticker_price(symbol)
         try:
-            price_filter = str(self.price_filter[symbol.replace(self.quote_asset, '')])
+            asset = symbol.replace(self.quote_asset, '')
             price=None
             if side == 'BUY':
-                price = math.ceil(float(response['price']) / float(price_filter)) * float(price_filter)
+                price = self.symbol_filters.round_price(asset, response['price'], 'ceil')
             if side == 'SELL':
-                price = math.floor(float(response['price']) / float(price_filter)) * float(price_filter)
+                price = self.symbol_filters.round_price(asset, response['price'], 'floor')
             return price
         except Exception as e:
             write_log(e)
@@ -524,10 +705,8 @@ class BinanceAPIWrapper:
         :param symbol:
         :return:
         """
-        params = {
-            'limit': 5
-        }
-        response = self.my_depth(symbol, **params)
+        # only the best level is read, a synced local book serves it from its cached top
+        response = self.get_depth(symbol, 1)
 
         try:
             bids = response['bids']
@@ -543,15 +722,3 @@ class BinanceAPIWrapper:
         except Exception as e:
             write_log('get_price_deep',e)
             return None
-
-
-
-
-
-
-
-
-
-
-
-
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+
+import aiohttp
+
+from trade_binance.utils import write_log
+
+
+class BinanceStream:
+    """
+    Base class for a Binance websocket connection running on its own background thread.
+
+    Subclasses return the stream names to subscribe to from `streams()` and handle payloads in
+    `on_message()`. `on_connect()` is awaited after every (re)connect before any message is read,
+    so a subclass can bootstrap or gap-fill from REST while updates queue up on the socket.
+    """
+    def __init__(self, ws_url='wss://stream.binance.com:9443/stream', reconnect_delay=1,
+                 subscribe_chunk=200):
+        self.ws_url = ws_url
+        self.reconnect_delay = reconnect_delay
+        self.subscribe_chunk = subscribe_chunk
+
+        self.connected = threading.Event()
+        self.reconnects = 0
+
+        self._thread = None
+        self._loop = None
+        self._ws = None
+        self._stopping = False
+
+    def streams(self):
+        return []
+
+    async def url(self, session):
+        """
+        :return: websocket url of the next connect, e.g. one built from a fresh listenKey
+        """
+        return self.ws_url
+
+    async def on_connect(self, session, reconnect):
+        pass
+
+    def on_message(self, stream, data):
+        pass
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stopping = True
+        if self._loop is not None and self._ws is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._ws.close(), self._loop)
+            except RuntimeError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.connected.clear()
+
+    def wait_connected(self, timeout=None):
+        return self.connected.wait(timeout)
+
+    async def _subscribe(self, ws):
+        streams = self.streams()
+        for request_id, start in enumerate(range(0, len(streams), self.subscribe_chunk)):
+            if request_id:
+                # Binance accepts at most 5 incoming messages per second per connection
+                await asyncio.sleep(0.25)
+            await ws.send_json({'method': 'SUBSCRIBE',
+                                'params': streams[start:start + self.subscribe_chunk],
+                                'id': request_id + 1})
+
+    def _dispatch(self, raw):
+        message = json.loads(raw)
+        if isinstance(message, dict) and 'stream' in message and 'data' in message:
+            self.on_message(message['stream'], message['data'])
+        elif isinstance(message, dict) and 'id' in message and 'result' in message:
+            return
+        else:
+            self.on_message(None, message)
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        reconnect = False
+        async with aiohttp.ClientSession() as session:
+            while not self._stopping:
+                try:
+                    async with session.ws_connect(await self.url(session)) as ws:
+                        self._ws = ws
+                        await self._subscribe(ws)
+                        await self.on_connect(session, reconnect)
+                        self.connected.set()
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                try:
+                                    self._dispatch(msg.data)
+                                except Exception as e:
+                                    write_log('BinanceStream message', self.ws_url, e)
+                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                break
+                except Exception as e:
+                    write_log('BinanceStream connection', self.ws_url, e)
+                finally:
+                    self._ws = None
+                    self.connected.clear()
+                if self._stopping:
+                    break
+                reconnect = True
+                self.reconnects += 1
+                await asyncio.sleep(self.reconnect_delay)
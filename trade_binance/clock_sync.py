@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from binance.spot import Spot
+
+from trade_binance.utils import write_log
+
+
+class ClockSync:
+    """
+    Estimate of the server clock from periodic `/api/v3/time` samples.
+
+    Every sample gives offset = server time - local midpoint of the request and its round-trip time.
+    Samples with a long round trip are the least accurate, so only those of the recent window within
+    1.5x of the fastest round trip are used. The drift is the slope of their offsets over local time,
+    their median offset carried forward by the drift is smoothed exponentially, and timestamp()
+    extrapolates with the drift between samples.
+
+    Round-trip jitter swamps the slope of samples taken close together, e.g. one burst, so the drift
+    is only fitted once the samples span `min_drift_span` seconds and is clamped to `max_drift`.
+
+    :param fetch_server_time: callable returning the server time in ms
+    :param max_drift: largest drift in ms per second, 0.5 is 500 ppm, well above a quartz clock
+    """
+    def __init__(self, fetch_server_time, interval=30, burst=5, window=16, smoothing=0.3, min_drift_span=300,
+                 max_drift=0.5, now=time.time):
+        self.fetch_server_time = fetch_server_time
+        self.interval = interval
+        self.burst = burst
+        self.smoothing = smoothing
+        self.min_drift_span = min_drift_span
+        self.max_drift = max_drift
+        self.now = now
+        self.samples = deque(maxlen=window)
+        self.offset = None
+        self.drift = 0.0
+        self.updated = None
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """
+        :return: (offset in ms, round-trip time in ms) of one request
+        """
+        t0 = self.now()
+        server_time = self.fetch_server_time()
+        t1 = self.now()
+        offset = server_time - (t0 + t1) * 500
+        rtt = (t1 - t0) * 1000
+        self.add_sample(t1, offset, rtt)
+        return offset, rtt
+
+    def add_sample(self, local_time, offset, rtt):
+        with self.lock:
+            self.samples.append((local_time, offset, rtt))
+            times, offsets, rtts = np.array(self.samples).T
+            good = rtts <= rtts.min() * 1.5 + 1
+            times, offsets = times[good], offsets[good]
+            if len(times) >= 3 and times[-1] - times[0] >= self.min_drift_span:
+                drift = float(np.polyfit(times - times[0], offsets, 1)[0])
+                self.drift = min(max(drift, -self.max_drift), self.max_drift)
+            filtered = float(np.median(offsets + self.drift * (local_time - times)))
+            if self.offset is None:
+                self.offset = filtered
+            else:
+                self.offset += self.smoothing * (filtered - self.offset)
+            self.updated = local_time
+
+    def resync(self, count=None):
+        """
+        Takes `count` samples right away, e.g. after the server rejected a timestamp.
+        """
+        for _ in range(self.burst if count is None else count):
+            try:
+                self.sample()
+            except Exception as e:
+                write_log('ClockSync', e)
+
+    def request_resync(self):
+        """
+        Asks the background thread for a burst of samples without waiting for it.
+        """
+        self._wake.set()
+
+    def timestamp(self):
+        """
+        :return: local time corrected to the server clock in ms, plain local time before the first sample
+        """
+        now = self.now()
+        with self.lock:
+            if self.offset is None:
+                return int(now * 1000)
+            return int(now * 1000 + self.offset + self.drift * (now - self.updated))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        self.resync()
+        while not self._stop.is_set():
+            woken = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.resync(None if woken else 1)
+
+
+class ClockSyncedSpot(Spot):
+    """
+    Spot client that signs requests with ClockSync.timestamp() instead of the local clock.
+    """
+    def __init__(self, api_key=None, api_secret=None, clock_sync=None, **kwargs):
+        super().__init__(api_key=api_key, api_secret=api_secret, **kwargs)
+        self.clock_sync = clock_sync
+
+    def timestamp(self):
+        return self.clock_sync.timestamp() if self.clock_sync is not None else int(time.time() * 1000)
+
+    def sign_request(self, http_method, url_path, payload=None):
+        if payload is None:
+            payload = {}
+        payload["timestamp"] = self.timestamp()
+        query_string = self._prepare_params(payload)
+        payload["signature"] = self._get_sign(query_string)
+        return self.send_request(http_method, url_path, payload)
+
+    def limited_encoded_sign_request(self, http_method, url_path, payload=None):
+        if payload is None:
+            payload = {}
+        payload["timestamp"] = self.timestamp()
+        query_string = self._prepare_params(payload)
+        url_path = url_path + "?" + query_string + "&signature=" + self._get_sign(query_string)
+        return self.send_request(http_method, url_path)
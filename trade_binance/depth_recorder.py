@@ -0,0 +1,138 @@
+import atexit
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from trade_binance.utils import write_log
+
+MAGIC = b'QDEPTH1\0'
+HEADER_SIZE = 64
+
+
+def depth_dtype(levels):
+    """
+    Fixed-width record of one snapshot: `levels` [price, quantity] rows per side, padded with NaN.
+    """
+    return np.dtype([
+        ('time', '<i8'),
+        ('symbol', 'S16'),
+        ('last_update_id', '<i8'),
+        ('bids', '<f8', (levels, 2)),
+        ('asks', '<f8', (levels, 2)),
+    ])
+
+
+def depth_file_path(directory, timestamp):
+    day = datetime.fromtimestamp(timestamp / 1000)
+    return os.path.join(directory, 'q_trade_depth' + day.strftime('%Y%m%d') + '.bin')
+
+
+def read_depth_snapshots(path):
+    """
+    :return: read-only memory map of the records in a day file, e.g. records['bids'][:, 0, 0] are the best bids
+    """
+    with open(path, 'rb') as file_object:
+        header = file_object.read(HEADER_SIZE)
+    if header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a depth snapshot file')
+    levels, = struct.unpack_from('<I', header, len(MAGIC))
+    dtype = depth_dtype(levels)
+    count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+class DepthRecorder:
+    """
+    Records depth responses to one append-only binary file per day.
+
+    record() only queues the response; a background thread started on first use converts batches
+    into fixed-width records and appends them. Snapshots are dropped rather than blocking the caller
+    when the queue is full. Queued snapshots are written on close() and at interpreter exit.
+    """
+    _stop = object()
+
+    def __init__(self, directory='../data', levels=100, flush_interval=1.0, max_queue=10000):
+        self.directory = directory
+        self.levels = levels
+        self.dtype = depth_dtype(levels)
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record(self, symbol, response, timestamp=None):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+        try:
+            self.queue.put_nowait((timestamp, symbol, response))
+        except queue.Full:
+            self.dropped += 1
+
+    def to_records(self, snapshots):
+        records = np.zeros(len(snapshots), dtype=self.dtype)
+        records['bids'] = np.nan
+        records['asks'] = np.nan
+        for i, (timestamp, symbol, response) in enumerate(snapshots):
+            records['time'][i] = timestamp
+            records['symbol'][i] = symbol.encode()
+            records['last_update_id'][i] = response.get('lastUpdateId', 0)
+            for side in ('bids', 'asks'):
+                rows = (response.get(side) or [])[:self.levels]
+                if rows:
+                    records[side][i, :len(rows)] = np.array(rows, dtype=np.float64)
+        return records
+
+    def write(self, snapshots):
+        records = self.to_records(snapshots)
+        paths = [depth_file_path(self.directory, timestamp) for timestamp, _, _ in snapshots]
+        for path in dict.fromkeys(paths):
+            selected = records[[i for i, record_path in enumerate(paths) if record_path == path]]
+            new_file = not os.path.exists(path)
+            with open(path, 'ab') as file_object:
+                if new_file:
+                    file_object.write(MAGIC + struct.pack('<I', self.levels).ljust(HEADER_SIZE - len(MAGIC), b'\0'))
+                file_object.write(selected.tobytes())
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            snapshots = []
+            item = self.queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is self._stop:
+                    stopping = True
+                    break
+                snapshots.append(item)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if snapshots:
+                try:
+                    self.write(snapshots)
+                except Exception as e:
+                    write_log('DepthRecorder', e)
+
+    def close(self, timeout=5):
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(self._stop)
+            self._thread.join(timeout)
+        self._thread = None
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+import numpy as np
+
+from trade_binance.kline_cache import INTERVAL_MS
+from trade_binance.kline_disk_store import KlineDiskStore, kline_records
+from trade_binance.rate_limiter import klines_weight
+from trade_binance.retry import backoff_delay
+from trade_binance.utils import write_log
+
+
+def page_ranges(start_time, end_time, interval, limit=1000):
+    """
+    :return: [(startTime, endTime)] pages of at most `limit` candles covering open times start_time to end_time
+    """
+    step = INTERVAL_MS[interval]
+    start_time = -(-start_time // step) * step
+    return [(start, min(start + limit * step - 1, end_time)) for start in range(start_time, end_time + 1, limit * step)]
+
+
+class KlineBackfill:
+    """
+    Downloads the candles of many symbols between two open times into a KlineDiskStore.
+
+    Each symbol's range is split into startTime/endTime pages of `page_limit` candles. Symbols are
+    downloaded concurrently, `pages_in_flight` pages of a symbol at a time, and every request waits
+    for the shared RateLimiter, so a run stays inside the weight budget of the other components.
+    Pages are appended in order to a staging store in the `backfill` subdirectory and the start and
+    the next open time of every symbol are checkpointed, a run started again with the same store and
+    interval resumes where the last one stopped when its start time lies in the checkpointed range,
+    and starts over otherwise. Pages staged after the last checkpoint are downloaded again
+    and skipped as already stored. A symbol's staged candles are merged into the store once all its
+    pages are in, in one rewrite when they are older than candles the store already holds, e.g.
+    from live sweeps.
+    """
+    def __init__(self, dao, interval, start_time, end_time=None, store=None, quote_asset='USDT',
+                 page_limit=1000, pages_in_flight=4, concurrency=100, retries=5, checkpoint_interval=5):
+        """
+        :param dao: KlineBinanceDAO whose loop, session, rate limiter and metrics are used
+        :param store: KlineDiskStore, the DAO's kline_store or one in ../data/klines by default
+        :param start_time: first open time in ms
+        :param end_time: last open time in ms, candles still open at the time of the run are never written
+        """
+        self.dao = dao
+        self.interval = interval
+        self.step = INTERVAL_MS[interval]
+        self.start_time = start_time
+        self.end_time = end_time
+        self.store = store or dao.kline_store or KlineDiskStore()
+        self.quote_asset = quote_asset
+        self.page_limit = page_limit
+        self.pages_in_flight = pages_in_flight
+        self.concurrency = concurrency
+        self.retries = retries
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_path = os.path.join(self.store.directory, f'backfill_{interval}.json')
+        self.staging = KlineDiskStore(os.path.join(self.store.directory, 'backfill'))
+        self.checkpoint = {}
+        self.checkpoint_saved = 0
+        self.written = {}
+        self.failed = []
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as file_object:
+                self.checkpoint = json.load(file_object)
+        except FileNotFoundError:
+            self.checkpoint = {}
+        except (OSError, ValueError) as e:
+            write_log('KlineBackfill checkpoint', e)
+            self.checkpoint = {}
+        return self.checkpoint
+
+    def save_checkpoint(self, force=False):
+        if not force and time.monotonic() - self.checkpoint_saved < self.checkpoint_interval:
+            return
+        path = self.checkpoint_path + '.tmp'
+        try:
+            with open(path, 'w') as file_object:
+                json.dump(self.checkpoint, file_object)
+            os.replace(path, self.checkpoint_path)
+        except OSError as e:
+            write_log('KlineBackfill checkpoint', e)
+        self.checkpoint_saved = time.monotonic()
+
+    async def fetch_page(self, session, semaphore, symbol, start, end):
+        """
+        :return: raw candles of one page, None if every attempt failed
+        """
+        url = (f'{self.dao.base_url}/api/v3/klines?symbol={symbol}&interval={self.interval}'
+               f'&startTime={start}&endTime={end}&limit={self.page_limit}')
+        weight = klines_weight(self.page_limit)
+        for attempt in range(self.retries):
+            if attempt:
+                self.dao.metrics.add_retry('backfill_klines')
+            async with semaphore:
+                try:
+                    await self.dao.rate_limiter.acquire_async(weight)
+                    self.dao.metrics.add_weight('backfill_klines', weight)
+                    started = time.perf_counter()
+                    async with session.get(url) as response:
+                        self.dao.rate_limiter.on_response(response.status, response.headers)
+                        body = await response.read()
+                        if response.status == 200:
+                            self.dao.metrics.observe('backfill_klines', time.perf_counter() - started)
+                            self.dao.metrics.add_bytes('backfill_klines', len(body))
+                            return json.loads(body)
+                        self.dao.metrics.add_error('backfill_klines', response.status)
+                        if response.status == 400:
+                            # invalid symbol or parameters, another attempt gets the same answer
+                            write_log(f'backfill {symbol} {start}', body[:200])
+                            return None
+                except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                    self.dao.metrics.add_error('backfill_klines', type(e).__name__)
+            await asyncio.sleep(backoff_delay(attempt, 1, 30))
+        write_log(f'backfill {symbol} {start} failed after {self.retries} attempts')
+        return None
+
+    async def backfill_symbol(self, session, semaphore, symbol, end_time):
+        start_time = next_time = self.start_time
+        checkpoint = self.checkpoint.get(symbol)
+        if checkpoint is not None:
+            if checkpoint['start_time'] <= self.start_time <= checkpoint['next_time']:
+                start_time, next_time = checkpoint['start_time'], checkpoint['next_time']
+            elif self.start_time < checkpoint['start_time']:
+                write_log(f'backfill {symbol} starts before its checkpoint', checkpoint['start_time'])
+        pages = page_ranges(next_time, end_time, self.interval, self.page_limit)
+        for i in range(0, len(pages), self.pages_in_flight):
+            batch = pages[i:i + self.pages_in_flight]
+            responses = await asyncio.gather(*(self.fetch_page(session, semaphore, symbol, start, end)
+                                               for start, end in batch))
+            for (start, end), rows in zip(batch, responses):
+                if rows is None:
+                    self.failed.append(symbol)
+                    return
+                records = kline_records([row for row in rows if start <= row[0] <= end])
+                self.staging.append(symbol, self.interval, records)
+                self.checkpoint[symbol] = {'start_time': start_time, 'next_time': end + 1}
+            self.save_checkpoint()
+        self.merge(symbol)
+
+    def merge(self, symbol):
+        """
+        Moves the staged candles of a completed symbol into the store.
+        """
+        staged = self.staging.records(symbol, self.interval)
+        if len(staged):
+            self.written[symbol] = self.store.append(symbol, self.interval, np.array(staged))
+        del staged
+        path = self.staging.path(symbol, self.interval)
+        if os.path.exists(path):
+            os.remove(path)
+        self.staging.maps.pop(path, None)
+        self.staging.last_open_times.pop(path, None)
+
+    async def backfill(self, symbols):
+        self.load_checkpoint()
+        # the candle open at the time of the run would be written half formed
+        end_time = (int(time.time() * 1000) // self.step) * self.step - 1
+        if self.end_time is not None:
+            end_time = min(end_time, self.end_time)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        session = None
+        if self.dao.persistent:
+            session = await self.dao.get_session()
+        else:
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency,
+                                                                           ttl_dns_cache=400))
+        try:
+            await asyncio.gather(*(self.backfill_symbol(session, semaphore, symbol, end_time)
+                                   for symbol in symbols))
+        finally:
+            self.save_checkpoint(force=True)
+            if not self.dao.persistent:
+                await session.close()
+
+    def run(self, margin_asset_list):
+        """
+        :param margin_asset_list: base assets, paired with quote_asset
+        :return: {symbol: candles written}, symbols that failed are in self.failed and resume on the next run
+        """
+        self.written = {}
+        self.failed = []
+        self.dao.run(self.backfill([asset + self.quote_asset for asset in margin_asset_list]))
+        if self.failed:
+            self.dao.gmailAPIWrapper.send_email('backfill klines failed', ', '.join(self.failed))
+        return self.written
@@ -1,40 +1,114 @@
 import asyncio
 import inspect
-import json
+import time
 from datetime import datetime
 
 import aiohttp
+import numpy as np
 
-from trade_binance.utils import GmailAPIWrapper , write_log,
+from trade_binance.kline_backfill import KlineBackfill, page_ranges
+from trade_binance.kline_cache import INTERVAL_MS, KlineWindowCache
+from trade_binance.kline_columns import KlineColumns
+from trade_binance.kline_disk_store import kline_records
+from trade_binance.kline_parser import KlineParser, loads
+from trade_binance.kline_resample import interval_ratio, resample
+from trade_binance.kline_stream import KlineStream
+from trade_binance.loop_thread import LoopThread
+from trade_binance.metrics import Metrics
+from trade_binance.rate_limiter import RateLimiter, klines_weight
+from trade_binance.utils import GmailAPIWrapper , write_log
 
 class KlineBinanceDAO:
-    def __init__(self):
+    PARALLEL_REQUESTS = 400
+
+    def __init__(self, base_url='https://api.binance.com', incremental=False, persistent=False,
+                 keepalive_timeout=300, kline_store=None, parse_executor=None):
+        """
+        :param incremental: keep a rolling window per symbol and interval and only request the
+            candles since the last known open time after the first sweep
+        :param persistent: run sweeps on one background event loop with one aiohttp session, so
+            connections stay warm between sweeps instead of being set up by every asyncio.run
+        :param keepalive_timeout: seconds an idle pooled connection is kept in persistent mode
+        :param kline_store: KlineDiskStore the closed candles of every sweep are appended to
+        :param parse_executor: 'process' or an Executor the kline payloads of columnar sweeps are
+            parsed in, None to parse them on the event loop
+        """
+        self.base_url = base_url
+
+        self.persistent = persistent
+        self.keepalive_timeout = keepalive_timeout
+        self.loop_thread = LoopThread() if persistent else None
+        self.session = None
+        self.sweep_stats = {'seconds': None, 'new_connections': 0, 'reused_connections': 0}
+
+        self.kline_stream = None
+
+        self.incremental = incremental
+        self.kline_caches = {}
+
         self.kline_results_symbols = []
         self.kline_results = []
 
         self.kline_results_symbols_2 = []
         self.kline_results_2 = []
 
+        self.kline_columns = None
+        self.kline_store = kline_store
+        # raw candles of the last classic sweep per base asset, kept for kline_store only
+        self.kline_store_rows = {}
+        self.kline_parser = KlineParser(parse_executor)
+
         self.gmailAPIWrapper=GmailAPIWrapper()
 
-    async def gather_with_concurrency(self, n, urls, conn, symbol_base, maxtime_in_data):
+        self.rate_limiter = RateLimiter()
+        self.metrics = Metrics()
 
+    async def gather_with_concurrency(self, n, urls, conn, symbol_base, maxtime_in_data, kline_cache=None,
+                                      kline_columns=None, request_weight=1):
+
+        session = None
         try:
             semaphore = asyncio.Semaphore(n)
-            session = aiohttp.ClientSession(connector=conn)
+            session = await self.get_session() if conn is None else aiohttp.ClientSession(
+                connector=conn, trace_configs=[self.create_trace_config()])
 
             async def get(i, retries=5, backoff_factor=1):
                 for attempt in range(retries):
+                    if attempt:
+                        self.metrics.add_retry('gather_with_concurrency')
                     async with semaphore:
                         try:
+                            await self.rate_limiter.acquire_async(request_weight)
+                            self.metrics.add_weight('gather_with_concurrency', request_weight)
+                            started = time.perf_counter()
                             async with session.get(urls[i][0], ssl=False, ) as response:
                                 status_code = response.status
+                                self.rate_limiter.on_response(status_code, response.headers)
                                 if status_code == 200:
                                     if maxtime_in_data is None:
                                         self.kline_results_symbols.append(urls[i][2])
                                     else:
                                         self.kline_results_symbols_2.append(urls[i][2])
-                                    obj = json.loads(await response.read())
+                                    body = await response.read()
+                                    self.metrics.observe('gather_with_concurrency', time.perf_counter() - started)
+                                    self.metrics.add_bytes('gather_with_concurrency', len(body))
+                                    if kline_columns is not None and kline_cache is None:
+                                        open_time, values = await self.kline_parser.parse(body)
+                                        if maxtime_in_data is not None:
+                                            selected = open_time == maxtime_in_data
+                                            open_time, values = open_time[selected], values[:, selected]
+                                        kline_columns.append_arrays(urls[i][2], open_time, values)
+                                        return
+                                    obj = loads(body)
+                                    if kline_cache is not None:
+                                        obj = kline_cache.update(urls[i][2], obj, urls[i][3] is None)
+                                    if kline_columns is not None:
+                                        if maxtime_in_data is not None:
+                                            obj = [j for j in obj if j[0] == maxtime_in_data]
+                                        kline_columns.append(urls[i][2], obj)
+                                        return
+                                    if self.kline_store is not None:
+                                        self.kline_store_rows[urls[i][2]] = obj
                                     for j in obj:
                                         if maxtime_in_data is None:
                                             modified_j = [j[0], j[1], j[4], j[5]]
@@ -46,19 +120,22 @@ class KlineBinanceDAO:
                                                 modified_j.append(i + symbol_base)
                                                 self.kline_results_2.append(modified_j)
                                     return
-                                elif response.status == 429:
+                                self.metrics.add_error('gather_with_concurrency', status_code)
+                                if response.status == 429:
+                                    # the rate limiter holds every request until Retry-After has passed
                                     self.gmailAPIWrapper.send_email('429', 'gather_with_concurrency')
-                                    return
                                 elif status_code == 503:
                                     pass
                                 else:
 
                                     print(f"Attempt {attempt + 1} failed with status code {status_code}")
                         except asyncio.TimeoutError:
+                            self.metrics.add_error('gather_with_concurrency', 'TimeoutError')
 
                             print(f"Attempt {attempt + 1} failed with error: TimeoutError")
 
                         except aiohttp.ClientError as e:
+                            self.metrics.add_error('gather_with_concurrency', type(e).__name__)
 
                             print(f"Attempt {attempt + 1} failed with error: {e}")
 
@@ -70,49 +147,266 @@ class KlineBinanceDAO:
                 print('All retry attempts failed.')
 
             await asyncio.gather(*(get(i) for i in urls))
-            await session.close()
 
         except Exception as e:
             self.gmailAPIWrapper.send_email('exception get symbols', '')
 
             write_log('1584', e)
         finally:
-            await session.close()
+            if conn is not None and session is not None:
+                await session.close()
+
+    def create_trace_config(self):
+        """
+        Counts new and reused pooled connections of a sweep into self.sweep_stats.
+        """
+        async def on_connection_create_end(session, context, params):
+            self.sweep_stats['new_connections'] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.sweep_stats['reused_connections'] += 1
 
-    def get_binance_margin_klines_data(self, interval, limit, maxtime_in_data,quote_asset,margin_asset_list):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    async def get_session(self):
+        """
+        :return: the session shared by persistent sweeps, created on the loop thread on first use
+        """
+        if self.session is None or self.session.closed:
+            conn = aiohttp.TCPConnector(limit_per_host=self.PARALLEL_REQUESTS, limit=self.PARALLEL_REQUESTS,
+                                        ttl_dns_cache=400, keepalive_timeout=self.keepalive_timeout)
+            self.session = aiohttp.ClientSession(connector=conn, trace_configs=[self.create_trace_config()])
+        return self.session
+
+    async def gather_sweep(self, urls, symbol_base, maxtime_in_data, kline_cache=None, kline_columns=None,
+                           request_weight=1):
+        conn = None
+        if not self.persistent:
+            conn = aiohttp.TCPConnector(limit_per_host=self.PARALLEL_REQUESTS, limit=self.PARALLEL_REQUESTS,
+                                        ttl_dns_cache=400)
+        await self.gather_with_concurrency(self.PARALLEL_REQUESTS, urls, conn, symbol_base, maxtime_in_data,
+                                           kline_cache, kline_columns, request_weight)
+
+    def run(self, coro):
+        """
+        Runs a coroutine on the persistent loop, or in a fresh asyncio.run otherwise.
+        """
+        if self.loop_thread is not None:
+            return self.loop_thread.run(coro)
+        return asyncio.run(coro)
+
+    def close(self):
+        self.stop_kline_stream()
+        self.kline_parser.close()
+        if self.loop_thread is not None:
+            if self.session is not None:
+                self.loop_thread.run(self.session.close())
+                self.session = None
+            self.loop_thread.stop()
+            self.loop_thread = None
+            self.persistent = False
+
+    def start_kline_stream(self, interval, limit, quote_asset, margin_asset_list, timeout=30, **kwargs):
+        """
+        Switches get_binance_margin_klines_data to the websocket mode for this interval and asset list.
+        Sweeps fall back to REST whenever the stream is disconnected or does not match the request.
+
+        :param timeout: seconds to wait for the REST bootstrap of the stream window
+        :param kwargs: passed to KlineStream, e.g. ws_url
+        :return: True if the stream is connected and bootstrapped
+        """
+        self.stop_kline_stream()
+        self.kline_stream = KlineStream(interval, limit, quote_asset, margin_asset_list,
+                                        rest_url=self.base_url, **kwargs)
+        self.kline_stream.start()
+        return self.kline_stream.wait_connected(timeout)
+
+    def stop_kline_stream(self):
+        if self.kline_stream is not None:
+            self.kline_stream.stop()
+            self.kline_stream = None
+
+    def get_stream_klines_data(self, limit, maxtime_in_data, kline_columns=None):
+        if kline_columns is not None:
+            raw_klines = self.kline_stream.get_raw_klines(limit, maxtime_in_data)
+            for key, rows in raw_klines.items():
+                kline_columns.append(key, rows)
+            symbols, results = list(raw_klines), []
+        else:
+            symbols, results = self.kline_stream.get_kline_results(limit, maxtime_in_data)
+        if maxtime_in_data is None:
+            self.kline_results_symbols = symbols
+            self.kline_results = results
+        else:
+            self.kline_results_symbols_2 = symbols
+            self.kline_results_2 = results
+        return kline_columns if kline_columns is not None else self.kline_results
+
+    def get_kline_cache(self, interval, limit):
+        if not self.incremental:
+            return None
+        kline_cache = self.kline_caches.get(interval)
+        if kline_cache is None or kline_cache.limit != limit:
+            kline_cache = self.kline_caches[interval] = KlineWindowCache(interval, limit)
+        return kline_cache
+
+    def store_klines(self, interval, quote_asset, raw_klines):
+        """
+        Appends the closed candles of a classic sweep to self.kline_store if there is one.
+
+        :param raw_klines: {base asset: raw candles sorted by open time}
+        """
+        if self.kline_store is None:
+            return
+        now_ms = int(time.time() * 1000)
+        try:
+            for key, rows in raw_klines.items():
+                closed = [row for row in rows if row[0] + INTERVAL_MS[interval] <= now_ms]
+                self.kline_store.append(key + quote_asset, interval, kline_records(closed))
+        except OSError as e:
+            write_log('kline_store', e)
+
+    def get_binance_margin_klines_columns(self, interval, limit, maxtime_in_data, quote_asset, margin_asset_list,
+                                          from_time=None, to_time=None):
+        """
+        Same sweep as get_binance_margin_klines_data, parsed into a KlineColumns store instead of
+        kline_results rows. The store of the last sweep is kept in self.kline_columns, its closed
+        candles are appended to self.kline_store if there is one.
+
+        :return: KlineColumns, None if not every symbol completed
+        """
+        self.kline_columns = KlineColumns(margin_asset_list, limit if maxtime_in_data is None else 1)
+        results = self.get_binance_margin_klines_data(interval, limit, maxtime_in_data, quote_asset,
+                                                      margin_asset_list, kline_columns=self.kline_columns,
+                                                      from_time=from_time, to_time=to_time)
+        if self.kline_store is not None:
+            try:
+                self.kline_store.append_columns(self.kline_columns, interval, quote_asset)
+            except OSError as e:
+                write_log('kline_store', e)
+        return results
+
+    def backfill_klines(self, interval, start_time, end_time, quote_asset, margin_asset_list, **kwargs):
+        """
+        Downloads the candles between two open times into a KlineDiskStore, resuming an interrupted
+        run, see KlineBackfill.
+
+        :param kwargs: passed to KlineBackfill, e.g. store or pages_in_flight
+        :return: {symbol: candles written}
+        """
+        backfill = KlineBackfill(self, interval, start_time, end_time, quote_asset=quote_asset, **kwargs)
+        return backfill.run(margin_asset_list)
+
+    def get_binance_margin_klines_paged(self, interval, count, quote_asset, margin_asset_list, now_ms=None):
+        """
+        The latest `count` candles per symbol when they do not fit in one request: one columnar sweep
+        per startTime/endTime page of 1000 candles, the last page left open so it ends with the candle
+        in progress on the server.
+
+        :return: KlineColumns, None if a page did not complete for every symbol
+        """
+        step = INTERVAL_MS[interval]
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        pages = page_ranges((now_ms // step - count + 1) * step, now_ms, interval)
+        parts = []
+        for i, (from_time, to_time) in enumerate(pages):
+            part = self.get_binance_margin_klines_columns(interval, 1000, None, quote_asset, margin_asset_list,
+                                                          from_time, to_time if i < len(pages) - 1 else None)
+            if part is None:
+                return None
+            parts.append(part)
+        open_time = np.concatenate([part.open_time for part in parts])
+        values = np.concatenate([part.values for part in parts], axis=1)
+        symbol_id = np.concatenate([part.symbol_id for part in parts])
+        order = np.lexsort((open_time, symbol_id))
+        self.kline_columns = KlineColumns.from_arrays(parts[0].symbols, open_time[order], values[:, order],
+                                                      symbol_id[order])
+        return self.kline_columns
+
+    def get_binance_margin_klines_resampled(self, intervals, limit, quote_asset, margin_asset_list,
+                                            base_interval='1m'):
+        """
+        One base_interval sweep, every interval in `intervals` is aggregated from it locally instead of
+        by its own sweep. The base request is sized for `limit` candles of the longest interval plus the
+        candle the window starts in, and paged when that is more than one request returns.
+
+        :return: {interval: KlineColumns with `limit` candles per symbol}, None if the sweep failed
+        """
+        ratio = max(interval_ratio(interval, base_interval) for interval in intervals)
+        base_limit = (limit + 1) * ratio
+        if base_limit <= 1000:
+            base = self.get_binance_margin_klines_columns(base_interval, base_limit, None, quote_asset,
+                                                          margin_asset_list)
+        else:
+            base = self.get_binance_margin_klines_paged(base_interval, base_limit, quote_asset, margin_asset_list)
+        if base is None:
+            return None
+        return {interval: resample(base, interval, limit, base_interval) for interval in intervals}
+
+    def get_binance_margin_klines_data(self, interval, limit, maxtime_in_data,quote_asset,margin_asset_list,
+                                       kline_columns=None, from_time=None, to_time=None):
         """
         # https://api.binance.com/api/v3/klines?symbol=BTCUSDT&interval=5m&limit=300
+
+        :param from_time: first open time in ms, the candles from it on are requested instead of the latest
+        :param to_time: last open time in ms, only used with from_time
         """
+        if (from_time is None and self.kline_stream is not None and self.kline_stream.connected.is_set()
+                and self.kline_stream.serves(interval, limit, quote_asset, margin_asset_list)):
+            results = self.get_stream_klines_data(limit, maxtime_in_data, kline_columns)
+            if kline_columns is None and self.kline_store is not None:
+                self.store_klines(interval, quote_asset, self.kline_stream.get_raw_klines())
+            return results
+
         if maxtime_in_data is None:
             self.kline_results = []
             self.kline_results_symbols = []
         else:
             self.kline_results_2 = []
             self.kline_results_symbols_2 = []
+        self.kline_store_rows = {}
         start_time = datetime.now()
         print(datetime.now(), 'get symbol start <-----')
+        kline_cache = self.get_kline_cache(interval, limit) if from_time is None else None
         urls = {}
         quote_asset = quote_asset
         for index, (key, value) in enumerate(margin_asset_list.items()):
+            kline_start_time = kline_cache.start_time(key) if kline_cache is not None else None
             urls[key] = [
-                'https://api.binance.com/api/v3/klines?symbol=' + key + quote_asset + '&interval=' + interval + '&limit=' + str(
-                    limit), index, key]
-
-        conn = aiohttp.TCPConnector(limit_per_host=400, limit=400, ttl_dns_cache=400)
-        PARALLEL_REQUESTS = 400
-        asyncio.run(
-            self.gather_with_concurrency(PARALLEL_REQUESTS, urls, conn, quote_asset, maxtime_in_data))
-        conn.close()
+                self.base_url + '/api/v3/klines?symbol=' + key + quote_asset + '&interval=' + interval + '&limit=' + str(
+                    limit), index, key, kline_start_time]
+            if kline_start_time is not None:
+                urls[key][0] += '&startTime=' + str(kline_start_time)
+            if from_time is not None:
+                urls[key][0] += '&startTime=' + str(from_time)
+                if to_time is not None:
+                    urls[key][0] += '&endTime=' + str(to_time)
+
+        self.sweep_stats = {'seconds': None, 'new_connections': 0, 'reused_connections': 0}
+        self.run(self.gather_sweep(urls, quote_asset, maxtime_in_data, kline_cache, kline_columns,
+                                   klines_weight(limit)))
         end_time = datetime.now()
+        self.sweep_stats['seconds'] = (end_time - start_time).total_seconds()
+        self.metrics.observe('get_binance_margin_klines_data', self.sweep_stats['seconds'])
         print(end_time, 'get symbol end <-----')
         print('time used', str((end_time - start_time).total_seconds()))
 
+        if kline_columns is not None:
+            results = kline_columns
+            results_count = kline_columns.size
+        else:
+            self.store_klines(interval, quote_asset, self.kline_store_rows)
+            results = self.kline_results
+            results_count = len(self.kline_results) if maxtime_in_data is None else len(self.kline_results_2)
         if maxtime_in_data is None:
             print(
-                f"Total {len(urls)} completed {len(self.kline_results_symbols)} requests with {len(self.kline_results)} results")
+                f"Total {len(urls)} completed {len(self.kline_results_symbols)} requests with {results_count} results")
         else:
             print(
-                f"Total {len(urls)} completed {len(self.kline_results_symbols_2)} requests with {len(self.kline_results_2)} results")
+                f"Total {len(urls)} completed {len(self.kline_results_symbols_2)} requests with {results_count} results")
 
         if len(urls) != len(self.kline_results_symbols):
             self.gmailAPIWrapper.send_email('Total not equal completed', '')
@@ -120,6 +414,6 @@ class KlineBinanceDAO:
         if (end_time - start_time).total_seconds() > 9:
             print('over 9 seconds')
             self.gmailAPIWrapper.send_email('over 9 seconds klines', str((datetime.now() - start_time).total_seconds()))
-            return self.kline_results
+            return results
         else:
-            return self.kline_results
\ No newline at end of file
+            return results
\ No newline at end of file
@@ -0,0 +1,66 @@
+import time
+from collections import deque
+
+INTERVAL_MS = {
+    '1s': 1000,
+    '1m': 60000, '3m': 180000, '5m': 300000, '15m': 900000, '30m': 1800000,
+    '1h': 3600000, '2h': 7200000, '4h': 14400000, '6h': 21600000, '8h': 28800000, '12h': 43200000,
+    '1d': 86400000, '3d': 259200000, '1w': 604800000,
+    # shortest month, so a gap is never underestimated
+    '1M': 2419200000,
+}
+
+
+def merge_klines(window, rows):
+    """
+    Appends candles sorted by open time to `window`, replacing the candle with the same open time
+    (the in-progress candle) instead of duplicating it and skipping candles older than the last one.
+    """
+    for row in rows:
+        if window:
+            if row[0] < window[-1][0]:
+                continue
+            if row[0] == window[-1][0]:
+                window.pop()
+        window.append(row)
+
+
+class KlineWindowCache:
+    """
+    Rolling window of the latest `limit` raw candles per symbol for one interval.
+
+    After the initial load only candles from the last known open time onwards are requested, so the
+    in-progress candle is refreshed and new candles are appended while the oldest are evicted.
+    """
+    def __init__(self, interval, limit):
+        self.interval = interval
+        self.limit = limit
+        self.interval_ms = INTERVAL_MS[interval]
+        self.windows = {}
+
+    def start_time(self, symbol, now_ms=None):
+        """
+        :return: the startTime for the next request of this symbol, None when a full load is needed
+        """
+        window = self.windows.get(symbol)
+        if not window:
+            return None
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        last_open_time = window[-1][0]
+        if (now_ms - last_open_time) // self.interval_ms >= self.limit - 1:
+            # more candles are missing than one request returns
+            return None
+        return last_open_time
+
+    def update(self, symbol, rows, full):
+        """
+        :param rows: raw candles from /api/v3/klines
+        :param full: rows are a full reload rather than the candles since start_time()
+        :return: the candles currently in the window
+        """
+        window = self.windows.get(symbol)
+        if window is None or full:
+            window = self.windows[symbol] = deque(maxlen=self.limit)
+        merge_klines(window, rows)
+        return list(window)
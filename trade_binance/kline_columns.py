@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+KLINE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class KlineColumns:
+    """
+    Columnar store for the candles of one sweep.
+
+    Columns are preallocated for `len(symbols) * limit` candles and filled in place: int64 open
+    times, float64 prices and volume, and an int32 symbol id indexing `symbols`. Candles of one
+    symbol are contiguous, `symbol_slice()` returns their range. Properties return views of the
+    filled part, so reading them never copies.
+    """
+    def __init__(self, symbols, limit):
+        self.symbols = list(symbols)
+        self.symbol_ids = {symbol: symbol_id for symbol_id, symbol in enumerate(self.symbols)}
+        self.slices = {}
+        self.size = 0
+
+        capacity = max(len(self.symbols) * limit, 1)
+        self._open_time = np.empty(capacity, dtype=np.int64)
+        self._values = np.empty((len(KLINE_FIELDS), capacity), dtype=np.float64)
+        self._symbol_id = np.empty(capacity, dtype=np.int32)
+
+    @classmethod
+    def from_arrays(cls, symbols, open_time, values, symbol_id):
+        """
+        :param open_time: int64 open times, candles of one symbol contiguous
+        :param values: float64 array shaped (5, n) in KLINE_FIELDS order
+        :param symbol_id: ids indexing `symbols`
+        """
+        kline_columns = cls(symbols, 0)
+        kline_columns._open_time = np.ascontiguousarray(open_time, dtype=np.int64)
+        kline_columns._values = np.ascontiguousarray(values, dtype=np.float64)
+        kline_columns._symbol_id = np.ascontiguousarray(symbol_id, dtype=np.int32)
+        kline_columns.size = len(kline_columns._open_time)
+        if kline_columns.size:
+            symbol_id = kline_columns._symbol_id
+            starts = np.flatnonzero(np.append(True, symbol_id[1:] != symbol_id[:-1]))
+            ends = np.append(starts[1:], kline_columns.size)
+            kline_columns.slices = {int(symbol_id[start]): slice(int(start), int(end))
+                                    for start, end in zip(starts, ends)}
+        return kline_columns
+
+    def _reserve(self, count):
+        start = self.size
+        end = start + count
+        if end > len(self._open_time):
+            capacity = max(end, 2 * len(self._open_time))
+            self._open_time = np.resize(self._open_time, capacity)
+            self._values = np.concatenate(
+                (self._values, np.empty((len(KLINE_FIELDS), capacity - self._values.shape[1]))), axis=1)
+            self._symbol_id = np.resize(self._symbol_id, capacity)
+        self.size = end
+        return start, end
+
+    def append(self, symbol, rows):
+        """
+        :param symbol: one of `symbols`
+        :param rows: raw candles from /api/v3/klines, [open_time, open, high, low, close, volume, ...]
+        """
+        if not rows:
+            return
+        parsed = np.array([row[:6] for row in rows], dtype=np.float64)
+        self.append_arrays(symbol, parsed[:, 0].astype(np.int64), parsed[:, 1:6].T)
+
+    def append_arrays(self, symbol, open_time, values):
+        """
+        :param open_time: int64 open times
+        :param values: float64 array shaped (5, n) in KLINE_FIELDS order
+        """
+        count = len(open_time)
+        if not count:
+            return
+        start, end = self._reserve(count)
+        self._open_time[start:end] = open_time
+        self._values[:, start:end] = values
+        symbol_id = self.symbol_ids[symbol]
+        self._symbol_id[start:end] = symbol_id
+        self.slices[symbol_id] = slice(start, end)
+
+    @property
+    def open_time(self):
+        return self._open_time[:self.size]
+
+    @property
+    def open(self):
+        return self._values[0, :self.size]
+
+    @property
+    def high(self):
+        return self._values[1, :self.size]
+
+    @property
+    def low(self):
+        return self._values[2, :self.size]
+
+    @property
+    def close(self):
+        return self._values[3, :self.size]
+
+    @property
+    def volume(self):
+        return self._values[4, :self.size]
+
+    @property
+    def values(self):
+        return self._values[:, :self.size]
+
+    @property
+    def symbol_id(self):
+        return self._symbol_id[:self.size]
+
+    def last_closes(self):
+        """
+        :return: (symbols, closes) with the close of the latest candle of every symbol that has one
+        """
+        if not self.size:
+            return [], np.empty(0)
+        order = np.lexsort((self.open_time, self.symbol_id))
+        symbol_id = self.symbol_id[order]
+        last = order[np.append(symbol_id[1:] != symbol_id[:-1], True)]
+        return [self.symbols[i] for i in self.symbol_id[last]], self.close[last]
+
+    def symbol_slice(self, symbol):
+        return self.slices.get(self.symbol_ids[symbol], slice(0, 0))
+
+    def to_dataframe(self):
+        """
+        :return: DataFrame backed by the column arrays, symbol is a categorical over `symbols`
+        """
+        return pd.DataFrame({
+            'open_time': self.open_time,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+            'symbol': pd.Categorical.from_codes(self.symbol_id, categories=self.symbols),
+        }, copy=False)
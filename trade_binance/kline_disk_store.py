@@ -0,0 +1,175 @@
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from trade_binance.kline_cache import INTERVAL_MS
+from trade_binance.kline_columns import KLINE_FIELDS, KlineColumns
+
+MAGIC = b'QKLINE1\0'
+HEADER_SIZE = 64
+
+# fixed-width record of one candle, 48 bytes
+KLINE_RECORD = np.dtype([('open_time', '<i8')] + [(field, '<f8') for field in KLINE_FIELDS])
+
+
+def kline_records(rows):
+    """
+    :param rows: raw candles from /api/v3/klines
+    :return: KLINE_RECORD array
+    """
+    records = np.empty(len(rows), dtype=KLINE_RECORD)
+    if rows:
+        parsed = np.array([row[:6] for row in rows], dtype=np.float64)
+        records['open_time'] = parsed[:, 0].astype(np.int64)
+        for i, field in enumerate(KLINE_FIELDS, 1):
+            records[field] = parsed[:, i]
+    return records
+
+
+def read_kline_records(path):
+    """
+    :return: read-only memory map of the candles in a kline file
+    """
+    with open(path, 'rb') as file_object:
+        header = file_object.read(HEADER_SIZE)
+    if header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a kline file')
+    count = (os.path.getsize(path) - HEADER_SIZE) // KLINE_RECORD.itemsize
+    if count == 0:
+        return np.empty(0, dtype=KLINE_RECORD)
+    return np.memmap(path, dtype=KLINE_RECORD, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+class KlineDiskStore:
+    """
+    Closed candles in one file of fixed-width records per symbol and interval, sorted by open time.
+
+    The file is its own time index: read() binary searches the memory-mapped open times and returns
+    a view of the range without copying. Newer candles are appended and a record only becomes
+    visible to readers once it is completely written. Candles older than the last stored one that
+    are missing from the file are merged in by writing a sorted copy and replacing the file, so a
+    reader keeps its old map until it reads again. Other processes can read while one store instance
+    writes.
+    """
+    def __init__(self, directory='../data/klines'):
+        self.directory = directory
+        self.maps = {}
+        self.last_open_times = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, symbol, interval):
+        return os.path.join(self.directory, f'{symbol}_{interval}.bin')
+
+    def records(self, symbol, interval):
+        """
+        :return: read-only memory map of every stored candle, remapped when the file has grown
+        """
+        path = self.path(symbol, interval)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=KLINE_RECORD)
+        cached = self.maps.get(path)
+        if cached is None or cached[0] != size:
+            cached = self.maps[path] = (size, read_kline_records(path))
+        return cached[1]
+
+    def read(self, symbol, interval, start_time=None, end_time=None):
+        """
+        :param start_time: first open time in ms, inclusive
+        :param end_time: last open time in ms, inclusive
+        :return: view of the KLINE_RECORD candles in the range
+        """
+        records = self.records(symbol, interval)
+        open_time = records['open_time']
+        start = 0 if start_time is None else np.searchsorted(open_time, start_time)
+        end = len(records) if end_time is None else np.searchsorted(open_time, end_time, side='right')
+        return records[start:end]
+
+    def last_open_time(self, symbol, interval):
+        path = self.path(symbol, interval)
+        last_open_time = self.last_open_times.get(path)
+        if last_open_time is None:
+            records = self.records(symbol, interval)
+            last_open_time = int(records['open_time'][-1]) if len(records) else -1
+            self.last_open_times[path] = last_open_time
+        return last_open_time
+
+    def append(self, symbol, interval, records):
+        """
+        :param records: KLINE_RECORD candles sorted by open time, the ones already stored are skipped
+        :return: number of candles written
+        """
+        with self.lock:
+            path = self.path(symbol, interval)
+            last_open_time = self.last_open_time(symbol, interval)
+            older = records[records['open_time'] <= last_open_time]
+            records = records[records['open_time'] > last_open_time]
+            if len(older):
+                stored = self.read(symbol, interval, older['open_time'][0], older['open_time'][-1])
+                older = older[~np.isin(older['open_time'], stored['open_time'])]
+                if len(older):
+                    return self._rewrite(path, np.concatenate((older, records)))
+            if not len(records):
+                return 0
+            new_file = not os.path.exists(path)
+            with open(path, 'ab') as file_object:
+                if new_file:
+                    self._write_header(file_object)
+                file_object.write(records.tobytes())
+            self.last_open_times[path] = int(records['open_time'][-1])
+            return len(records)
+
+    def _write_header(self, file_object):
+        file_object.write(MAGIC + struct.pack('<I', KLINE_RECORD.itemsize).ljust(HEADER_SIZE - len(MAGIC), b'\0'))
+
+    def _rewrite(self, path, records):
+        """
+        Merges candles that are not stored yet into a sorted copy of the file and replaces it.
+        """
+        stored = read_kline_records(path)
+        merged = np.concatenate((stored, records))
+        merged = merged[np.argsort(merged['open_time'], kind='stable')]
+        del stored
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as file_object:
+            self._write_header(file_object)
+            file_object.write(merged.tobytes())
+        os.replace(tmp_path, path)
+        self.maps.pop(path, None)
+        self.last_open_times[path] = int(merged['open_time'][-1])
+        return len(records)
+
+    def append_columns(self, kline_columns, interval, quote_asset='', now_ms=None):
+        """
+        Appends the closed candles of a KlineColumns sweep, symbols are stored as symbol + quote_asset.
+
+        :return: number of candles written
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        closed = kline_columns.open_time + INTERVAL_MS[interval] <= now_ms
+        written = 0
+        for symbol_id, part in kline_columns.slices.items():
+            mask = closed[part]
+            records = np.empty(np.count_nonzero(mask), dtype=KLINE_RECORD)
+            records['open_time'] = kline_columns.open_time[part][mask]
+            for i, field in enumerate(KLINE_FIELDS):
+                records[field] = kline_columns.values[i, part][mask]
+            written += self.append(kline_columns.symbols[symbol_id] + quote_asset, interval, records)
+        return written
+
+    def to_kline_columns(self, symbols, interval, start_time=None, end_time=None, quote_asset=''):
+        """
+        :return: KlineColumns over `symbols` with their stored candles in the range
+        """
+        parts = [self.read(symbol + quote_asset, interval, start_time, end_time) for symbol in symbols]
+        if not any(len(part) for part in parts):
+            return KlineColumns(symbols, 0)
+        records = np.concatenate(parts)
+        values = np.stack([records[field] for field in KLINE_FIELDS])
+        symbol_id = np.repeat(np.arange(len(parts), dtype=np.int32), [len(part) for part in parts])
+        return KlineColumns.from_arrays(symbols, records['open_time'], values, symbol_id)
@@ -0,0 +1,53 @@
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson when it is installed, classic DAO sweeps decode with it as well
+loads = orjson.loads if orjson is not None else json.loads
+
+
+def parse_klines(body):
+    """
+    Parses a /api/v3/klines payload into arrays. The decoded rows are transposed into columns and only
+    the open time and the five price and volume columns are converted, the other six are never read.
+
+    :param body: response bytes, [[open_time, "open", "high", "low", "close", "volume", ...], ...]
+    :return: int64 open times, float64 array shaped (5, n) in KLINE_FIELDS order
+    """
+    columns = list(zip(*loads(body)))
+    if len(columns) < 6:
+        return np.empty(0, dtype=np.int64), np.empty((5, 0))
+    return np.array(columns[0], dtype=np.int64), np.array(columns[1:6], dtype=np.float64)
+
+
+class KlineParser:
+    """
+    Runs parse_klines inline, or in a process pool for payloads of at least `min_offload_size` bytes
+    so several payloads are parsed in parallel while the event loop keeps reading responses. Parsing
+    holds the GIL, a thread pool would only add a handoff per payload.
+    """
+    def __init__(self, executor=None, workers=None, min_offload_size=16384):
+        """
+        :param executor: None, 'process' or a concurrent.futures.Executor
+        """
+        if executor == 'process':
+            executor = ProcessPoolExecutor(workers)
+        self.executor = executor
+        self.min_offload_size = min_offload_size
+
+    async def parse(self, body):
+        if self.executor is None or len(body) < self.min_offload_size:
+            return parse_klines(body)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, parse_klines, body)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,84 @@
+import numpy as np
+
+from trade_binance.kline_cache import INTERVAL_MS
+from trade_binance.kline_columns import KlineColumns
+
+# Binance aligns candles to the epoch, except weekly candles which open on Monday 00:00 UTC
+INTERVAL_ORIGIN_MS = {'1w': 4 * INTERVAL_MS['1d']}
+
+
+def interval_ratio(interval, base_interval='1m'):
+    """
+    :return: number of base_interval candles in one interval candle
+    """
+    if interval == '1M' or interval not in INTERVAL_MS or base_interval not in INTERVAL_MS:
+        raise ValueError(f'cannot resample {base_interval} klines to {interval}')
+    ratio, remainder = divmod(INTERVAL_MS[interval], INTERVAL_MS[base_interval])
+    if remainder or ratio < 1:
+        raise ValueError(f'cannot resample {base_interval} klines to {interval}')
+    return ratio
+
+
+def bar_open_time(open_time, interval):
+    """
+    :return: open time of the interval candle each open time falls in
+    """
+    step = INTERVAL_MS[interval]
+    origin = INTERVAL_ORIGIN_MS.get(interval, 0)
+    return (open_time - origin) // step * step + origin
+
+
+def resample(kline_columns, interval, limit=None, base_interval='1m'):
+    """
+    Aggregates the base_interval candles of a KlineColumns store into interval candles: first open,
+    highest high, lowest low, last close and summed volume of the base candles in each interval.
+
+    The latest candle of a symbol is built from the base candles so far, like the in-progress candle
+    Binance returns. The earliest one is dropped when the base window starts inside it, its open and
+    range would be wrong.
+
+    :param limit: keep only the latest `limit` candles per symbol
+    :return: KlineColumns over the same symbols
+    """
+    ratio = interval_ratio(interval, base_interval)
+    if not kline_columns.size:
+        return KlineColumns(kline_columns.symbols, 0)
+    open_time = kline_columns.open_time
+    symbol_id = kline_columns.symbol_id
+    values = kline_columns.values
+    new_symbol = np.empty(len(open_time), dtype=bool)
+    new_symbol[0] = True
+    np.not_equal(symbol_id[1:], symbol_id[:-1], out=new_symbol[1:])
+    if np.count_nonzero(new_symbol) != len(kline_columns.slices) or np.any(
+            (open_time[1:] <= open_time[:-1]) & ~new_symbol[1:]):
+        # not one ascending run per symbol, as appended by the DAO, so sort first
+        order = np.lexsort((open_time, symbol_id))
+        open_time, symbol_id, values = open_time[order], symbol_id[order], values[:, order]
+        np.not_equal(symbol_id[1:], symbol_id[:-1], out=new_symbol[1:])
+    bars = bar_open_time(open_time, interval) if ratio > 1 else open_time
+
+    new_bar = new_symbol.copy()
+    new_bar[1:] |= bars[1:] != bars[:-1]
+    starts = np.flatnonzero(new_bar)
+    ends = np.append(starts[1:], len(bars)) - 1
+
+    bar_time = bars[starts]
+    bar_symbol_id = symbol_id[starts]
+    bar_values = np.stack((
+        values[0, starts],
+        np.maximum.reduceat(values[1], starts),
+        np.minimum.reduceat(values[2], starts),
+        values[3, ends],
+        np.add.reduceat(values[4], starts),
+    ))
+
+    first_bar = new_symbol[starts]
+    keep = ~(first_bar & (open_time[starts] != bar_time))
+    if limit is not None and keep.any():
+        # candles of one symbol are contiguous, count each candle's distance to the symbol's last one
+        kept_symbol_id = bar_symbol_id[keep]
+        kept_first = np.append(True, kept_symbol_id[1:] != kept_symbol_id[:-1])
+        group_end = np.append(np.flatnonzero(kept_first)[1:], len(kept_first))[np.cumsum(kept_first) - 1]
+        keep[keep] = group_end - np.arange(len(kept_first)) <= limit
+    return KlineColumns.from_arrays(kline_columns.symbols, bar_time[keep], bar_values[:, keep],
+                                    bar_symbol_id[keep])
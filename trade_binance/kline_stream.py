@@ -0,0 +1,112 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+from trade_binance.binance_stream import BinanceStream
+from trade_binance.kline_cache import merge_klines
+from trade_binance.utils import write_log
+
+
+class KlineStream(BinanceStream):
+    """
+    Keeps the last `limit` candles of every margin asset in memory from the combined
+    `<symbol>@kline_<interval>` streams.
+
+    The window is bootstrapped from `/api/v3/klines` on the first connect and gap-filled from the
+    last known open time after every reconnect. Candles are kept in the REST layout
+    [open_time, open, high, low, close, volume].
+    """
+    def __init__(self, interval, limit, quote_asset, margin_asset_list,
+                 rest_url='https://api.binance.com', rest_concurrency=50, **kwargs):
+        super().__init__(**kwargs)
+        self.interval = interval
+        self.limit = limit
+        self.quote_asset = quote_asset
+        self.rest_url = rest_url
+        self.rest_concurrency = rest_concurrency
+
+        self.symbols = [key + quote_asset for key in margin_asset_list]
+        self.klines = {symbol: deque(maxlen=limit) for symbol in self.symbols}
+        self.lock = threading.Lock()
+
+    def streams(self):
+        return [symbol.lower() + '@kline_' + self.interval for symbol in self.symbols]
+
+    def serves(self, interval, limit, quote_asset, margin_asset_list):
+        if interval != self.interval or quote_asset != self.quote_asset or limit > self.limit:
+            return False
+        return len(margin_asset_list) == len(self.symbols) and all(
+            key + quote_asset in self.klines for key in margin_asset_list)
+
+    def on_message(self, stream, data):
+        if not isinstance(data, dict) or data.get('e') != 'kline':
+            return
+        k = data['k']
+        row = [k['t'], k['o'], k['h'], k['l'], k['c'], k['v']]
+        with self.lock:
+            window = self.klines.get(data['s'])
+            if window is None:
+                return
+            merge_klines(window, [row])
+
+    async def on_connect(self, session, reconnect):
+        semaphore = asyncio.Semaphore(self.rest_concurrency)
+
+        async def fill(symbol):
+            async with semaphore:
+                with self.lock:
+                    window = self.klines[symbol]
+                    start_time = window[-1][0] if window else None
+                rows = await self._fetch(session, symbol, start_time)
+                if start_time is not None and len(rows) >= self.limit:
+                    # the gap is longer than the window, reload the latest candles instead
+                    start_time = None
+                    rows = await self._fetch(session, symbol, None)
+                with self.lock:
+                    if start_time is None:
+                        window.clear()
+                    merge_klines(window, rows)
+
+        await asyncio.gather(*(fill(symbol) for symbol in self.symbols))
+        if reconnect:
+            write_log('KlineStream gap filled after reconnect', self.reconnects)
+
+    async def _fetch(self, session, symbol, start_time):
+        url = (self.rest_url + '/api/v3/klines?symbol=' + symbol + '&interval=' + self.interval +
+               '&limit=' + str(self.limit))
+        if start_time is not None:
+            url += '&startTime=' + str(start_time)
+        async with session.get(url) as response:
+            response.raise_for_status()
+            obj = json.loads(await response.read())
+        return [j[:6] for j in obj]
+
+    def get_raw_klines(self, limit=None, maxtime_in_data=None):
+        """
+        :param limit: number of latest candles per symbol, defaults to the whole window
+        :param maxtime_in_data: only return the candle with this open time
+        :return: {base asset: candles} in margin_asset_list order
+        """
+        raw_klines = {}
+        with self.lock:
+            for symbol in self.symbols:
+                window = self.klines[symbol]
+                if not window:
+                    continue
+                if maxtime_in_data is not None:
+                    rows = [row for row in window if row[0] == maxtime_in_data]
+                else:
+                    rows = list(window)[-(limit or self.limit):]
+                raw_klines[symbol[:len(symbol) - len(self.quote_asset)]] = rows
+        return raw_klines
+
+    def get_kline_results(self, limit=None, maxtime_in_data=None):
+        """
+        :return: (symbols, rows) with rows in the `KlineBinanceDAO.kline_results` layout
+            [open_time, open, close, volume, symbol]
+        """
+        raw_klines = self.get_raw_klines(limit, maxtime_in_data)
+        results = [[j[0], j[1], j[4], j[5], key + self.quote_asset]
+                   for key, rows in raw_klines.items() for j in rows]
+        return list(raw_klines), results
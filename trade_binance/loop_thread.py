@@ -0,0 +1,26 @@
+import asyncio
+import threading
+
+
+class LoopThread:
+    """
+    Event loop running forever on a daemon thread, so synchronous code can keep sessions and
+    connection pools alive between calls. `run()` submits a coroutine and blocks for its result.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def is_running(self):
+        return self._thread.is_alive()
+
+    def stop(self, timeout=5):
+        if not self._thread.is_alive():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self.loop.close()
@@ -0,0 +1,142 @@
+import bisect
+import threading
+
+# latency bucket upper bounds in seconds, 1ms to about 65s in steps of sqrt(2)
+LATENCY_BUCKETS = [0.001 * 2 ** (i / 2) for i in range(33)]
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram, observe() is one bisect and one increment.
+    Quantiles are interpolated linearly inside the bucket that holds them.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.retries = 0
+        self.errors = {}
+        self.weight = 0
+        self.bytes = 0
+
+
+class Metrics:
+    """
+    Process-wide counters per endpoint: latency of successful calls, retries, errors by code,
+    request weight spent and response bytes received.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(Metrics, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, 'initialized'):
+            self.lock = threading.Lock()
+            self.endpoints = {}
+            self.initialized = True
+
+    def _endpoint(self, endpoint):
+        metrics = self.endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.endpoints[endpoint] = EndpointMetrics()
+        return metrics
+
+    def observe(self, endpoint, seconds):
+        with self.lock:
+            self._endpoint(endpoint).latency.observe(seconds)
+
+    def add_retry(self, endpoint):
+        with self.lock:
+            self._endpoint(endpoint).retries += 1
+
+    def add_error(self, endpoint, code):
+        with self.lock:
+            errors = self._endpoint(endpoint).errors
+            errors[code] = errors.get(code, 0) + 1
+
+    def add_weight(self, endpoint, weight):
+        with self.lock:
+            self._endpoint(endpoint).weight += weight
+
+    def add_bytes(self, endpoint, size):
+        with self.lock:
+            self._endpoint(endpoint).bytes += size
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+
+    def snapshot(self):
+        """
+        :return: {endpoint: {'count', 'sum', 'p50', 'p95', 'p99', 'max', 'retries', 'errors', 'weight', 'bytes'}}
+            with latencies in seconds
+        """
+        with self.lock:
+            return {endpoint: {
+                'count': metrics.latency.count,
+                'sum': metrics.latency.sum,
+                'p50': metrics.latency.quantile(0.5),
+                'p95': metrics.latency.quantile(0.95),
+                'p99': metrics.latency.quantile(0.99),
+                'max': metrics.latency.max,
+                'retries': metrics.retries,
+                'errors': dict(metrics.errors),
+                'weight': metrics.weight,
+                'bytes': metrics.bytes,
+            } for endpoint, metrics in self.endpoints.items()}
+
+    def prometheus(self, prefix='trade_binance'):
+        """
+        :return: all metrics in the Prometheus text exposition format
+        """
+        lines = [f'# TYPE {prefix}_request_seconds histogram']
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            for endpoint, metrics in endpoints:
+                cumulative = 0
+                for bound, count in zip(metrics.latency.buckets + [float('inf')], metrics.latency.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else f'{bound:.6g}'
+                    lines.append(f'{prefix}_request_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_request_seconds_sum{{endpoint="{endpoint}"}} {metrics.latency.sum:.6f}')
+                lines.append(f'{prefix}_request_seconds_count{{endpoint="{endpoint}"}} {metrics.latency.count}')
+            for name, attribute in (('retries', 'retries'), ('request_weight', 'weight'),
+                                    ('response_bytes', 'bytes')):
+                lines.append(f'# TYPE {prefix}_{name}_total counter')
+                for endpoint, metrics in endpoints:
+                    lines.append(f'{prefix}_{name}_total{{endpoint="{endpoint}"}} {getattr(metrics, attribute)}')
+            lines.append(f'# TYPE {prefix}_errors_total counter')
+            for endpoint, metrics in endpoints:
+                for code, count in sorted(metrics.errors.items(), key=lambda item: str(item[0])):
+                    lines.append(f'{prefix}_errors_total{{endpoint="{endpoint}",code="{code}"}} {count}')
+        return '\n'.join(lines) + '\n'
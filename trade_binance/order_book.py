@@ -0,0 +1,218 @@
+import asyncio
+import heapq
+import json
+import threading
+from collections import deque
+
+from trade_binance.binance_stream import BinanceStream
+from trade_binance.rate_limiter import RateLimiter, depth_weight
+from trade_binance.retry import backoff_delay
+from trade_binance.utils import write_log
+
+
+class OrderBook:
+    """
+    Local order book of one symbol built from a REST depth snapshot and `@depth` diff events.
+
+    Levels are kept as {float price: [price, quantity]} with the strings Binance sent, so depth rows
+    look exactly like a `/api/v3/depth` response. The best bid and ask are cached and only
+    recomputed when the best level is removed.
+    """
+    def __init__(self, symbol, max_buffer=1000):
+        self.symbol = symbol
+        self.max_buffer = max_buffer
+        self.reset()
+
+    def reset(self):
+        self.bids = {}
+        self.asks = {}
+        self.best_bid = None
+        self.best_ask = None
+        self.last_update_id = None
+        self.synced = False
+        # events received while unsynced, the oldest are dropped once max_buffer are queued
+        self.buffer = deque(maxlen=self.max_buffer)
+
+    def load_snapshot(self, snapshot):
+        """
+        :return: False if the buffered events do not continue the snapshot and a newer one is needed
+        """
+        buffer = self.buffer
+        self.reset()
+        self.last_update_id = snapshot['lastUpdateId']
+        self._update(self.bids, snapshot['bids'], True)
+        self._update(self.asks, snapshot['asks'], False)
+        self.synced = True
+        for event in buffer:
+            if not self._apply(event):
+                self.reset()
+                return False
+        return True
+
+    def apply(self, event):
+        """
+        :return: False when a gap in update ids was detected, the book then needs a new snapshot
+        """
+        if not self.synced:
+            self.buffer.append(event)
+            return True
+        return self._apply(event)
+
+    def _apply(self, event):
+        if event['u'] <= self.last_update_id:
+            return True
+        if event['U'] > self.last_update_id + 1:
+            return False
+        self._update(self.bids, event['b'], True)
+        self._update(self.asks, event['a'], False)
+        self.last_update_id = event['u']
+        return True
+
+    def _update(self, levels, rows, is_bid):
+        best = self.best_bid if is_bid else self.best_ask
+        best_removed = False
+        for price, quantity in rows:
+            key = float(price)
+            if float(quantity) == 0:
+                if levels.pop(key, None) is not None and key == best:
+                    best_removed = True
+                continue
+            levels[key] = [price, quantity]
+            if best is None or (key > best if is_bid else key < best):
+                best = key
+        if best_removed or (best is not None and best not in levels):
+            best = (max(levels) if is_bid else min(levels)) if levels else None
+        if is_bid:
+            self.best_bid = best
+        else:
+            self.best_ask = best
+
+    def depth(self, limit):
+        return {
+            'lastUpdateId': self.last_update_id,
+            'bids': [self.bids[price] for price in heapq.nlargest(limit, self.bids)],
+            'asks': [self.asks[price] for price in heapq.nsmallest(limit, self.asks)],
+        }
+
+    def top(self):
+        return {
+            'lastUpdateId': self.last_update_id,
+            'bids': [self.bids[self.best_bid]] if self.best_bid is not None else [],
+            'asks': [self.asks[self.best_ask]] if self.best_ask is not None else [],
+        }
+
+
+class OrderBookManager(BinanceStream):
+    """
+    Keeps local order books for many symbols from the `<symbol>@depth@100ms` streams.
+
+    Books are bootstrapped from `/api/v3/depth` snapshots after every connect and resynced on their own
+    whenever a gap in update ids is seen. A symbol whose snapshots keep failing stays in pending_resync
+    and is tried again after a backoff of up to `max_resync_delay` seconds until it syncs or the stream
+    reconnects. `replay()` feeds recorded stream messages without a socket.
+    """
+    def __init__(self, symbols, rest_url='https://api.binance.com', snapshot_limit=1000,
+                 rest_concurrency=10, resync_delay=1, max_resync_delay=60, **kwargs):
+        super().__init__(**kwargs)
+        self.rest_url = rest_url
+        self.snapshot_limit = snapshot_limit
+        self.rest_concurrency = rest_concurrency
+        self.resync_delay = resync_delay
+        self.max_resync_delay = max_resync_delay
+        self.books = {symbol: OrderBook(symbol) for symbol in symbols}
+        self.lock = threading.Lock()
+        self.pending_resync = set()
+        self.rate_limiter = RateLimiter()
+        self._session = None
+
+    def streams(self):
+        return [symbol.lower() + '@depth@100ms' for symbol in self.books]
+
+    def on_message(self, stream, data):
+        if not isinstance(data, dict) or data.get('e') != 'depthUpdate':
+            return
+        symbol = data['s']
+        with self.lock:
+            book = self.books.get(symbol)
+            if book is None or book.apply(data):
+                return
+            book.reset()
+            book.buffer.append(data)
+        self._schedule_resync(symbol)
+
+    def replay(self, messages):
+        """
+        :param messages: recorded combined-stream messages, as dicts or raw json
+        """
+        for message in messages:
+            self._dispatch(message if isinstance(message, str) else json.dumps(message))
+
+    def load_snapshot(self, symbol, snapshot):
+        with self.lock:
+            synced = self.books[symbol].load_snapshot(snapshot)
+            if synced:
+                self.pending_resync.discard(symbol)
+        return synced
+
+    def _schedule_resync(self, symbol):
+        write_log('OrderBookManager resync', symbol)
+        self.pending_resync.add(symbol)
+        if self._session is not None and self._loop is not None and self._loop.is_running():
+            self._loop.create_task(self._resync(self._session, [symbol]))
+
+    async def _fetch_snapshot(self, session, symbol):
+        await self.rate_limiter.acquire_async(depth_weight(self.snapshot_limit))
+        url = self.rest_url + '/api/v3/depth?symbol=' + symbol + '&limit=' + str(self.snapshot_limit)
+        async with session.get(url) as response:
+            self.rate_limiter.on_response(response.status, response.headers)
+            response.raise_for_status()
+            return json.loads(await response.read())
+
+    async def _resync(self, session, symbols, attempts=3, retry=0):
+        semaphore = asyncio.Semaphore(self.rest_concurrency)
+        reconnects = self.reconnects
+
+        async def resync(symbol):
+            async with semaphore:
+                for attempt in range(attempts):
+                    try:
+                        snapshot = await self._fetch_snapshot(session, symbol)
+                    except Exception as e:
+                        write_log('OrderBookManager snapshot', symbol, e)
+                        continue
+                    if self.load_snapshot(symbol, snapshot):
+                        return
+            # an unsynced book only buffers events, nothing else would ask for another snapshot
+            asyncio.get_running_loop().create_task(self._retry_resync(session, symbol, retry, reconnects))
+
+        await asyncio.gather(*(resync(symbol) for symbol in symbols))
+
+    async def _retry_resync(self, session, symbol, retry, reconnects):
+        await asyncio.sleep(backoff_delay(retry, self.resync_delay, self.max_resync_delay))
+        # a reconnect resyncs every book itself
+        if self._stopping or self.reconnects != reconnects or symbol not in self.pending_resync:
+            return
+        write_log('OrderBookManager resync retry', symbol, retry + 1)
+        await self._resync(session, [symbol], retry=retry + 1)
+
+    async def on_connect(self, session, reconnect):
+        self._session = session
+        with self.lock:
+            for book in self.books.values():
+                book.reset()
+            self.pending_resync.update(self.books)
+        await self._resync(session, list(self.books))
+
+    def depth(self, symbol, limit):
+        """
+        :return: a `/api/v3/depth` style response from the local book, None if it is not synced
+        """
+        if self._thread is not None and not self.connected.is_set():
+            return None
+        with self.lock:
+            book = self.books.get(symbol)
+            if book is None or not book.synced:
+                return None
+            if limit == 1:
+                return book.top()
+            return book.depth(limit)
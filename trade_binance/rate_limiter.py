@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+
+INTERVAL_SECONDS = {'SECOND': 1, 'MINUTE': 60, 'HOUR': 3600, 'DAY': 86400}
+INTERVAL_LETTERS = {'SECOND': 's', 'MINUTE': 'm', 'HOUR': 'h', 'DAY': 'd'}
+HEADER_PREFIXES = {'REQUEST_WEIGHT': 'x-mbx-used-weight-', 'ORDERS': 'x-mbx-order-count-'}
+
+# spot limits from /api/v3/exchangeInfo, used until my_exchange_info() configures the limiter
+DEFAULT_RATE_LIMITS = [
+    {'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1, 'limit': 6000},
+    {'rateLimitType': 'ORDERS', 'interval': 'SECOND', 'intervalNum': 10, 'limit': 100},
+    {'rateLimitType': 'ORDERS', 'interval': 'DAY', 'intervalNum': 1, 'limit': 200000},
+    {'rateLimitType': 'RAW_REQUESTS', 'interval': 'MINUTE', 'intervalNum': 5, 'limit': 61000},
+]
+
+
+def klines_weight(limit):
+    limit = int(limit)
+    if limit <= 100:
+        return 1
+    if limit <= 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def depth_weight(limit):
+    limit = int(limit)
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+class TokenBucket:
+    """
+    Bucket for one entry of rateLimits. It holds `limit * safety` tokens refilled evenly over the
+    interval; a reservation may drive it negative, the caller then waits until it refills.
+    """
+    def __init__(self, limit, seconds, safety=0.9, now=None):
+        self.limit = limit
+        self.seconds = seconds
+        self.capacity = limit * safety
+        self.rate = self.capacity / seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost, now):
+        """
+        :return: seconds to wait before the reserved request may be sent
+        """
+        self.refill(now)
+        self.tokens -= cost
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+    def sync_used(self, used, now):
+        """
+        Takes the usage reported by the server into account, it also counts other clients of the IP.
+        """
+        self.refill(now)
+        self.tokens = min(self.tokens, self.capacity - used)
+
+
+class RateLimiter:
+    """
+    Request scheduler shared by BinanceAPIWrapper and KlineBinanceDAO.
+
+    Token buckets are built from the exchange rateLimits and corrected from the
+    X-MBX-USED-WEIGHT-* and X-MBX-ORDER-COUNT-* response headers. acquire() blocks, and
+    acquire_async() sleeps, until the request fits under every limit.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(RateLimiter, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, 'initialized'):
+            self.lock = threading.Lock()
+            self.buckets = {}
+            self.blocked_until = 0
+            self.configure(DEFAULT_RATE_LIMITS)
+            self.initialized = True
+
+    def configure(self, rate_limits, safety=0.9, now=None):
+        now = time.monotonic() if now is None else now
+        buckets = {}
+        for rate_limit in rate_limits or []:
+            interval = rate_limit['interval']
+            seconds = INTERVAL_SECONDS[interval] * rate_limit['intervalNum']
+            bucket = TokenBucket(rate_limit['limit'], seconds, safety, now)
+            prefix = HEADER_PREFIXES.get(rate_limit['rateLimitType'])
+            if prefix is None:
+                key = rate_limit['rateLimitType'] + '-' + str(seconds)
+            else:
+                key = prefix + str(rate_limit['intervalNum']) + INTERVAL_LETTERS[interval]
+            buckets[key] = (rate_limit['rateLimitType'], bucket)
+        with self.lock:
+            self.buckets = buckets
+            self.blocked_until = 0
+
+    def reserve(self, weight=1, orders=0, now=None):
+        """
+        :return: seconds to wait before sending a request of this weight placing `orders` orders
+        """
+        now = time.monotonic() if now is None else now
+        wait = 0
+        with self.lock:
+            for rate_limit_type, bucket in self.buckets.values():
+                if rate_limit_type == 'REQUEST_WEIGHT':
+                    cost = weight
+                elif rate_limit_type == 'ORDERS':
+                    cost = orders
+                else:
+                    cost = 1
+                if cost:
+                    wait = max(wait, bucket.reserve(cost, now))
+            wait = max(wait, self.blocked_until - now)
+        return wait
+
+    def acquire(self, weight=1, orders=0):
+        wait = self.reserve(weight, orders)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, weight=1, orders=0):
+        wait = self.reserve(weight, orders)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for key, value in headers.items():
+                entry = self.buckets.get(key.lower())
+                if entry is not None:
+                    try:
+                        entry[1].sync_used(int(value), now)
+                    except ValueError:
+                        pass
+
+    def back_off(self, retry_after, now=None):
+        """
+        Blocks every request for `retry_after` seconds after an HTTP 429 or 418.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, now + float(retry_after))
+
+    def on_response(self, status, headers):
+        self.update_from_headers(headers)
+        if status in (418, 429):
+            self.back_off(headers.get('Retry-After') or 1)
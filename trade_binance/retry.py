@@ -0,0 +1,268 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+
+from trade_binance.metrics import Metrics
+from trade_binance.utils import write_log
+
+# what to do after a ClientError
+FAIL = 'fail'  # the request itself is wrong for the current state, retrying cannot help
+RETRY = 'retry'  # transient, retry after a backoff
+ALERT = 'alert'  # give up and send an alert mail
+
+ERROR_CODES = {
+    -1001: RETRY,  # DISCONNECTED
+    -1003: ALERT,  # TOO_MANY_REQUESTS
+    -1007: RETRY,  # TIMEOUT
+    -1015: RETRY,  # TOO_MANY_ORDERS
+    -1016: RETRY,  # SERVICE_SHUTTING_DOWN
+    -1021: RETRY,  # INVALID_TIMESTAMP
+    -1022: FAIL,  # INVALID_SIGNATURE
+    -1100: FAIL,  # ILLEGAL_CHARS
+    -1121: FAIL,  # BAD_SYMBOL
+    -2010: FAIL,  # NEW_ORDER_REJECTED, e.g. 'Order would immediately match and take.'
+    -2011: FAIL,  # CANCEL_REJECTED, 'Unknown order sent.'
+    -2013: FAIL,  # NO_SUCH_ORDER
+}
+
+# margin and wallet errors share broad codes, they are told apart by their message
+ERROR_MESSAGES = {
+    'Exceeding the maximum transferable limit.': FAIL,
+    'Balance is not enough': FAIL,
+    'Margin account are not allowed to trade this trading pair.': FAIL,
+    'This isolated margin pair is disabled. Please activate it.': FAIL,
+    'Illegal characters found in a parameter.': FAIL,
+    'Too many requests; current request has limited.': ALERT,
+    'You cannot disable this isolated margin pair, as there are still assets or debts of this pair.': FAIL,
+    'Transfer out amount exceeds max amount.': FAIL,
+    'Not a valid margin asset.': FAIL,
+    'The system does not have enough asset now.': FAIL,
+    'Borrow is banned for this asset.': ALERT,
+    'Order does not exist.': FAIL,
+    'Invalid symbol.': FAIL,
+    'Order would immediately match and take.': FAIL,
+    'Unknown order sent.': FAIL,
+    'The unpaid debt is too small after this repayment.': ALERT,
+    'Asset is not in symbol.': FAIL,
+    'Repay amount exceeds borrow amount.': FAIL,
+    'Timestamp for this request is outside of the recvWindow.': RETRY,
+}
+
+# exception of the last failed attempt of a retry_on_exceptions call in the current thread or task
+last_exception = contextvars.ContextVar('last_exception', default=None)
+
+# name of the retried method running in the current thread or task, response bytes are counted against it
+current_endpoint = contextvars.ContextVar('current_endpoint', default=None)
+
+
+def classify_client_error(error):
+    """
+    Looks the message up in ERROR_MESSAGES first, it tells apart errors that share a broad code, and
+    falls back to ERROR_CODES.
+
+    :return: FAIL, RETRY or ALERT for a binance.error.ClientError, None if the error is unknown
+    """
+    return ERROR_MESSAGES.get(error.error_message) or ERROR_CODES.get(error.error_code)
+
+
+def backoff_delay(attempt, base, max_delay, random=random.random):
+    """
+    Exponential backoff with equal jitter: half of the delay is fixed, the other half random, so
+    clients that failed together do not retry together.
+    """
+    delay = min(max_delay, base * 2 ** attempt)
+    return delay / 2 + random() * delay / 2
+
+
+class CircuitBreaker:
+    """
+    Stops calls to an endpoint after `failure_threshold` consecutive failed attempts.
+
+    While open every call is refused. After `reset_timeout` seconds a single trial call is let
+    through (half open): a success closes the breaker, a failure opens it again.
+    """
+    def __init__(self, failure_threshold=10, reset_timeout=30, now=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.now = now
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self.now() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        """
+        :return: True if this failure opened the breaker
+        """
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self.opened_at = self.now()
+                return True
+            return False
+
+
+circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint):
+    with _circuit_breakers_lock:
+        breaker = circuit_breakers.get(endpoint)
+        if breaker is None:
+            breaker = circuit_breakers[endpoint] = CircuitBreaker()
+        return breaker
+
+
+class RetryState:
+    """
+    Bookkeeping of one retried call, shared by the sync and async decorators.
+    """
+    def __init__(self, func, retries, delays, max_delay, deadline, exception_handlers):
+        self.func = func
+        self.retries = retries
+        self.delays = delays
+        self.max_delay = max_delay
+        self.deadline = None if deadline is None else time.monotonic() + deadline
+        self.exception_handlers = exception_handlers
+        self.breaker = get_circuit_breaker(func.__name__)
+        self.metrics = Metrics()
+        self.started = None
+
+    def before_attempt(self, weight):
+        self.metrics.add_weight(self.func.__name__, weight)
+        self.started = time.perf_counter()
+
+    def allow(self):
+        if self.breaker.allow():
+            return True
+        write_log(f'{self.func.__name__} skipped, circuit open')
+        return False
+
+    def on_success(self):
+        self.metrics.observe(self.func.__name__, time.perf_counter() - self.started)
+        self.breaker.record_success()
+
+    def on_exception(self, api, attempt, e):
+        """
+        :return: seconds to wait before the next attempt, None to give up
+        """
+        last_exception.set(e)
+        self.metrics.add_error(self.func.__name__, getattr(e, 'error_code', None) or type(e).__name__)
+        handler = (self.exception_handlers or {}).get(type(e))
+        if handler is not None and handler(api, e):
+            # the endpoint answered, the request was the problem
+            self.breaker.record_success()
+            return None
+        write_log(f'Retrying {self.func.__name__} after exception: {e}')
+        if self.breaker.record_failure():
+            api.gmailAPIWrapper.send_email(f'{self.func.__name__} circuit open', str(e))
+        if attempt + 1 >= self.retries:
+            write_log(f'{self.func.__name__} failed after {self.retries} attempts')
+            return None
+        delay = backoff_delay(attempt, self.delays, self.max_delay)
+        if self.deadline is not None and time.monotonic() + delay > self.deadline:
+            write_log(f'{self.func.__name__} deadline exceeded')
+            return None
+        if not self.breaker.allow():
+            return None
+        self.metrics.add_retry(self.func.__name__)
+        return delay
+
+
+def _request_weight(weight, args, kwargs):
+    return weight(*args, **kwargs) if callable(weight) else weight
+
+
+def retry_on_exceptions(retries=5, delays=1, exception_handlers=None, weight=1, orders=0, max_delay=30,
+                        deadline=None):
+    """
+    :param delays: base of the exponential backoff in seconds
+    :param exception_handlers: {exception type: handler(api, e)}, a handler returns True to stop retrying
+    :param weight: request weight of the endpoint, or a function of the call's arguments
+    :param orders: number of orders the call places, counted against the ORDERS limits
+    :param deadline: seconds after which no further attempt is started
+    :return: the call's response, None if it failed
+    """
+    def decorator(func):
+        def wrapper(self, *args, **kwargs):
+            state = RetryState(func, retries, delays, max_delay, deadline, exception_handlers)
+            last_exception.set(None)
+            token = current_endpoint.set(func.__name__)
+            try:
+                for attempt in range(retries):
+                    if not state.allow():
+                        return None
+                    try:
+                        request_weight = _request_weight(weight, args, kwargs)
+                        self.rate_limiter.acquire(request_weight, orders)
+                        state.before_attempt(request_weight)
+                        response = func(self, *args, **kwargs)
+                    except Exception as e:
+                        delay = state.on_exception(self, attempt, e)
+                        if delay is None:
+                            return None
+                        time.sleep(delay)
+                    else:
+                        state.on_success()
+                        return response
+                return None
+            finally:
+                current_endpoint.reset(token)
+        wrapper.__name__ = func.__name__
+        return wrapper
+
+    return decorator
+
+
+def async_retry_on_exceptions(retries=5, delays=1, exception_handlers=None, weight=1, orders=0, max_delay=30,
+                              deadline=None):
+    """
+    Coroutine counterpart of retry_on_exceptions, waits without blocking the loop.
+    """
+    def decorator(func):
+        async def wrapper(self, *args, **kwargs):
+            state = RetryState(func, retries, delays, max_delay, deadline, exception_handlers)
+            last_exception.set(None)
+            token = current_endpoint.set(func.__name__)
+            try:
+                for attempt in range(retries):
+                    if not state.allow():
+                        return None
+                    try:
+                        request_weight = _request_weight(weight, args, kwargs)
+                        await self.rate_limiter.acquire_async(request_weight, orders)
+                        state.before_attempt(request_weight)
+                        response = await func(self, *args, **kwargs)
+                    except Exception as e:
+                        delay = state.on_exception(self, attempt, e)
+                        if delay is None:
+                            return None
+                        await asyncio.sleep(delay)
+                    else:
+                        state.on_success()
+                        return response
+                return None
+            finally:
+                current_endpoint.reset(token)
+        wrapper.__name__ = func.__name__
+        return wrapper
+
+    return decorator
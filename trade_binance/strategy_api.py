@@ -8,21 +8,20 @@ import pickle
 import time
 from datetime import datetime, timedelta
 
-
-
+from trade_binance.account_cache import AccountCache
 from trade_binance.binance_api_wrapper import BinanceAPIWrapper
 from trade_binance.utils import write_log,  \
     get_config
 
 
 class StrategyAPI(BinanceAPIWrapper):
-    def __init__(self):
-        # Inherit the initialization from the base class
-        super().__init__()
-
+    def __init__(self, base_url=None):
         self.results_borrow = []
         self.symbols_can_not_trade = []
-        self.update()
+        self.account_caches = {}
+
+        # Inherit the initialization from the base class, its update() call runs StrategyAPI.update
+        super().__init__(base_url)
 
     def update(self):
         super().update()
@@ -37,7 +36,38 @@ class StrategyAPI(BinanceAPIWrapper):
         self.symbols_can_not_trade=symbols_can_not_trade
 
 
+    def start_account_cache(self, timeout=30, **kwargs):
+        """
+        Serves the spot and margin balance reads from the user data streams instead of my_account
+        and my_margin_account.
+
+        :param kwargs: passed to AccountCache, e.g. ws_url or keepalive_interval
+        :return: True if both caches are connected and loaded
+        """
+        self.stop_account_cache()
+        for account in ('spot', 'margin'):
+            self.account_caches[account] = AccountCache(
+                account, rest_url=self.client.base_url, api_key=self.client.api_key,
+                api_secret=self.client.api_secret, clock_sync=self.clock_sync, **kwargs)
+            self.account_caches[account].start()
+        return all(cache.wait_connected(timeout) for cache in self.account_caches.values())
+
+    def stop_account_cache(self):
+        for cache in self.account_caches.values():
+            cache.stop()
+        self.account_caches = {}
+
+    def get_cached_free(self, account, asset):
+        """
+        :return: free balance from the account cache, None without a synced cache
+        """
+        cache = self.account_caches.get(account)
+        return None if cache is None else cache.free(asset)
+
     def get_spot_bnb(self):
+        free = self.get_cached_free('spot', 'BNB')
+        if free is not None:
+            return free
         write_log('api my_spot_bnb')
         response = self.my_account()
         for j in response['balances']:
@@ -46,6 +76,9 @@ class StrategyAPI(BinanceAPIWrapper):
         return response
 
     def get_margin_bnb(self):
+        free = self.get_cached_free('margin', 'BNB')
+        if free is not None:
+            return free
         write_log('api my_margin_bnb')
         response = self.my_margin_account()
         for j in response['userAssets']:
@@ -76,9 +109,3 @@ class StrategyAPI(BinanceAPIWrapper):
         if bnb_margin > bnb_spot:
             if (bnb_margin - bnb_spot) > 0.01:
                 self.my_margin_transfer('BNB', (bnb_margin - bnb_spot) / 2, 2)
-
-
-
-
-
-
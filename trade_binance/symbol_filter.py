@@ -0,0 +1,176 @@
+import math
+from decimal import Decimal
+
+import numpy as np
+
+# tolerance in ticks for float inputs such as 0.29 * 100 == 28.999999999999996
+TICK_EPSILON = 1e-9
+
+# used when a filter is disabled with a size of 0, Binance never uses more decimals
+MAX_DECIMALS = 8
+
+
+def decimal_ticks(value):
+    """
+    :param value: a size from the exchange filters, e.g. '0.00100000' or '0.05'
+    :return: (units, decimals) with value == units / 10 ** decimals
+    """
+    size = Decimal(str(value)).normalize()
+    if size == 0:
+        return 1, MAX_DECIMALS
+    decimals = max(-size.as_tuple().exponent, 0)
+    return int(size.scaleb(decimals)), decimals
+
+
+class SymbolFilterIndex:
+    """
+    Exchange filters per base asset as integer ticks.
+
+    A price is stored as a whole number of `tick units / 10 ** decimals` and a quantity as a whole
+    number of step units, so rounding is a floor or ceil on the tick count followed by one division
+    by a power of ten, which yields the float closest to the exact decimal. Lookups are O(1) and the
+    `round_*s` methods round whole arrays at once.
+    """
+    def __init__(self):
+        self.assets = {}
+        self.symbols = {}
+        self.symbol_assets = {}
+        self._price_units = []
+        self._price_decimals = []
+        self._qty_units = []
+        self._qty_decimals = []
+        self._min_qty = []
+        self._min_notional = []
+        self._arrays = None
+
+    def __contains__(self, asset):
+        return asset in self.assets
+
+    def add(self, asset, symbol, price_size, qty_size, min_qty=0.0, min_notional=0.0):
+        price_units, price_decimals = decimal_ticks(price_size)
+        qty_units, qty_decimals = decimal_ticks(qty_size)
+        row = self.assets.get(asset)
+        if row is None:
+            row = self.assets[asset] = len(self._price_units)
+            for column in (self._price_units, self._price_decimals, self._qty_units, self._qty_decimals,
+                           self._min_qty, self._min_notional):
+                column.append(0)
+        self.symbols[asset] = symbol
+        self.symbol_assets[symbol] = asset
+        self._price_units[row] = price_units
+        self._price_decimals[row] = price_decimals
+        self._qty_units[row] = qty_units
+        self._qty_decimals[row] = qty_decimals
+        self._min_qty[row] = float(min_qty)
+        self._min_notional[row] = float(min_notional)
+        self._arrays = None
+
+    def add_symbol(self, row):
+        """
+        :param row: a symbol of the exchange info response
+        """
+        filters = {row_filter['filterType']: row_filter for row_filter in row['filters']}
+        price_filter = filters.get('PRICE_FILTER', {})
+        lot_size = filters.get('LOT_SIZE', {})
+        notional = filters.get('NOTIONAL') or filters.get('MIN_NOTIONAL') or {}
+        self.add(row['baseAsset'], row['symbol'],
+                 price_filter.get('tickSize', 0), lot_size.get('stepSize', 0),
+                 lot_size.get('minQty', 0), notional.get('minNotional', 0))
+
+    def add_precision(self, asset, precision):
+        size = Decimal(1).scaleb(-int(precision))
+        self.add(asset, asset, size, size)
+
+    @staticmethod
+    def _round(value, units, decimals, rounding):
+        ticks = float(value) * 10 ** decimals / units
+        if rounding == 'ceil':
+            ticks = math.ceil(ticks - TICK_EPSILON)
+        else:
+            ticks = math.floor(ticks + TICK_EPSILON)
+        return ticks * units / 10 ** decimals
+
+    def round_price(self, asset, price, rounding='floor'):
+        row = self.assets[asset]
+        return self._round(price, self._price_units[row], self._price_decimals[row], rounding)
+
+    def round_quantity(self, asset, quantity, rounding='floor'):
+        row = self.assets[asset]
+        return self._round(quantity, self._qty_units[row], self._qty_decimals[row], rounding)
+
+    def format_price(self, asset, price, rounding='floor'):
+        return f'{self.round_price(asset, price, rounding):.{self._price_decimals[self.assets[asset]]}f}'
+
+    def format_quantity(self, asset, quantity, rounding='floor'):
+        return f'{self.round_quantity(asset, quantity, rounding):.{self._qty_decimals[self.assets[asset]]}f}'
+
+    def format_params(self, symbol, side, params):
+        """
+        :return: order params with float quantity and prices written with the decimals of the symbol's
+            filters, str() would send a step of 0.00001 as '1e-05', which Binance rejects
+        """
+        asset = self.symbol_assets.get(symbol)
+        if asset is None:
+            return params
+        params = dict(params)
+        if isinstance(params.get('quantity'), float):
+            params['quantity'] = self.format_quantity(asset, params['quantity'])
+        rounding = 'floor' if side == 'BUY' else 'ceil'
+        for key in ('price', 'stopPrice'):
+            if isinstance(params.get(key), float):
+                params[key] = self.format_price(asset, params[key], rounding)
+        return params
+
+    def min_qty(self, asset):
+        return self._min_qty[self.assets[asset]]
+
+    def min_notional(self, asset):
+        return self._min_notional[self.assets[asset]]
+
+    def _get_arrays(self):
+        if self._arrays is None:
+            self._arrays = {
+                'price_units': np.array(self._price_units, dtype=np.float64),
+                'price_scale': 10.0 ** np.array(self._price_decimals, dtype=np.float64),
+                'qty_units': np.array(self._qty_units, dtype=np.float64),
+                'qty_scale': 10.0 ** np.array(self._qty_decimals, dtype=np.float64),
+                'min_qty': np.array(self._min_qty, dtype=np.float64),
+                'min_notional': np.array(self._min_notional, dtype=np.float64),
+            }
+        return self._arrays
+
+    def rows(self, assets):
+        return np.fromiter((self.assets[asset] for asset in assets), dtype=np.intp, count=len(assets))
+
+    @staticmethod
+    def _round_array(values, units, scale, rounding):
+        ticks = np.asarray(values, dtype=np.float64) * scale / units
+        if rounding == 'ceil':
+            ticks = np.ceil(ticks - TICK_EPSILON)
+        else:
+            ticks = np.floor(ticks + TICK_EPSILON)
+        return ticks * units / scale
+
+    def round_prices(self, assets, prices, rounding='floor'):
+        """
+        :param assets: base assets, one per price
+        :return: float64 array of prices on the tick grid
+        """
+        arrays = self._get_arrays()
+        rows = self.rows(assets)
+        return self._round_array(prices, arrays['price_units'][rows], arrays['price_scale'][rows], rounding)
+
+    def round_quantities(self, assets, quantities, rounding='floor'):
+        arrays = self._get_arrays()
+        rows = self.rows(assets)
+        return self._round_array(quantities, arrays['qty_units'][rows], arrays['qty_scale'][rows], rounding)
+
+    def check_orders(self, assets, prices, quantities):
+        """
+        :return: bool array, True where the quantity and notional pass LOT_SIZE minQty and NOTIONAL
+        """
+        arrays = self._get_arrays()
+        rows = self.rows(assets)
+        quantities = np.asarray(quantities, dtype=np.float64)
+        notional = np.asarray(prices, dtype=np.float64) * quantities
+        return (quantities >= arrays['min_qty'][rows]) & (notional >= arrays['min_notional'][rows])
@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+
+from trade_binance.binance_stream import BinanceStream
+from trade_binance.rate_limiter import RateLimiter
+
+
+class TickerPriceCache(BinanceStream):
+    """
+    Last price of every symbol from the all-market `!miniTicker@arr` stream, plus bid and ask for the
+    symbols given in `book_ticker_symbols` from their `<symbol>@bookTicker` streams.
+
+    The cache is bootstrapped from one `/api/v3/ticker/price` call on every connect and can be filled
+    from REST only through update_from_rest(). Every read reports the age of the quote and quotes
+    older than `max_age` seconds are not served.
+    """
+    def __init__(self, max_age=5, book_ticker_symbols=(), rest_url='https://api.binance.com', **kwargs):
+        super().__init__(**kwargs)
+        self.max_age = max_age
+        self.book_ticker_symbols = list(book_ticker_symbols)
+        self.rest_url = rest_url
+        self.prices = {}
+        self.book_tickers = {}
+        self.updated = None
+        self.lock = threading.Lock()
+        self.rate_limiter = RateLimiter()
+
+    def streams(self):
+        return ['!miniTicker@arr'] + [symbol.lower() + '@bookTicker' for symbol in self.book_ticker_symbols]
+
+    def on_message(self, stream, data):
+        now = time.time()
+        if isinstance(data, list):
+            with self.lock:
+                for ticker in data:
+                    self.prices[ticker['s']] = (ticker['c'], now)
+        elif isinstance(data, dict) and 'b' in data and 'a' in data:
+            with self.lock:
+                self.book_tickers[data['s']] = (data['b'], data['a'], now)
+
+    def update_from_rest(self, response, now=None):
+        """
+        :param response: /api/v3/ticker/price without symbol, [{'symbol': 'BTCUSDT', 'price': '...'}, ...]
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            for ticker in response:
+                self.prices[ticker['symbol']] = (ticker['price'], now)
+            self.updated = now
+
+    async def on_connect(self, session, reconnect):
+        await self.rate_limiter.acquire_async(4)
+        async with session.get(self.rest_url + '/api/v3/ticker/price') as response:
+            self.rate_limiter.on_response(response.status, response.headers)
+            response.raise_for_status()
+            self.update_from_rest(json.loads(await response.read()))
+
+    def get_price(self, symbol, max_age=None, now=None):
+        """
+        :return: (price, age in seconds), None if there is no quote younger than max_age
+        """
+        now = time.time() if now is None else now
+        max_age = self.max_age if max_age is None else max_age
+        quote = self.prices.get(symbol)
+        if quote is None:
+            return None
+        age = now - quote[1]
+        if age > max_age:
+            return None
+        return quote[0], age
+
+    def get_book_ticker(self, symbol, max_age=None, now=None):
+        """
+        :return: (bid, ask, age in seconds), None if there is no quote younger than max_age
+        """
+        now = time.time() if now is None else now
+        max_age = self.max_age if max_age is None else max_age
+        quote = self.book_tickers.get(symbol)
+        if quote is None or now - quote[2] > max_age:
+            return None
+        return quote[0], quote[1], now - quote[2]
+
+    def rest_age(self, now=None):
+        """
+        :return: seconds since the last update_from_rest, inf if there was none
+        """
+        if self.updated is None:
+            return float('inf')
+        return (time.time() if now is None else now) - self.updated
+
+    def get_ages(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            return {symbol: now - quote[1] for symbol, quote in self.prices.items()}
@@ -1,4 +1,9 @@
+import atexit
 import csv
+import math
+import queue
+import threading
+import time
 from base64 import urlsafe_b64encode
 from datetime import timedelta, datetime
 from email.mime.text import MIMEText
@@ -33,24 +38,107 @@ logging.basicConfig(
     force=True  # Ensures this config is applied
 )
 
+config_path = '../config/config.json'
+
+
+class ConfigCache:
+    """
+    config.json parsed once and served from memory. The file's mtime is checked at most every
+    `check_interval` seconds and the file is only parsed again when it changed; reload() forces it.
+    Set values such as `assets1` are precomputed per parse by get_set().
+    """
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.config = None
+        self.sets = {}
+        self.mtime = None
+        self.checked = None
+
+    def load(self, force=False):
+        now = time.monotonic()
+        if not force and self.checked is not None and now - self.checked < self.check_interval:
+            return self.config
+        with self.lock:
+            self.checked = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                self.config, self.sets, self.mtime = None, {}, None
+                return None
+            if force or mtime != self.mtime:
+                with open(self.path) as config_file:
+                    config = json.load(config_file)
+                self.config, self.sets, self.mtime = config, {}, mtime
+        return self.config
+
+    def reload(self):
+        return self.load(force=True)
+
+    def get(self, name):
+        config = self.load()
+        if config is None:
+            return None
+        try:
+            return config[name]
+        except KeyError:
+            raise EnvironmentError(f"Config variable {name} is missing")
+
+    def get_set(self, name):
+        value = self.get(name)
+        sets = self.sets
+        if name not in sets:
+            sets[name] = frozenset(value or ())
+        return sets[name]
+
+
+_config_cache = ConfigCache(config_path)
+_dotenv_checked = None
+_dotenv_mtime = None
+
+
+def load_env(force=False, check_interval=1.0):
+    """
+    Runs load_dotenv for the first call and again only when the .env file's mtime changed. Reloads
+    override the values loaded before, the first load keeps variables set by the environment.
+    """
+    global _dotenv_checked, _dotenv_mtime
+    now = time.monotonic()
+    if not force and _dotenv_checked is not None and now - _dotenv_checked < check_interval:
+        return
+    first = _dotenv_checked is None
+    _dotenv_checked = now
+    try:
+        mtime = os.stat(dotenv_path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if force or first or mtime != _dotenv_mtime:
+        load_dotenv(dotenv_path, override=not first)
+        _dotenv_mtime = mtime
+
+
 def get_env_variable(name:str):
-    load_dotenv(dotenv_path)
+    load_env()
     value = os.getenv(name)
     if value is None:
         raise EnvironmentError(f"Environment variable {name} is missing")
     return value
 
 def get_config(name:str):
-    try:
-        with open('../config/config.json') as config_file:
-            config = json.load(config_file)
-    except FileNotFoundError:
-        return None
-    try:
-        value = config[name]
-    except KeyError:
-        raise EnvironmentError(f"Config variable {name} is missing")
-    return value
+    return _config_cache.get(name)
+
+
+def get_config_set(name:str):
+    """
+    :return: the config list `name` as a frozenset, computed once per parse of config.json
+    """
+    return _config_cache.get_set(name)
+
+
+def reload_config():
+    load_env(force=True)
+    return _config_cache.reload()
 
 
 def validate_config():
@@ -70,12 +158,184 @@ def modify_minute(t1):
     t3 = datetime(t2.year, t2.month, t2.day, t2.hour, t2.minute)
     return t3
 
+log_path = "../log/q_binance_api.log"
+
+
+class LogWriter:
+    """
+    Appends log lines from a background thread. write() only puts the line on a bounded queue, the
+    worker writes whatever is queued in one batch every `flush_interval` seconds and close() drains it.
+    Lines are dropped rather than blocking the caller when the queue is full.
+    """
+    _stop = object()
+
+    def __init__(self, path, flush_interval=0.5, max_queue=10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, line):
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def _flush(self, lines):
+        try:
+            with open(self.path, "a") as file_object:
+                file_object.write(''.join(lines))
+        except Exception as e:
+            print(str(datetime.now()), 'LogWriter', e)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            lines = []
+            line = self.queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if line is self._stop:
+                    stopping = True
+                    break
+                lines.append(line)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    line = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if lines:
+                self._flush(lines)
+
+    def close(self, timeout=5):
+        if self._thread.is_alive():
+            self.queue.put(self._stop)
+            self._thread.join(timeout)
+
+
+_log_writer = None
+
+
+def enable_background_log(flush_interval=0.5, max_queue=10000):
+    """
+    Switches write_log to a LogWriter, the queue is drained at interpreter exit.
+    """
+    global _log_writer
+    if _log_writer is None:
+        _log_writer = LogWriter(log_path, flush_interval, max_queue)
+        atexit.register(disable_background_log)
+    return _log_writer
+
+
+def disable_background_log():
+    global _log_writer
+    log_writer, _log_writer = _log_writer, None
+    if log_writer is not None:
+        log_writer.close()
+
+
 def write_log(log_message, *args):
     log_message = f"{datetime.now()} {log_message} {' '.join(map(str, args))}\n"
-    with open("../log/q_binance_api.log", "a") as file_object:
+    log_writer = _log_writer
+    if log_writer is not None:
+        log_writer.write(log_message)
+        return
+    with open(log_path, "a") as file_object:
         file_object.write(log_message)
 
 
+class AlertDispatcher:
+    """
+    Sends alerts from a background thread so callers never wait for the mail transport.
+
+    The first alert with a subject is sent right away. Repeats of the subject within `window`
+    seconds after a send are collected and sent as one digest when the window has passed. At most
+    `max_per_minute` mails are sent, alerts beyond that wait in the digests. close() sends whatever
+    is pending.
+
+    :param transport: callable(subject, content) that delivers one mail, e.g. a stub in tests
+    """
+    _stop = object()
+
+    def __init__(self, transport, window=60, max_per_minute=10, max_queue=1000, max_digest_lines=20):
+        self.transport = transport
+        self.window = window
+        self.max_per_minute = max_per_minute
+        self.max_digest_lines = max_digest_lines
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.pending = {}
+        self.last_sent = {}
+        self.sent_times = []
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def enqueue(self, subject, content):
+        try:
+            self.queue.put_nowait((subject, content, datetime.now()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _add(self, subject, content, created):
+        digest = self.pending.setdefault(subject, {'count': 0, 'lines': []})
+        digest['count'] += 1
+        if len(digest['lines']) < self.max_digest_lines:
+            digest['lines'].append(f'{created} {content}')
+
+    def _deliver(self, subject, digest):
+        if digest['count'] > 1:
+            subject = f"{subject} (x{digest['count']})"
+        content = '\n'.join(digest['lines'])
+        if digest['count'] > len(digest['lines']):
+            content += f"\n... {digest['count'] - len(digest['lines'])} more"
+        try:
+            self.transport(subject, content)
+        except Exception as e:
+            print(str(datetime.now()), 'AlertDispatcher', e)
+
+    def _send_due(self, now, force=False):
+        """
+        :return: seconds until the next pending digest may be sent, None if nothing is pending
+        """
+        self.sent_times = [sent for sent in self.sent_times if now - sent < 60]
+        wait = None
+        for subject in list(self.pending):
+            due = self.last_sent.get(subject, -math.inf) + self.window
+            if not force:
+                if len(self.sent_times) >= self.max_per_minute:
+                    due = max(due, self.sent_times[0] + 60)
+                if due > now:
+                    wait = due - now if wait is None else min(wait, due - now)
+                    continue
+            self._deliver(subject, self.pending.pop(subject))
+            self.last_sent[subject] = now
+            self.sent_times.append(now)
+        return wait
+
+    def _run(self):
+        wait = None
+        while True:
+            try:
+                item = self.queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+            if item is self._stop:
+                self._send_due(time.monotonic(), force=True)
+                return
+            if item is not None:
+                self._add(*item)
+            wait = self._send_due(time.monotonic())
+
+    def close(self, timeout=5):
+        if self._thread.is_alive():
+            self.queue.put(self._stop)
+            self._thread.join(timeout)
+
+
 class GmailAPIWrapper:
     _instance = None
 
@@ -98,6 +358,11 @@ class GmailAPIWrapper:
             self.last_send_email2 = ""
             self.last_send_email_time = ""
 
+            self.creds = None
+            self.service = None
+            self.dispatcher = None
+            self.lock = threading.Lock()
+
             self.initialized = True  # Mark as initialized
 
     def create_message(self, sender: str, to: str, subject: str, message_text: str):
@@ -114,16 +379,15 @@ class GmailAPIWrapper:
         except Exception as e:
             print(str(datetime.now()), 'An error occurred: %s' % e)
 
-    def send_email(self, subject: str, content: str):
+    def get_service(self):
+        """
+        :return: Gmail service, built once and rebuilt only when the credentials had to be refreshed
+        """
+        if self.service is not None and self.creds is not None and self.creds.valid:
+            return self.service
+        creds = self.creds
         try:
-            if get_config('environment')=="development":
-                return
-        except Exception as e:
-            print(f"Error environment: {e}")
-
-        creds = None
-        try:
-            if os.path.exists('token.json'):
+            if creds is None and os.path.exists('token.json'):
                 creds = Credentials.from_authorized_user_file('token.json', self.SCOPES)
             if not creds or not creds.valid:
                 if creds and creds.expired and creds.refresh_token:
@@ -136,15 +400,36 @@ class GmailAPIWrapper:
                     token.write(creds.to_json())
         except Exception as e:
             print(e)
+        self.creds = creds
+        self.service = build('gmail', 'v1', credentials=creds, cache_discovery=False)
+        return self.service
 
+    def deliver(self, subject: str, content: str):
         try:
-            service = build('gmail', 'v1', credentials=creds)
+            service = self.get_service()
             subject = subject + ' ' + str(datetime.now())
             message = self.create_message(self.gmail_from, self.gmail_to, subject, content)
             self.send_message(service, 'me', message)
         except HttpError as error:
             print(f'An error occurred: {error}')
 
+    def send_email(self, subject: str, content: str):
+        """
+        Queues the mail on the AlertDispatcher, it is delivered from its thread.
+        """
+        try:
+            if get_config('environment')=="development":
+                return
+        except Exception as e:
+            print(f"Error environment: {e}")
+
+        if self.dispatcher is None:
+            with self.lock:
+                if self.dispatcher is None:
+                    self.dispatcher = AlertDispatcher(self.deliver)
+                    atexit.register(self.dispatcher.close)
+        self.dispatcher.enqueue(subject, str(content))
+
     def send_email_not_duplicate(self, subject: str, content: str):
         text_to_send = subject
         if (text_to_send == self.last_send_email1 or text_to_send == self.last_send_email2) and (